@@ -0,0 +1,121 @@
+import argparse
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List
+
+from benchmark import run_scenario
+from metrics import nearest_rank
+
+
+class Sweep(list):
+
+    # the values of one grid axis; anything else in a grid, lists such as
+    # starting_floors included, is used as-is in every scenario
+    pass
+
+
+def expand_grid(grid: Dict) -> List[Dict]:
+    # {"cars": Sweep([2, 4]), "seed": Sweep([0, 1])} -> one run_scenario
+    # kwargs dict per combination
+    names = sorted(grid)
+    values = [
+        grid[name] if isinstance(grid[name], Sweep) else [grid[name]]
+        for name in names
+    ]
+    return [
+        dict(zip(names, combination))
+        for combination in itertools.product(*values)
+    ]
+
+
+def read_grid(path: str) -> Dict:
+    # a JSON grid marks its axes as {"sweep": [values]}
+    with open(path) as grid_file:
+        grid = json.load(grid_file)
+    return {
+        name: Sweep(value["sweep"]) if type(value) == dict and list(value) == ["sweep"] else value
+        for name, value in grid.items()
+    }
+
+
+def _run(scenario: Dict) -> Dict:
+    scenario = dict(scenario)
+    scenario.setdefault("measure_memory", False)
+    return run_scenario(**scenario)
+
+
+def run_batch(scenarios: List[Dict], max_workers: int=None) -> Iterator[Dict]:
+    # Every scenario is an independent Building run in its own worker
+    # process; results are yielded as soon as each one finishes, so in
+    # completion order rather than submission order.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run, scenario) for scenario in scenarios]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class BatchSummary:
+
+    # running totals over the results streamed back by run_batch
+
+    def __init__(self):
+        self.runs = 0
+        self.served = 0
+        self.unserved = 0
+        # per run mean waits; floats, so not a StreamingStats histogram
+        self.wait_means = []  # type: List[float]
+        self.best = None
+
+    def add(self, result: Dict) -> None:
+        self.runs += 1
+        self.served += result["served"]
+        self.unserved += result["unserved"]
+        mean_wait = result["wait"]["mean"]
+        if mean_wait is not None:
+            self.wait_means.append(mean_wait)
+            if self.best is None or mean_wait < self.best["wait"]["mean"]:
+                self.best = result
+
+    def _mean_wait_summary(self) -> Dict:
+        # same keys as StreamingStats.summary, nearest-rank percentiles
+        if len(self.wait_means) == 0:
+            return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None}
+        means = sorted(self.wait_means)
+        summary = {"count": len(means), "mean": sum(means) / len(means)}
+        for percent in (50, 95, 99):
+            summary["p{0}".format(percent)] = means[nearest_rank(len(means), percent) - 1]
+        return summary
+
+    def summary(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "served": self.served,
+            "unserved": self.unserved,
+            "mean_wait": self._mean_wait_summary(),
+            "best": self.best,
+        }
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run a grid of independent elevator simulations on all cores"
+    )
+    parser.add_argument(
+        "grid",
+        help='JSON file of run_scenario arguments, axes to sweep as {"sweep": [values]}, e.g. '
+             '{"floors": 20, "cars": {"sweep": [2, 4]}, "starting_floors": ["G", "G"]}'
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    scenarios = expand_grid(read_grid(args.grid))
+    summary = BatchSummary()
+    # one JSON line per finished scenario, then the summary
+    for result in run_batch(scenarios, max_workers=args.workers):
+        summary.add(result)
+        print(json.dumps(result), flush=True)
+    print(json.dumps({"summary": summary.summary()}))
+
+
+if __name__ == '__main__':
+    main()
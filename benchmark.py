@@ -0,0 +1,260 @@
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from demand import DemandModel
+from dispatch import CostBasedDispatcher, DestinationDispatcher, LookaheadDispatcher, NearestCarDispatcher
+from events import EventDrivenSimulation
+from instrument import PhaseProfiler
+from metrics import HandlingCapacity, TripAggregator
+from model import SCHEDULING_MODES, Building, ElevatorSpec
+from traffic import TRAFFIC_PROFILES
+
+
+BENCHMARK_VERSION = 1
+# a tick stands for one second of simulated time
+TICKS_PER_HOUR = 3600
+
+DISPATCHERS = {
+    "nearest": NearestCarDispatcher,
+    "cost": CostBasedDispatcher,
+    "lookahead": LookaheadDispatcher,
+    # needs scheduling="destination"
+    "destination": DestinationDispatcher,
+}
+ENGINES = ("tick", "event")
+# where idle cars wait: the middle floor, or wherever a DemandModel learned
+# the next calls are likely to come from
+PARKING = ("middle", "demand")
+# tick vs event engine on an 8 hour day in a 40 floor, 8 car building, from
+# a quiet day to one with an elevator event on nearly every tick
+ENGINE_CASE = {"floors": 40, "cars": 8, "duration": 8 * TICKS_PER_HOUR}
+ENGINE_CASE_PASSENGERS = (2000, 5000, 20000)
+
+
+def build_scenario(floors: int, cars: int, passengers: int, profile: str,
+                   dispatcher: str, seed: int, duration: int,
+                   starting_floors: List[str]=None, scheduling: str="single",
+                   elevator_spec: Dict=None, parking: str="middle") -> Building:
+    if profile not in TRAFFIC_PROFILES:
+        raise ValueError("ERROR: unknown traffic profile {0}".format(profile))
+    if dispatcher not in DISPATCHERS:
+        raise ValueError("ERROR: unknown dispatcher {0}".format(dispatcher))
+    if parking not in PARKING:
+        raise ValueError("ERROR: unknown parking {0}".format(parking))
+    if (dispatcher == "destination") != (scheduling == "destination"):
+        raise ValueError("ERROR: the destination dispatcher goes with scheduling=destination")
+    building = Building(
+        floors=["G"] + [str(num) for num in range(1, floors)],
+        dispatcher=DISPATCHERS[dispatcher](),
+        metrics=[TripAggregator(), HandlingCapacity()],
+        scheduling=scheduling,
+        elevator_spec=ElevatorSpec(**elevator_spec) if elevator_spec is not None else None,
+        demand=DemandModel() if parking == "demand" else None
+    )
+    building.build_elevators(number=cars)
+    if starting_floors is not None:
+        if len(starting_floors) != cars:
+            raise ValueError("ERROR: need one starting floor per car")
+        for elevator, floor_id in zip(building.elevators, starting_floors):
+            elevator.current_floor = building.get_floor(floor_id)
+            if elevator.current_floor is None:
+                raise ValueError("ERROR: starting floor does not exist in the building")
+    arrivals = TRAFFIC_PROFILES[profile](
+        building.floors, rate=passengers / duration, seed=seed
+    )
+    building.add_arrivals(itertools.islice(arrivals, passengers))
+    return building
+
+
+def simulate(building: Building, engine: str, max_ticks: int) -> None:
+    if engine == "tick":
+        while building.time < max_ticks and not building.is_idle():
+            building.time_step()
+    elif engine == "event":
+        simulation = EventDrivenSimulation(building)
+        simulation.take_arrivals()
+        simulation.run(until=max_ticks)
+    else:
+        raise ValueError("ERROR: unknown engine {0}".format(engine))
+
+
+def run_scenario(floors: int, cars: int, passengers: int, profile: str="poisson",
+                 dispatcher: str="nearest", engine: str="tick", seed: int=0,
+                 duration: int=TICKS_PER_HOUR, max_ticks: int=None,
+                 starting_floors: List[str]=None, scheduling: str="single",
+                 elevator_spec: Dict=None, parking: str="middle",
+                 measure_memory: bool=True, phases: bool=False) -> Dict:
+    # passengers arrive over `duration` ticks; the run stops once everybody
+    # has been served or after max_ticks (4 * duration by default);
+    # elevator_spec holds ElevatorSpec keyword arguments
+    if max_ticks is None:
+        max_ticks = 4 * duration
+    scenario = (
+        floors, cars, passengers, profile, dispatcher, seed, duration, starting_floors,
+        scheduling, elevator_spec, parking
+    )
+    building = build_scenario(*scenario)
+    started = time.perf_counter()
+    simulate(building, engine, max_ticks)
+    wall_seconds = time.perf_counter() - started
+
+    peak_memory = None
+    if measure_memory:
+        # tracing slows the run down, so memory gets its own identical run
+        tracemalloc.start()
+        simulate(build_scenario(*scenario), engine, max_ticks)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    phase_summary = None
+    if phases:
+        # same for the per phase timings
+        profiled = build_scenario(*scenario)
+        with PhaseProfiler().attach(profiled) as profiler:
+            simulate(profiled, engine, max_ticks)
+        phase_summary = profiler.summary()
+
+    stats = building.metrics[0].overall
+    return {
+        "floors": floors,
+        "cars": cars,
+        "passengers": passengers,
+        "profile": profile,
+        "dispatcher": dispatcher,
+        "engine": engine,
+        "scheduling": scheduling,
+        "elevator_spec": elevator_spec,
+        "parking": parking,
+        "seed": seed,
+        "starting_floors": starting_floors,
+        "ticks": building.time,
+        "wall_seconds": wall_seconds,
+        "ticks_per_second": building.time / wall_seconds if wall_seconds > 0 else None,
+        "wall_seconds_per_simulated_hour": (
+            wall_seconds * TICKS_PER_HOUR / building.time if building.time > 0 else None
+        ),
+        "peak_memory_bytes": peak_memory,
+        "served": stats.trip.count,
+        "unserved": passengers - stats.trip.count,
+        "wait": stats.wait.summary(),
+        "ride": stats.ride.summary(),
+        "trip": stats.trip.summary(),
+        "handling_capacity": building.metrics[1].summary(),
+        "phases": phase_summary,
+    }
+
+
+def run_benchmarks(floors: List[int], cars: List[int], passengers: List[int],
+                   profiles: List[str], dispatchers: List[str], engines: List[str],
+                   seed: int=0, duration: int=TICKS_PER_HOUR, scheduling: str="single",
+                   elevator_spec: Dict=None, parking: str="middle", measure_memory: bool=True,
+                   phases: bool=False, progress=None) -> Dict:
+    results = []
+    for scenario in itertools.product(floors, cars, passengers, profiles, dispatchers, engines):
+        result = run_scenario(
+            *scenario, seed=seed, duration=duration, scheduling=scheduling,
+            elevator_spec=elevator_spec, parking=parking, measure_memory=measure_memory,
+            phases=phases
+        )
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare_engines(passengers: List[int]=ENGINE_CASE_PASSENGERS, profile: str="poisson",
+                    seed: int=0, repeat: int=1, **case) -> List[Dict]:
+    # wall seconds of the tick and the event engine on the same scenario,
+    # ENGINE_CASE unless case says otherwise, best of `repeat` runs each
+    case = dict(ENGINE_CASE, **case)
+    rows = []
+    for count in passengers:
+        row = {"passengers": count}
+        results = {}
+        for engine in ENGINES:
+            for run_idx in range(repeat):
+                result = run_scenario(
+                    passengers=count, profile=profile, engine=engine, seed=seed,
+                    measure_memory=False, **case
+                )
+                if engine not in results or result["wall_seconds"] < results[engine]["wall_seconds"]:
+                    results[engine] = result
+            row[engine + "_seconds"] = results[engine]["wall_seconds"]
+        row["speedup"] = row["tick_seconds"] / row["event_seconds"]
+        row["same_trips"] = all(
+            results["tick"][key] == results["event"][key] for key in ("served", "wait", "ride")
+        )
+        rows.append(row)
+    return rows
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the elevator simulation across building sizes and traffic patterns"
+    )
+    parser.add_argument("--floors", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--cars", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--passengers", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--profiles", nargs="+", default=["poisson", "up_peak"],
+                        choices=sorted(TRAFFIC_PROFILES))
+    parser.add_argument("--dispatchers", nargs="+", default=["nearest"],
+                        choices=sorted(DISPATCHERS))
+    parser.add_argument("--engines", nargs="+", default=["tick"], choices=ENGINES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scheduling", default="single", choices=SCHEDULING_MODES)
+    parser.add_argument("--elevator-spec", type=json.loads,
+                        help='ElevatorSpec arguments as JSON, e.g. \'{"capacity": 13}\'')
+    parser.add_argument("--parking", default="middle", choices=PARKING,
+                        help="where idle cars wait; demand needs the tick engine")
+    parser.add_argument("--duration", type=int, default=TICKS_PER_HOUR,
+                        help="ticks over which the passengers arrive")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the extra traced run that measures peak memory")
+    parser.add_argument("--phases", action="store_true",
+                        help="add per phase timings from an extra profiled run")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare-engines", action="store_true",
+                        help="only time the tick vs the event engine on ENGINE_CASE")
+    args = parser.parse_args(argv)
+    if args.compare_engines:
+        for row in compare_engines(seed=args.seed, repeat=2):
+            print(
+                "{passengers} passengers: tick {tick_seconds:.2f}s, event {event_seconds:.2f}s, "
+                "{speedup:.2f}x, same trips {same_trips}".format(**row)
+            )
+        return
+
+    def progress(result):
+        print(
+            "{floors} floors, {cars} cars, {passengers} passengers, {profile}, "
+            "{dispatcher}, {engine}: {ticks} ticks in {wall_seconds:.3f}s".format(**result),
+            file=sys.stderr
+        )
+
+    report = run_benchmarks(
+        args.floors, args.cars, args.passengers, args.profiles, args.dispatchers,
+        args.engines, seed=args.seed, duration=args.duration, scheduling=args.scheduling,
+        elevator_spec=args.elevator_spec, parking=args.parking,
+        measure_memory=not args.no_memory, phases=args.phases, progress=progress
+    )
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
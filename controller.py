@@ -0,0 +1,216 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from model import Building, Passenger
+
+
+# call events coming in from the rig:
+#   ("hall", origin floor id, destination floor id)  somebody presses a hall
+#                                                      button (destination
+#                                                      known at the hall)
+#   ("car", elevator id, floor id)                    a car button, needs
+#                                                      scheduling="look" or
+#                                                      "destination"
+HALL_CALL = "hall"
+CAR_CALL = "car"
+
+# commands going out to the rig, one per elevator whose state changed in a
+# tick: (building.time, elevator id, current floor id, next stop floor id or
+# None, vector, doors open)
+CarCommand = Tuple[int, int, str, Optional[str], str, bool]
+
+
+class RealTimeController:
+
+    # Runs the building as a live dispatcher: call events are queued as they
+    # come in, and every tick_seconds the queued calls are applied and one
+    # Building.time_step is taken. Commands go out through a bounded queue
+    # that never blocks the tick; when the rig falls behind the oldest
+    # command is dropped. deadline_seconds is the budget for applying the
+    # calls and stepping the building, ticks over it are counted.
+
+    def __init__(self, building: Building, tick_seconds: float=1.0, deadline_seconds: float=None,
+                 max_pending_commands: int=10000):
+        if building is None:
+            raise ValueError("ERROR: building may not be None")
+        if tick_seconds <= 0:
+            raise ValueError("ERROR: tick_seconds must be positive")
+        if max_pending_commands < 1:
+            raise ValueError("ERROR: max_pending_commands must be at least 1")
+        self.building = building
+        self.tick_seconds = tick_seconds
+        self.deadline_seconds = deadline_seconds if deadline_seconds is not None else tick_seconds / 2
+        self.calls = deque()
+        self.commands = asyncio.Queue(maxsize=max_pending_commands)
+        self.running = False
+        self.calls_applied = 0
+        self.calls_rejected = 0
+        self.commands_dropped = 0
+        self.deadline_misses = 0
+        self.overruns = 0
+        self.max_decision_seconds = 0.0
+        self.total_decision_seconds = 0.0
+        self.ticks = 0
+        self._car_states = {}  # type: Dict[int, tuple]
+
+    def submit(self, event: tuple) -> None:
+        # never blocks, so any number of producers can call it
+        self.calls.append(event)
+
+    def _apply_call(self, event: tuple) -> None:
+        building = self.building
+        try:
+            kind, first, second = event
+            if kind == HALL_CALL:
+                building.add_passenger(Passenger(first, second, building))
+            elif kind == CAR_CALL:
+                if building.scheduling == "single":
+                    raise ValueError("ERROR: car calls need a stop set, not scheduling=\"single\"")
+                elevator = next(
+                    elevator for elevator in building.elevators
+                    if elevator.elevator_id == first
+                )
+                floor = building.get_floor(second)
+                if floor is None or floor == elevator.current_floor:
+                    raise ValueError("ERROR: car call to an unknown or the current floor")
+                elevator.stops.add(
+                    floor, building.get_vector_direction(elevator.current_floor, floor)
+                )
+            else:
+                raise ValueError("ERROR: unknown call event {0}".format(kind))
+        except (ValueError, TypeError, StopIteration):
+            # one bad event from the rig must not stop the controller
+            self.calls_rejected += 1
+        else:
+            self.calls_applied += 1
+
+    def _publish(self, command: CarCommand) -> None:
+        if self.commands.full():
+            self.commands.get_nowait()
+            self.commands_dropped += 1
+        self.commands.put_nowait(command)
+
+    def step(self) -> float:
+        # one decision: apply the queued calls, take a tick, publish what
+        # changed; returns how long it took
+        started = time.perf_counter()
+        while len(self.calls) > 0:
+            self._apply_call(self.calls.popleft())
+        building = self.building
+        building.time_step()
+        for elevator in building.elevators:
+            state = (
+                elevator.current_floor.floor_id,
+                elevator.desired_floor.floor_id if elevator.desired_floor is not None else None,
+                elevator.current_vector,
+                elevator.doors_open,
+            )
+            if self._car_states.get(elevator.elevator_id) != state:
+                self._car_states[elevator.elevator_id] = state
+                self._publish((building.time, elevator.elevator_id) + state)
+        decision_seconds = time.perf_counter() - started
+        self.ticks += 1
+        self.total_decision_seconds += decision_seconds
+        self.max_decision_seconds = max(self.max_decision_seconds, decision_seconds)
+        if decision_seconds > self.deadline_seconds:
+            self.deadline_misses += 1
+        return decision_seconds
+
+    async def run(self, ticks: int=None) -> None:
+        # fixed cadence: a slow tick eats into the next sleep, it doesn't
+        # push the schedule back; ticks=None runs until stop()
+        loop = asyncio.get_running_loop()
+        self.running = True
+        next_tick = loop.time()
+        ticks_run = 0
+        while self.running and (ticks is None or ticks_run < ticks):
+            self.step()
+            ticks_run += 1
+            next_tick += self.tick_seconds
+            delay = next_tick - loop.time()
+            if delay < 0:
+                self.overruns += 1
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+        self.running = False
+
+    def stop(self) -> None:
+        self.running = False
+
+    def stats(self) -> Dict:
+        return {
+            "ticks": self.ticks,
+            "calls_applied": self.calls_applied,
+            "calls_rejected": self.calls_rejected,
+            "commands_dropped": self.commands_dropped,
+            "deadline_seconds": self.deadline_seconds,
+            "deadline_misses": self.deadline_misses,
+            "overruns": self.overruns,
+            "max_decision_seconds": self.max_decision_seconds,
+            "mean_decision_seconds": (
+                self.total_decision_seconds / self.ticks if self.ticks > 0 else None
+            ),
+        }
+
+
+async def serve_calls(controller: RealTimeController, host: str="127.0.0.1", port: int=0):
+    # newline delimited JSON call events over TCP, e.g.
+    # {"kind": "hall", "origin": "G", "destination": "7"} or
+    # {"kind": "car", "elevator": 0, "floor": "3"}; returns the server
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    call = json.loads(line)
+                    if call.get("kind") == CAR_CALL:
+                        controller.submit((CAR_CALL, call["elevator"], str(call["floor"])))
+                    else:
+                        controller.submit((HALL_CALL, str(call["origin"]), str(call["destination"])))
+                except (ValueError, KeyError, AttributeError):
+                    controller.calls_rejected += 1
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle, host, port)
+
+
+class SimulatedDevice:
+
+    # Stand-in for the rig: replays (time, origin, destination) arrivals as
+    # hall calls at their tick on the controller's clock, and collects the
+    # commands the controller publishes.
+
+    def __init__(self, controller: RealTimeController, arrivals: Iterable):
+        self.controller = controller
+        self.arrivals = iter(arrivals)
+        self.received = []  # type: List[CarCommand]
+        self.calls_sent = 0
+
+    async def feed(self) -> None:
+        controller = self.controller
+        for arrival_time, origin_floor, desired_floor in self.arrivals:
+            while controller.building.time < arrival_time:
+                await asyncio.sleep(controller.tick_seconds / 4)
+            controller.submit((HALL_CALL, origin_floor, desired_floor))
+            self.calls_sent += 1
+
+    async def listen(self) -> None:
+        while True:
+            self.received.append(await self.controller.commands.get())
+
+    async def run(self, ticks: int) -> None:
+        tasks = [asyncio.create_task(self.listen()), asyncio.create_task(self.feed())]
+        try:
+            await self.controller.run(ticks=ticks)
+        finally:
+            # even if the controller fails or is cancelled, nothing is left
+            # running once run returns
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,195 @@
+from typing import Dict, List, Tuple
+
+from model import Building, Elevator, Floor, Passenger, Zone
+
+
+# a tick stands for one second of simulated time
+TICKS_PER_DAY = 86400
+# recent weights are kept multiplied by 2 ** (age / half_life) and brought
+# back down once they get this large
+RESCALE_LIMIT = 2.0 ** 64
+
+
+class DecayingHistogram:
+
+    # Per floor arrival counts where an arrival half_life ticks old counts
+    # half as much as one now. Instead of decaying every bucket every tick,
+    # new arrivals are added with a weight that grows with time, so add is
+    # O(1) and only the occasional rescale touches every floor.
+
+    __slots__ = ("half_life", "counts", "origin", "total")
+
+    def __init__(self, floors: int, half_life: float):
+        if half_life <= 0:
+            raise ValueError("ERROR: half_life must be positive")
+        self.half_life = half_life
+        self.counts = [0.0] * floors
+        self.origin = 0
+        self.total = 0.0
+
+    def _scale(self, time: int) -> float:
+        return 2.0 ** ((time - self.origin) / self.half_life)
+
+    def add(self, floor_idx: int, time: int) -> None:
+        weight = self._scale(time)
+        if weight > RESCALE_LIMIT:
+            self.counts = [count / weight for count in self.counts]
+            self.total /= weight
+            self.origin = time
+            weight = 1.0
+        self.counts[floor_idx] += weight
+        self.total += weight
+
+    def shares(self) -> List[float]:
+        # fraction of the (decayed) arrivals at every floor, the scale
+        # cancels out so nothing needs decaying here either
+        if self.total <= 0:
+            return None
+        return [count / self.total for count in self.counts]
+
+
+class DemandModel:
+
+    # Learns where hall calls come from as the building runs and parks idle
+    # elevators where the next calls are expected. Arrivals go into a short
+    # term DecayingHistogram (what the traffic looks like right now) and into
+    # one per time of day bin histogram that fades by `day_decay` every day
+    # (what the traffic usually looks like at this time). Expected demand is
+    # a blend of the two plus a little uniform demand, and the k elevators
+    # park at its k quantile midpoints, which on a line is close to the
+    # k-median placement that minimizes the expected distance to the next
+    # call: all at the lobby in an up peak, spread out when calls come from
+    # everywhere. The parking plan is redone every replan_ticks, so a tick
+    # costs O(1) per arrival plus an O(floors) replan now and then.
+
+    def __init__(self, half_life: float=300, bin_ticks: int=900, day_ticks: int=TICKS_PER_DAY,
+                 day_decay: float=0.5, history_weight: float=0.5, uniform_weight: float=0.05,
+                 replan_ticks: int=60):
+        if bin_ticks < 1 or day_ticks < bin_ticks:
+            raise ValueError("ERROR: need 1 <= bin_ticks <= day_ticks")
+        if replan_ticks < 1:
+            raise ValueError("ERROR: replan_ticks must be at least 1")
+        for weight in (day_decay, history_weight, uniform_weight):
+            if not 0 <= weight <= 1:
+                raise ValueError("ERROR: decay and blend weights must be between 0 and 1")
+        self.half_life = half_life
+        self.bin_ticks = bin_ticks
+        self.day_ticks = day_ticks
+        self.day_decay = day_decay
+        self.history_weight = history_weight
+        self.uniform_weight = uniform_weight
+        self.replan_ticks = replan_ticks
+        self.recent = None  # type: DecayingHistogram
+        # time of day bin -> [day last added to, per floor counts]
+        self.by_time_of_day = {}  # type: Dict[int, list]
+        self.arrivals_seen = 0
+        self._plans = {}  # type: Dict[Zone, List[Floor]]
+        self._plan_epoch = None
+        self._matches = {}  # type: Dict[Zone, Tuple[int, Dict[Elevator, Floor]]]
+
+    def copy(self):
+        # learned counts and this epoch's parking plans, which were made from
+        # the counts at the time and would come out differently if redone
+        copied = DemandModel(
+            self.half_life, self.bin_ticks, self.day_ticks, self.day_decay,
+            self.history_weight, self.uniform_weight, self.replan_ticks
+        )
+        if self.recent is not None:
+            copied.recent = DecayingHistogram(len(self.recent.counts), self.half_life)
+            copied.recent.counts = list(self.recent.counts)
+            copied.recent.origin = self.recent.origin
+            copied.recent.total = self.recent.total
+        copied.by_time_of_day = {
+            time_bin: [day, list(counts)]
+            for time_bin, (day, counts) in self.by_time_of_day.items()
+        }
+        copied.arrivals_seen = self.arrivals_seen
+        copied._plan_epoch = self._plan_epoch
+        copied._plans = {zone: list(floors) for zone, floors in self._plans.items()}
+        return copied
+
+    def _ensure(self, building: Building) -> None:
+        if self.recent is None or len(self.recent.counts) != len(building.floors):
+            self.recent = DecayingHistogram(len(building.floors), self.half_life)
+            self.by_time_of_day = {}
+
+    def record_arrival(self, passenger: Passenger, building: Building) -> None:
+        self._ensure(building)
+        time = building.time
+        floor_idx = building.floor_index[passenger.origin_floor]
+        self.recent.add(floor_idx, time)
+        day, time_of_day = divmod(time, self.day_ticks)
+        time_bin = time_of_day // self.bin_ticks
+        if time_bin not in self.by_time_of_day:
+            self.by_time_of_day[time_bin] = [day, [0.0] * len(building.floors)]
+        entry = self.by_time_of_day[time_bin]
+        if entry[0] != day:
+            # first arrival in this bin today, fade the earlier days
+            fade = self.day_decay ** (day - entry[0])
+            entry[0], entry[1] = day, [count * fade for count in entry[1]]
+        entry[1][floor_idx] += 1
+        self.arrivals_seen += 1
+
+    def expected_demand(self, building: Building, time: int=None) -> List[float]:
+        # share of the next hall calls expected at every floor
+        self._ensure(building)
+        if time is None:
+            time = building.time
+        floors = len(building.floors)
+        recent = self.recent.shares()
+        entry = self.by_time_of_day.get((time % self.day_ticks) // self.bin_ticks)
+        if recent is None:
+            return [1.0 / floors] * floors
+        # without history for this time of day the recent traffic is all
+        # there is to go on
+        parts = [(1.0, recent)]
+        if entry is not None:
+            total = sum(entry[1])
+            parts = [
+                (1 - self.history_weight, recent),
+                (self.history_weight, [count / total for count in entry[1]]),
+            ]
+        demand = [self.uniform_weight / floors] * floors
+        for weight, shares in parts:
+            weight *= 1 - self.uniform_weight
+            for floor_idx, share in enumerate(shares):
+                demand[floor_idx] += weight * share
+        return demand
+
+    def parking_floors(self, building: Building, floors: List[Floor], cars: int) -> List[Floor]:
+        # the `cars` quantile midpoints of the expected demand over `floors`
+        demand = self.expected_demand(building)
+        weights = [demand[building.floor_index[floor]] for floor in floors]
+        total = sum(weights)
+        targets = []
+        seen = 0.0
+        floor_pos = 0
+        for car in range(cars):
+            quantile = total * (2 * car + 1) / (2 * cars)
+            while floor_pos < len(floors) - 1 and seen + weights[floor_pos] < quantile:
+                seen += weights[floor_pos]
+                floor_pos += 1
+            targets.append(floors[floor_pos])
+        return targets
+
+    def get_parking_floor(self, building: Building, elevator: Elevator) -> Floor:
+        zone = elevator.zone
+        epoch = building.time // self.replan_ticks
+        if epoch != self._plan_epoch:
+            self._plan_epoch = epoch
+            self._plans = {}
+        cars = building.get_zone_elevators(zone)
+        if zone not in self._plans or len(self._plans[zone]) != len(cars):
+            floors = zone.floor_list if zone is not None else building.floors
+            self._plans[zone] = self.parking_floors(building, floors, len(cars))
+        match_time, matches = self._matches.get(zone, (None, None))
+        if match_time != building.time or elevator not in matches:
+            # lowest car to the lowest parking floor and so on, so parking
+            # moves never cross each other
+            ordered = sorted(
+                cars,
+                key=lambda car: (building.floor_index[car.current_floor], car.elevator_id)
+            )
+            matches = dict(zip(ordered, self._plans[zone]))
+            self._matches[zone] = (building.time, matches)
+        return matches[elevator]
@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional, Tuple
+
+from lookahead import LookaheadEvaluator
+from model import Building, Elevator, Floor, Passenger, Zone
+
+
+def assign_cheapest_first(scored_pairs: List[Tuple[float, int, int, Elevator, Floor]],
+                          idle_elevators: List[Elevator]) -> Dict[Elevator, Floor]:
+    # Hands out (cost, call index, car order, car, call floor) pairs cheapest
+    # first, ties by call and then car: every call goes to its cheapest car
+    # that hasn't got one yet. Only idle cars are sent anywhere, a call whose
+    # cheapest car is busy is left for that car.
+    idle = set(idle_elevators)
+    assignments = {}
+    served_calls = set()
+    served_floors = set()
+    claimed_elevators = set()
+    for cost, call_idx, elevator_order, elevator, floor in sorted(scored_pairs, key=lambda pair: pair[:3]):
+        if call_idx in served_calls or elevator in claimed_elevators:
+            continue
+        served_calls.add(call_idx)
+        if elevator in idle:
+            # idle elevators pick up both directions once they arrive, so
+            # one of them is enough per floor
+            if floor in served_floors:
+                continue
+            assignments[elevator] = floor
+            served_floors.add(floor)
+        claimed_elevators.add(elevator)
+    return assignments
+
+
+class Dispatcher:
+
+    # zoned buildings call assign once per zone with that zone's idle
+    # elevators; buildings without zones leave zone out
+
+    def assign(self, building: Building, idle_elevators: List[Elevator], zone: Zone=None) -> Dict[Elevator, Floor]:
+        raise NotImplementedError()
+
+
+class NearestCarDispatcher(Dispatcher):
+
+    # every idle elevator, in building order, heads to the closest hall call
+    # that no other elevator is already going to serve; full elevators are
+    # left alone since they can't pick anybody up
+
+    def assign(self, building: Building, idle_elevators: List[Elevator], zone: Zone=None) -> Dict[Elevator, Floor]:
+        if len(idle_elevators) == 0:
+            return {}
+        pending_floors = []
+        for floor, vector in building.get_pending_calls(zone):
+            if floor not in pending_floors:
+                pending_floors.append(floor)
+        assignments = {}
+        for elevator in idle_elevators:
+            if len(pending_floors) == 0:
+                break
+            if elevator.is_full:
+                continue
+            closest_floor = min(
+                pending_floors,
+                key=lambda floor: building.floor_distance(
+                    elevator.current_floor, floor
+                )
+            )
+            assignments[elevator] = closest_floor
+            pending_floors.remove(closest_floor)
+        return assignments
+
+
+class CostBasedDispatcher(Dispatcher):
+
+    # scores every (hall call, elevator) pair once per tick and hands calls
+    # out cheapest first; a call whose cheapest elevator is already busy is
+    # left for that elevator instead of sending an idle one after it
+
+    def __init__(self, stop_penalty: int=2, reversal_penalty: int=1):
+        if stop_penalty < 0 or reversal_penalty < 0:
+            raise ValueError("ERROR: dispatch penalties may not be negative")
+        self.stop_penalty = stop_penalty
+        self.reversal_penalty = reversal_penalty
+
+    def call_cost(self, building: Building, elevator: Elevator, floor: Floor, vector: str) -> int:
+        if elevator.desired_floor is None:
+            return building.floor_distance(elevator.current_floor, floor)
+        # a busy elevator first finishes its current run, then comes back
+        cost = (
+            building.floor_distance(elevator.current_floor, elevator.desired_floor) +
+            building.floor_distance(elevator.desired_floor, floor) +
+            self.stop_penalty * len(elevator.stops)
+        )
+        if vector != elevator.current_vector:
+            cost += self.reversal_penalty
+        return cost
+
+    def assign(self, building: Building, idle_elevators: List[Elevator], zone: Zone=None) -> Dict[Elevator, Floor]:
+        if len(idle_elevators) == 0:
+            # busy elevators keep going, nothing to work out
+            return {}
+        pending_calls = building.get_pending_calls(zone)
+        if len(pending_calls) == 0:
+            return {}
+        elevators = building.elevators if zone is None else building.get_zone_elevators(zone)
+        scored_pairs = []  # type: List[Tuple[int, int, int, Elevator, Floor]]
+        for call_idx, (floor, vector) in enumerate(pending_calls):
+            for elevator_idx, elevator in enumerate(elevators):
+                if elevator.is_full:
+                    continue
+                scored_pairs.append((
+                    self.call_cost(building, elevator, floor, vector),
+                    call_idx, elevator_idx, elevator, floor
+                ))
+        return assign_cheapest_first(scored_pairs, idle_elevators)
+
+
+class LookaheadDispatcher(Dispatcher):
+
+    # scores every pending call against every car with a LookaheadEvaluator
+    # roll forward and hands calls out like CostBasedDispatcher, cheapest
+    # first; a call whose best car is busy is left for that car
+
+    def __init__(self, horizon: int=300, delay_weight: float=1.0):
+        self.evaluator = LookaheadEvaluator(horizon=horizon, delay_weight=delay_weight)
+
+    def assign(self, building: Building, idle_elevators: List[Elevator], zone: Zone=None) -> Dict[Elevator, Floor]:
+        if len(idle_elevators) == 0:
+            # busy elevators keep going, nothing to work out
+            return {}
+        pending_calls = building.get_pending_calls(zone)
+        if len(pending_calls) == 0:
+            return {}
+        elevators = [
+            elevator
+            for elevator in (building.elevators if zone is None else building.get_zone_elevators(zone))
+            if not elevator.is_full
+        ]
+        evaluations = self.evaluator.evaluate_calls(building, pending_calls, elevators)
+        scored_pairs = [
+            (candidate.cost, call_idx, candidate.elevator.elevator_id, candidate.elevator, floor)
+            for call_idx, (floor, vector) in enumerate(pending_calls)
+                for candidate in evaluations[(floor, vector)]
+        ]
+        return assign_cheapest_first(scored_pairs, idle_elevators)
+
+
+class DestinationDispatcher(Dispatcher):
+
+    # Destination dispatch: passengers say where they are going at the hall
+    # and Building gives them a car as they arrive. A car costs the floors
+    # it has to cover to reach the passenger, finishing its sweep first if
+    # it's heading the other way, and stop_penalty per stop it already has,
+    # like CostBasedDispatcher; plus stop_penalty for each stop the passenger
+    # adds, for every passenger already committed to the car, plus how far
+    # the passenger rides beyond the floors the car already takes people to.
+    # Riders for the same or nearby floors share a car, which makes fewer
+    # stops per trip, until the extra stops cost more than a car of their
+    # own. Scoring is O(cars * capacity) per passenger.
+
+    def __init__(self, stop_penalty: int=2, reversal_penalty: int=1):
+        if stop_penalty < 0 or reversal_penalty < 0:
+            raise ValueError("ERROR: dispatch penalties may not be negative")
+        self.stop_penalty = stop_penalty
+        self.reversal_penalty = reversal_penalty
+
+    def assign(self, building: Building, idle_elevators: List[Elevator], zone: Zone=None) -> Dict[Elevator, Floor]:
+        # waiting passengers already have their cars
+        return {}
+
+    def passenger_cost(self, building: Building, elevator: Elevator, passenger: Passenger) -> int:
+        floor_index = building.floor_index
+        car_idx = floor_index[elevator.current_floor]
+        origin_idx = floor_index[passenger.origin_floor]
+        destination_idx = floor_index[passenger.desired_floor]
+        sign = 1 if passenger.vector == "^" else -1
+        stops = elevator.stops
+        if elevator.current_vector == " " or \
+                (elevator.current_vector == passenger.vector and (origin_idx - car_idx) * sign >= 0):
+            cost = abs(origin_idx - car_idx)
+        else:
+            if elevator.current_vector == "^":
+                turn_idx = max([car_idx, origin_idx] + stops.up[-1:] + stops.down[-1:])
+            else:
+                turn_idx = min([car_idx, origin_idx] + stops.up[:1] + stops.down[:1])
+            cost = abs(turn_idx - car_idx) + abs(turn_idx - origin_idx) + self.reversal_penalty
+        cost += self.stop_penalty * len(stops)
+        # floor indices the car already stops at for its riders and the
+        # passengers it's been given
+        planned = [floor_index[floor] for floor in elevator.assigned]
+        planned += [floor_index[rider.desired_floor] for rider in elevator.passengers]
+        committed = len(elevator.passengers) + sum(elevator.assigned.values())
+        new_stops = (passenger.origin_floor not in stops) + (destination_idx not in planned)
+        cost += self.stop_penalty * new_stops * committed
+        farthest = origin_idx * sign
+        for floor_idx in planned:
+            if floor_idx * sign > farthest:
+                farthest = floor_idx * sign
+        cost += max(0, destination_idx * sign - farthest)
+        return cost
+
+    def assign_passenger(self, building: Building, passenger: Passenger) -> Optional[Elevator]:
+        candidates = [
+            elevator
+            for elevator in building.elevators
+            if building.can_serve(elevator, passenger)
+        ]
+        # cars with room for one more, counting everybody already given to
+        # them; when every car is spoken for the passenger waits for the
+        # cheapest one anyway
+        with_room = [
+            elevator
+            for elevator in candidates
+            if elevator.spec.capacity is None or
+                len(elevator.passengers) + sum(elevator.assigned.values()) < elevator.spec.capacity
+        ]
+        candidates = with_room or candidates
+        if len(candidates) == 0:
+            return None
+        return min(
+            candidates,
+            key=lambda elevator: (self.passenger_cost(building, elevator, passenger), elevator.elevator_id)
+        )
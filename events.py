@@ -0,0 +1,414 @@
+import bisect
+import heapq
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from model import Building, Elevator, Passenger
+
+
+# events at the same time run elevators first: an elevator event at time t is
+# the tick that takes building.time to t, while an arrival at time t happens
+# once that tick is over (just like add_passenger between two time_steps)
+ELEVATOR_EVENT = 0
+ARRIVAL_EVENT = 1
+# cause of a next elevator event that depends on every hall call
+VOLATILE = "volatile"
+# after this many elevator events on consecutive ticks the next as many ticks
+# are simulated without working out when the next event is
+BUSY_TICKS = 8
+
+
+class EventDrivenSimulation:
+
+    # Next-event version of calling Building.time_step in a loop. Ticks where
+    # every elevator is just travelling along its floor_path (or parking) and
+    # nobody arrives are skipped in one jump; only ticks where an elevator
+    # unloads, boards, reaches its desired_floor or gets dispatched are
+    # simulated. Wait and ride times come from the arrival, boarding and
+    # alighting timestamps, so they match tick mode without touching every
+    # passenger on every tick.
+
+    def __init__(self, building: Building):
+        if building is None:
+            raise ValueError("ERROR: building may not be None")
+        if building.elevator_spec.timed or any(elevator.spec.timed for elevator in building.elevators):
+            # travel along floor_path is skipped one floor per tick
+            raise ValueError("ERROR: event mode needs elevators without door, transfer or travel times")
+        if building.demand is not None:
+            # learned parking floors move with every arrival and car, so
+            # parking can't be skipped ahead
+            raise ValueError("ERROR: event mode doesn't support demand model parking")
+        self.building = building
+        self.events = []
+        self.completed_passengers = []  # type: List[Passenger]
+        self._event_seq = 0
+        self._elevator_event_version = 0
+        self._scheduled_time = None  # of the current elevator event
+        self._busy_ticks = 0  # elevator events on consecutive ticks so far
+        self._tick_until = None  # simulate every tick up to here
+        # zone -> whether it has pending calls, from the last tick on; only
+        # looked at while scheduling
+        self._pending = {}  # type: Dict[object, bool]
+        self._scheduling = False
+        # elevator -> (state key, next event time) from _next_event, and
+        # (car key, sorted target floor indices) from _target_floors
+        self._next_events = {}  # type: Dict[Elevator, tuple]
+        self._targets = {}  # type: Dict[Elevator, tuple]
+        self._exact_calls = len(building.zones) > 0 or building.scheduling == "destination"
+        self._schedule_elevators()
+
+    def _push(self, time: int, kind: int, payload) -> None:
+        heapq.heappush(self.events, (time, kind, self._event_seq, payload))
+        self._event_seq += 1
+
+    def add_passenger(self, passenger: Passenger, time: int=None) -> None:
+        if time is None:
+            time = self.building.time
+        if time < self.building.time:
+            raise ValueError("ERROR: passengers can't arrive in the past")
+        self._push(time, ARRIVAL_EVENT, passenger)
+
+    def add_passengers(self, passengers: List[Passenger], time: int=None) -> None:
+        for passenger in passengers:
+            self.add_passenger(passenger, time=time)
+
+    def add_arrivals(self, arrivals: Iterable) -> None:
+        # (time, origin, destination) arrivals in time order, pulled from the
+        # stream one at a time as the simulation reaches them
+        self._push_next_arrival(iter(arrivals))
+
+    def take_arrivals(self) -> None:
+        # hand the building's own arrival stream (Building.add_arrivals) over
+        # to the event heap
+        building = self.building
+        if building.arrivals_pending:
+            self.add_arrivals(itertools.chain([building.next_arrival], building.arrivals))
+            building.arrivals = building.next_arrival = None
+
+    def _push_next_arrival(self, arrivals: Iterator) -> None:
+        arrival = next(arrivals, None)
+        if arrival is not None:
+            time, origin_floor, desired_floor = arrival
+            self._push(
+                max(time, self.building.time), ARRIVAL_EVENT,
+                (origin_floor, desired_floor, arrivals)
+            )
+
+    def _car_key(self, elevator: Elevator) -> tuple:
+        # The car's own state next_elevator_event depends on, except where it
+        # is on its floor_path: moving along the path doesn't change the tick
+        # the next event happens at. A rider getting on changes the last
+        # rider, one getting off the rider count. With zones or destination
+        # scheduling who the car can take depends on who waits.
+        building = self.building
+        passengers = elevator.passengers
+        path = elevator.floor_path
+        key = (
+            elevator.desired_floor, elevator.current_vector, path.stop, path.step,
+            len(passengers), passengers[-1] if len(passengers) > 0 else None,
+        )
+        if self._exact_calls:
+            key += (building.waiting_version, sum(elevator.assigned.values()))
+        if building.scheduling != "single":
+            key += (tuple(elevator.stops.up), tuple(elevator.stops.down))
+        return key
+
+    def _target_floors(self, elevator: Elevator, car_key: tuple) -> List[int]:
+        # Sorted indices of the floors the car has to stop at for somebody:
+        # its riders' floors and, under destination scheduling, the floors
+        # where passengers given to it still wait. Passing such a floor drops
+        # its stops and the tick after puts them back
+        # (Building._recall_left_behind), so both ticks have to be simulated.
+        cached = self._targets.get(elevator)
+        if cached is not None and cached[0] == car_key:
+            return cached[1]
+        building = self.building
+        floors = set(passenger.desired_floor for passenger in elevator.passengers)
+        if len(elevator.assigned) > 0:
+            floors.update(
+                floor
+                for (floor, vector), queue in building.hall_calls.items()
+                if any(passenger.elevator is elevator for passenger in queue)
+            )
+        targets = sorted(building.floor_index[floor] for floor in floors)
+        self._targets[elevator] = (car_key, targets)
+        return targets
+
+    def next_elevator_event(self, elevator: Elevator) -> Optional[int]:
+        return self._event_and_cause(elevator, self._car_key(elevator))[0]
+
+    def _event_and_cause(self, elevator: Elevator, car_key: tuple) -> tuple:
+        # the tick of the car's next event and the hall call that event is
+        # for: None if it doesn't depend on any, VOLATILE if it depends on
+        # all of them
+        building = self.building
+        now = building.time
+        targets = self._target_floors(elevator, car_key)
+        floor_idx = building.floor_index[elevator.current_floor]
+        target_pos = bisect.bisect_left(targets, floor_idx)
+        if target_pos < len(targets) and targets[target_pos] == floor_idx:
+            return now + 1, None
+        passenger = building.get_boarding_passenger(elevator)
+        if passenger is not None:
+            return now + 1, (elevator.current_floor, passenger.vector)
+        if building.scheduling != "single" and len(elevator.stops) > 0 and \
+                elevator.stops.next_stop(elevator.current_floor, elevator.current_vector) != elevator.desired_floor:
+            # a stop added since the last tick (a new assignment) retargets
+            # the car in the next one
+            return now + 1, None
+        path = elevator.floor_path
+        if len(path) > 0:
+            # arriving at a stop changes what the dispatcher sees in that very
+            # tick: reaching desired_floor frees the elevator, and a hall call
+            # on the current floor is no longer covered by its floor_path.
+            # Everything is worked out as floor indices along the path, the
+            # first target and hall call ahead found by bisecting.
+            steps = []
+            desired_idx = building.floor_index.get(elevator.desired_floor, -1)
+            if path.step == 1:
+                ahead = [targets[target_pos]] if target_pos < len(targets) else []
+            else:
+                ahead = [targets[target_pos - 1]] if target_pos > 0 else []
+            for stop_idx in ahead + [desired_idx]:
+                step = (stop_idx - path.start) * path.step
+                if 0 <= step < len(path):
+                    steps.append(step)
+            vector = elevator.current_vector
+            if vector in ("^", "v"):
+                floor_idxs = building._calls_by_vector()[vector][0]
+                call_idx = None
+                if path.step == 1:
+                    call_pos = bisect.bisect_left(floor_idxs, path.start)
+                    if call_pos < len(floor_idxs) and floor_idxs[call_pos] < path.stop:
+                        call_idx = floor_idxs[call_pos]
+                else:
+                    call_pos = bisect.bisect_right(floor_idxs, path.start)
+                    if call_pos > 0 and floor_idxs[call_pos - 1] > path.stop:
+                        call_idx = floor_idxs[call_pos - 1]
+                if call_idx is not None:
+                    call_step = (call_idx - path.start) * path.step
+                    if len(steps) == 0 or call_step < min(steps):
+                        return now + 1 + call_step, (building.floors[call_idx], vector)
+            if len(steps) > 0:
+                return now + 1 + min(steps), None
+        if len(elevator.floor_path) == 0 and len(elevator.stops) > 0:
+            # has somewhere to go but has not picked its next stop yet
+            return now + 1, None
+        if building.has_calls(elevator.zone):
+            if self._has_pending_calls(elevator.zone):
+                return now + 1, VOLATILE
+            # pending calls also depend on where the other cars are going
+            return None, VOLATILE
+        # idle with nothing to do, or parking which _fast_forward handles
+        return None, None
+
+    def _has_pending_calls(self, zone) -> bool:
+        # asked for every idle car, but the same for a whole zone until the
+        # next tick (_call_added keeps it up to date between ticks)
+        if not self._scheduling:
+            return len(self.building.get_pending_calls(zone)) > 0
+        if zone not in self._pending:
+            self._pending[zone] = len(self.building.get_pending_calls(zone)) > 0
+        return self._pending[zone]
+
+    def _next_event(self, elevator: Elevator) -> Optional[int]:
+        # next_elevator_event, reused while the car's own state is unchanged,
+        # the event is still ahead and the hall call it's for (if any) is
+        # still there: a car riding along its floor_path between two events
+        # isn't looked at again. Between two arrivals hall calls only go
+        # away, which can't make any other event earlier; arrivals update
+        # the entries themselves in _call_added. With zones or destination
+        # scheduling, who waits matters too, and any change to the calls or
+        # the waiting passengers looks at every car again.
+        building = self.building
+        if len(elevator.passengers) == 0 and len(elevator.floor_path) == 0 and \
+                len(elevator.stops) == 0 and len(elevator.assigned) == 0:
+            # idle: next_elevator_event comes down to a call where it is or
+            # anywhere else no other car is going to
+            self._next_events.pop(elevator, None)
+            if building.get_boarding_passenger(elevator) is not None or \
+                    (building.has_calls(elevator.zone) and self._has_pending_calls(elevator.zone)):
+                return building.time + 1
+            return None
+        car_key = self._car_key(elevator)
+        cached = self._next_events.get(elevator)
+        if cached is not None and cached[0] == car_key and \
+                (cached[1] is None or cached[1] > building.time):
+            calls_version, calls = cached[3], cached[4]
+            if calls_version == building.calls_version:
+                return cached[1]
+            cause = cached[2]
+            # calls only went away since: the version moved by as much as
+            # the count went down
+            if not self._exact_calls and \
+                    building.calls_version - calls_version == calls - len(building.hall_calls) and \
+                    cause is not VOLATILE and (cause is None or cause in building.hall_calls):
+                self._next_events[elevator] = (
+                    car_key, cached[1], cause, building.calls_version, len(building.hall_calls)
+                )
+                return cached[1]
+        event_time, cause = self._event_and_cause(elevator, car_key)
+        if event_time is None and cause is VOLATILE:
+            self._next_events.pop(elevator, None)
+        else:
+            self._next_events[elevator] = (
+                car_key, event_time, cause, building.calls_version, len(building.hall_calls)
+            )
+        return event_time
+
+    def _call_added(self, passenger: Passenger) -> List[Elevator]:
+        # A new passenger can only bring a car's next event forward: to the
+        # next tick if the car can take them where it is, or to their floor
+        # if it's on the car's floor_path in their direction. Returns the
+        # cars whose next event may have moved.
+        building = self.building
+        if self._exact_calls:
+            self._pending = {}
+            return building.elevators
+        floor = passenger.origin_floor
+        floor_idx = building.floor_index[floor]
+        touched = []
+        covered = False
+        for elevator in building.elevators:
+            # get_pending_calls leaves out calls on a car's way there
+            path = elevator.floor_path
+            step = (floor_idx - path.start) * path.step
+            if elevator.desired_floor == floor or (
+                passenger.vector == elevator.current_vector and not elevator.is_full and
+                0 <= step < len(path)
+            ):
+                covered = True
+        if None in self._pending and not covered:
+            self._pending[None] = True
+        for elevator in building.elevators:
+            cached = self._next_events.get(elevator)
+            if cached is None or cached[1] is None or \
+                    building.calls_version - cached[3] != len(building.hall_calls) - cached[4]:
+                # idle cars look at the pending calls again, and a call
+                # went away in the meantime (only _next_event knows which)
+                self._next_events.pop(elevator, None)
+                touched.append(elevator)
+                continue
+            event_time, cause = cached[1], cached[2]
+            if elevator.current_floor == floor and event_time > building.time + 1:
+                boarding = building.get_boarding_passenger(elevator)
+                if boarding is not None:
+                    event_time, cause = building.time + 1, (floor, boarding.vector)
+            path = elevator.floor_path
+            step = (floor_idx - path.start) * path.step
+            if passenger.vector == elevator.current_vector and 0 <= step < len(path) and \
+                    building.time + 1 + step < event_time:
+                event_time, cause = building.time + 1 + step, (floor, passenger.vector)
+            if event_time != cached[1]:
+                touched.append(elevator)
+            self._next_events[elevator] = (
+                cached[0], event_time, cause, building.calls_version, len(building.hall_calls)
+            )
+        return touched
+
+    def _schedule_elevators(self, elevators: List[Elevator]=None) -> None:
+        # the next elevator event over every car, or only over `elevators`
+        # when no other car's next event moved since the last one
+        if elevators is None:
+            # supersedes the pending elevator event
+            self._elevator_event_version += 1
+            self._scheduled_time = None
+            self._pending = {}
+            elevators = self.building.elevators
+        self._scheduling = True
+        event_times = [
+            event_time
+            for event_time in map(self._next_event, elevators)
+            if event_time is not None
+        ]
+        self._scheduling = False
+        if self._scheduled_time is not None:
+            event_times.append(self._scheduled_time)
+        if len(event_times) > 0 and min(event_times) != self._scheduled_time:
+            if self._scheduled_time is not None:
+                self._elevator_event_version += 1
+            self._scheduled_time = min(event_times)
+            self._push(self._scheduled_time, ELEVATOR_EVENT, self._elevator_event_version)
+
+    def _fast_forward(self, time: int) -> None:
+        # move every travelling or parking elevator time - building.time
+        # floors at once; callers guarantee no event happens in between
+        building = self.building
+        ticks = time - building.time
+        if ticks <= 0:
+            return
+        for elevator in building.elevators:
+            if len(elevator.floor_path) > 0:
+                if building.scheduling != "single":
+                    # Building._advance_look heads the car the way it moves
+                    elevator.current_vector = building.get_vector_direction(
+                        elevator.current_floor, elevator.floor_path[0]
+                    )
+                elevator.current_floor = elevator.floor_path[ticks - 1]
+                elevator.floor_path.advance(ticks)
+                continue
+            parking_floor = building.get_parking_floor(elevator)
+            if not building.has_calls(elevator.zone) and elevator.current_floor != parking_floor:
+                parking_path = building.get_path_view(elevator.current_floor, parking_floor)
+                elevator.current_floor = parking_path[min(ticks, len(parking_path)) - 1]
+        building.time = time
+
+    def run(self, until: int=None) -> None:
+        building = self.building
+        while len(self.events) > 0:
+            time, kind, _, payload = self.events[0]
+            if until is not None and time > until:
+                break
+            heapq.heappop(self.events)
+            if kind == ARRIVAL_EVENT:
+                self._fast_forward(time)
+                if type(payload) == Passenger:
+                    passenger = payload
+                else:
+                    origin_floor, desired_floor, arrivals = payload
+                    passenger = Passenger(origin_floor, desired_floor, building)
+                    self._push_next_arrival(arrivals)
+                building.add_passenger(passenger)
+                touched = self._call_added(passenger)
+                if self._scheduled_time != building.time + 1:
+                    # nothing happens sooner than the next tick
+                    self._schedule_elevators(touched)
+                continue
+            elif payload != self._elevator_event_version:
+                continue  # stale, superseded by a later _schedule_elevators
+            else:
+                self._fast_forward(time - 1)
+                riders = [
+                    passenger
+                    for elevator in building.elevators
+                        for passenger in elevator.passengers
+                ]
+                building.advance_elevators()
+                self.completed_passengers.extend(
+                    passenger
+                    for passenger in riders
+                    if passenger.alighting_time == building.time
+                )
+                if self._tick_until is not None and building.time < self._tick_until and (
+                    len(building.hall_calls) > 0 or
+                    any(len(elevator.passengers) > 0 for elevator in building.elevators)
+                ):
+                    # busy traffic, an event on nearly every tick: a tick too
+                    # many is cheaper than looking for the next event, as
+                    # long as it isn't the last one
+                    self._elevator_event_version += 1
+                    self._scheduled_time = building.time + 1
+                    self._pending = {}
+                    self._push(self._scheduled_time, ELEVATOR_EVENT, self._elevator_event_version)
+                    continue
+            self._schedule_elevators()
+            if self._scheduled_time == building.time + 1:
+                self._busy_ticks += 1
+                if self._busy_ticks >= BUSY_TICKS:
+                    self._tick_until = building.time + BUSY_TICKS
+            else:
+                self._busy_ticks = 0
+                self._tick_until = None
+        # with nothing left to simulate the clock stays at the last event
+        if until is not None and len(self.events) > 0:
+            self._fast_forward(until)
@@ -0,0 +1,270 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from typing import Dict, List, Tuple
+
+from benchmark import build_scenario
+from metrics import MetricsSink, TripStats
+from model import Building, Elevator, Passenger
+
+
+# build_scenario arguments every building gets unless the fleet's traffic
+# settings or the building itself say otherwise
+FLEET_DEFAULTS = {
+    "profile": "poisson",
+    "dispatcher": "nearest",
+    "seed": 0,
+    "duration": 3600,
+}
+# waits up to this many ticks count as served on time in the report
+SERVICE_LEVEL_WAIT = 30
+
+
+class TripDeltas(MetricsSink):
+
+    # the trips completed since the last take(), as TripStats: exact value
+    # histograms, so a batch's delta is a few hundred numbers however many
+    # passengers it had, and deltas merge without losing any percentile
+
+    def __init__(self):
+        self.stats = TripStats()
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        self.stats.add(passenger.time_waiting_for_elevator, passenger.time_inside_elevator)
+
+    def take(self) -> TripStats:
+        stats, self.stats = self.stats, TripStats()
+        return stats
+
+
+def fleet_scenarios(buildings: List[Dict], traffic: Dict=None) -> List[Tuple[str, Dict]]:
+    # (name, build_scenario kwargs) per building: FLEET_DEFAULTS, then the
+    # shared traffic settings, then the building's own; buildings without
+    # a seed of their own get the traffic seed plus their position so they
+    # don't all see the same arrivals
+    scenarios = []
+    names = set()
+    for building_idx, building in enumerate(buildings):
+        scenario = dict(FLEET_DEFAULTS)
+        scenario.update(traffic or {})
+        scenario.update(building)
+        if "seed" not in building:
+            scenario["seed"] += building_idx
+        name = str(scenario.pop("name", building_idx))
+        if name in names:
+            raise ValueError("ERROR: building names must be unique within a fleet")
+        names.add(name)
+        scenarios.append((name, scenario))
+    return scenarios
+
+
+def partition_fleet(scenarios: List[Tuple[str, Dict]], workers: int) -> List[List[Tuple[str, Dict]]]:
+    # Longest processing time first: the most expensive building goes to
+    # the least loaded worker until none are left, which keeps the shards
+    # within a building of each other. A tick costs about one unit per car
+    # and a passenger about one tick's worth.
+    shards = [[] for worker_idx in range(workers)]
+    loads = [0] * workers
+    for name, scenario in sorted(
+        scenarios, key=lambda item: _building_cost(item[1]), reverse=True
+    ):
+        worker_idx = loads.index(min(loads))
+        shards[worker_idx].append((name, scenario))
+        loads[worker_idx] += _building_cost(scenario)
+    return [shard for shard in shards if len(shard) > 0]
+
+
+def _building_cost(scenario: Dict) -> int:
+    return scenario["duration"] * scenario["cars"] + scenario["passengers"]
+
+
+def _fleet_worker(connection, shard: List[Tuple[str, Dict]]) -> None:
+    # Builds its buildings, then for every tick it's sent runs them all up
+    # to that tick and sends back (name, TripStats delta, time, waiting,
+    # done) per building; None stops it. Buildings are built here from
+    # their scenarios rather than pickled across, arrival streams and all.
+    try:
+        buildings = []
+        for name, scenario in shard:
+            building = build_scenario(**scenario)
+            deltas = TripDeltas()
+            building.metrics.append(deltas)
+            buildings.append((name, building, deltas))
+        connection.send(("ready", None))
+        while True:
+            until = connection.recv()
+            if until is None:
+                break
+            batch = []
+            for name, building, deltas in buildings:
+                while building.time < until and not building.is_idle():
+                    building.time_step()
+                batch.append((
+                    name, deltas.take(), building.time,
+                    sum(len(queue) for queue in building.hall_calls.values()),
+                    building.is_idle()
+                ))
+            connection.send(("batch", batch))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class FleetSummary:
+
+    # merges the per batch deltas the workers send back into per building
+    # and whole fleet TripStats
+
+    def __init__(self, names: List[str], service_level_wait: int=SERVICE_LEVEL_WAIT):
+        self.service_level_wait = service_level_wait
+        self.overall = TripStats()
+        self.by_building = {name: TripStats() for name in names}
+        self.time = {name: 0 for name in names}
+        self.waiting = {name: 0 for name in names}
+        self.done = {name: False for name in names}
+        self.batches = 0
+
+    def add_batch(self, batch: List[tuple]) -> None:
+        for name, stats, building_time, waiting, done in batch:
+            self.overall.merge(stats)
+            self.by_building[name].merge(stats)
+            self.time[name] = building_time
+            self.waiting[name] = waiting
+            self.done[name] = done
+
+    def _service(self, stats: TripStats) -> Dict:
+        summary = stats.summary()
+        summary["waits_within_service_level"] = stats.wait.fraction_at_most(self.service_level_wait)
+        return summary
+
+    def summary(self) -> Dict:
+        return {
+            "buildings": len(self.by_building),
+            "batches": self.batches,
+            "served": self.overall.trip.count,
+            "still_waiting": sum(self.waiting.values()),
+            "service_level_wait": self.service_level_wait,
+            "overall": self._service(self.overall),
+            "by_building": {
+                name: dict(
+                    self._service(stats), ticks=self.time[name], served=stats.trip.count,
+                    still_waiting=self.waiting[name], done=self.done[name]
+                )
+                for name, stats in self.by_building.items()
+            },
+        }
+
+
+def run_fleet(buildings: List[Dict], traffic: Dict=None, workers: int=None, batch_ticks: int=300,
+              max_ticks: int=None, service_level_wait: int=SERVICE_LEVEL_WAIT,
+              progress=None) -> Dict:
+    # Simulates a portfolio of buildings together: buildings are spread over
+    # worker processes by partition_fleet, all of them advance in lockstep
+    # batches of batch_ticks ticks, and after each batch every worker sends
+    # back only the TripStats deltas of its buildings, which FleetSummary
+    # merges into fleet wide percentiles. The run stops when every building
+    # has served everybody or after max_ticks (4 * the longest duration by
+    # default). progress, if given, is called with the summary after every
+    # batch.
+    if batch_ticks < 1:
+        raise ValueError("ERROR: batch_ticks must be at least 1")
+    scenarios = fleet_scenarios(buildings, traffic)
+    if len(scenarios) == 0:
+        raise ValueError("ERROR: a fleet needs at least one building")
+    if max_ticks is None:
+        max_ticks = 4 * max(scenario["duration"] for name, scenario in scenarios)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    shards = partition_fleet(scenarios, min(workers, len(scenarios)))
+    summary = FleetSummary([name for name, scenario in scenarios], service_level_wait)
+    started = time.perf_counter()
+    connections = []
+    processes = []
+    try:
+        for shard in shards:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_fleet_worker, args=(worker_connection, shard))
+            process.start()
+            worker_connection.close()
+            connections.append(connection)
+            processes.append(process)
+        for connection in connections:
+            _receive(connection)
+        tick = 0
+        while tick < max_ticks and not all(summary.done.values()):
+            tick = min(tick + batch_ticks, max_ticks)
+            # every worker runs the batch before any result is waited on
+            for connection in connections:
+                connection.send(tick)
+            for connection in connections:
+                summary.add_batch(_receive(connection))
+            summary.batches += 1
+            if progress is not None:
+                progress(summary)
+        for connection in connections:
+            connection.send(None)
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+    report = summary.summary()
+    report["workers"] = len(shards)
+    report["batch_ticks"] = batch_ticks
+    report["wall_seconds"] = time.perf_counter() - started
+    return report
+
+
+def _receive(connection):
+    try:
+        kind, payload = connection.recv()
+    except EOFError:
+        raise RuntimeError("ERROR: a fleet worker exited without a reply")
+    if kind == "error":
+        raise RuntimeError("ERROR: a fleet worker failed:\n" + payload)
+    return payload
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Simulate a fleet of buildings together across worker processes"
+    )
+    parser.add_argument(
+        "fleet",
+        help='JSON file like {"traffic": {"profile": "up_peak"}, "buildings": '
+             '[{"name": "hq", "floors": 30, "cars": 6, "passengers": 2000}]}'
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-ticks", type=int, default=300)
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--service-level-wait", type=int, default=SERVICE_LEVEL_WAIT,
+                        help="waits up to this many ticks count as on time")
+    args = parser.parse_args(argv)
+    with open(args.fleet) as fleet_file:
+        fleet = json.load(fleet_file)
+
+    def progress(summary):
+        print(
+            "batch {0}: {1} served, {2} waiting, {3} of {4} buildings done".format(
+                summary.batches, summary.overall.trip.count, sum(summary.waiting.values()),
+                sum(summary.done.values()), len(summary.done)
+            ),
+            file=sys.stderr
+        )
+
+    report = run_fleet(
+        fleet["buildings"], traffic=fleet.get("traffic"), workers=args.workers,
+        batch_ticks=args.batch_ticks, max_ticks=args.max_ticks,
+        service_level_wait=args.service_level_wait, progress=progress
+    )
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
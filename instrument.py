@@ -0,0 +1,279 @@
+import json
+import time
+from typing import Callable, Dict, List
+
+from model import Building, Elevator
+
+
+def _waiting_and_riding(building: Building, *args, **kwargs) -> int:
+    return sum(len(queue) for queue in building.hall_calls.values()) + \
+        sum(len(elevator.passengers) for elevator in building.elevators)
+
+
+def _hall_calls(building: Building, *args, **kwargs) -> int:
+    return len(building.hall_calls)
+
+
+def _elevators(building: Building, *args, **kwargs) -> int:
+    return len(building.elevators)
+
+
+def _first_arg_len(building: Building, collection, *args, **kwargs) -> int:
+    return len(collection)
+
+
+def _riders(building: Building, elevator: Elevator, *args, **kwargs) -> int:
+    return len(elevator.passengers)
+
+
+def _idle_times_calls(building: Building, dispatcher_building: Building, idle_elevators, *args, **kwargs) -> int:
+    return len(idle_elevators) * len(building.hall_calls)
+
+
+def _own_riders(elevator: Elevator, *args, **kwargs) -> int:
+    return len(elevator.passengers)
+
+
+# Building methods timed as phases, with the size of the collection each one
+# scans (None: nothing worth counting)
+BUILDING_PHASES = {
+    "time_step": None,
+    "pull_arrivals": None,
+    "incr_passenger_times": _waiting_and_riding,
+    "advance_elevators": _elevators,
+    "_advance_single": _riders,
+    "_advance_look": _riders,
+    "get_boarding_passenger": _hall_calls,
+    "_dispatch": _first_arg_len,
+    "has_calls": _hall_calls,
+    "get_pending_calls": _hall_calls,
+    "get_parking_floor": None,
+    "get_path_view": None,
+    "add_passenger": None,
+    "assign_passenger": None,
+}
+DISPATCHER_PHASES = {
+    "assign": _idle_times_calls,
+}
+# Elevator has __slots__, so these are wrapped on the class, once for every
+# attached profiler, and look up the profiler by the building they're given
+ELEVATOR_PHASES = {
+    "unload_passenger": _own_riders,
+    "load_passenger": _own_riders,
+    "move_to_floor": _own_riders,
+}
+# building -> PhaseProfiler, for the Elevator class wrappers
+_elevator_profilers = {}  # type: Dict[Building, PhaseProfiler]
+_elevator_methods = {}  # type: Dict[str, Callable]
+
+
+class PhaseStats:
+
+    __slots__ = ("calls", "total_seconds", "self_seconds", "max_seconds", "items", "max_items")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.self_seconds = 0.0
+        self.max_seconds = 0.0
+        self.items = 0
+        self.max_items = None  # phases that scan nothing stay None
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "total_seconds": self.total_seconds,
+            "self_seconds": self.self_seconds,
+            "mean_seconds": self.total_seconds / self.calls if self.calls > 0 else None,
+            "max_seconds": self.max_seconds,
+            "mean_items": self.items / self.calls if self.max_items is not None else None,
+            "max_items": self.max_items,
+        }
+
+
+class PhaseProfiler:
+
+    # Opt in timing of the phases of a tick. attach() swaps the building's
+    # (and its dispatcher's) phase methods for timing wrappers on the
+    # instances themselves and detach() removes them again, so a building
+    # that isn't attached runs exactly the code it always did. Every phase
+    # gets its call count, total and self wall time and the size of the
+    # collection it scanned; with trace=True every call is also kept, up to
+    # max_trace_events, for write_chrome_trace (chrome://tracing, Perfetto).
+    # write_folded writes self time per call stack for flamegraph.pl and
+    # speedscope.
+
+    def __init__(self, trace: bool=False, max_trace_events: int=1000000):
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+        self.phases = {}  # type: Dict[str, PhaseStats]
+        # call stack (tuple of phase names) -> self seconds
+        self.stacks = {}  # type: Dict[tuple, float]
+        self.trace_events = []  # type: List[tuple]
+        self.trace_events_dropped = 0
+        self.building = None
+        self._dispatcher = None
+        self._stack = []  # type: List[list]
+        self._names = []  # type: List[str]
+        self._started = time.perf_counter()
+
+    def _enter(self, name: str) -> None:
+        self._names.append(name)
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, items: int) -> None:
+        ended = time.perf_counter()
+        name, started, child_seconds = self._stack.pop()
+        elapsed = ended - started
+        if len(self._stack) > 0:
+            self._stack[-1][2] += elapsed
+        stack = tuple(self._names)
+        self._names.pop()
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats()
+        stats.calls += 1
+        stats.total_seconds += elapsed
+        stats.self_seconds += elapsed - child_seconds
+        if elapsed > stats.max_seconds:
+            stats.max_seconds = elapsed
+        if items is not None:
+            stats.items += items
+            if stats.max_items is None or items > stats.max_items:
+                stats.max_items = items
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed - child_seconds
+        if self.trace:
+            if len(self.trace_events) < self.max_trace_events:
+                self.trace_events.append((name, started, elapsed, items))
+            else:
+                self.trace_events_dropped += 1
+
+    def _wrap(self, name: str, method: Callable, size: Callable) -> Callable:
+        building = self.building
+
+        def timed(*args, **kwargs):
+            items = size(building, *args, **kwargs) if size is not None else None
+            self._enter(name)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._exit(items)
+        return timed
+
+    def attach(self, building: Building):
+        if self.building is not None:
+            raise ValueError("ERROR: profiler is already attached to a building")
+        if building in _elevator_profilers:
+            raise ValueError("ERROR: building already has a profiler attached")
+        self.building = building
+        for method_name, size in BUILDING_PHASES.items():
+            setattr(building, method_name, self._wrap(
+                "Building." + method_name, getattr(building, method_name), size
+            ))
+        if not any(method_name in vars(building.dispatcher) for method_name in DISPATCHER_PHASES):
+            # a dispatcher shared with another profiled building (a fork)
+            # is only timed by the first profiler
+            self._dispatcher = building.dispatcher
+            dispatcher_name = type(self._dispatcher).__name__
+            for method_name, size in DISPATCHER_PHASES.items():
+                setattr(self._dispatcher, method_name, self._wrap(
+                    dispatcher_name + "." + method_name, getattr(self._dispatcher, method_name), size
+                ))
+        if len(_elevator_profilers) == 0:
+            for method_name, size in ELEVATOR_PHASES.items():
+                _elevator_methods[method_name] = getattr(Elevator, method_name)
+                setattr(Elevator, method_name, _elevator_wrapper(method_name, size))
+        _elevator_profilers[building] = self
+        return self
+
+    def detach(self) -> None:
+        building = self.building
+        if building is None:
+            return
+        for method_name in BUILDING_PHASES:
+            delattr(building, method_name)
+        if self._dispatcher is not None:
+            for method_name in DISPATCHER_PHASES:
+                delattr(self._dispatcher, method_name)
+        del _elevator_profilers[building]
+        if len(_elevator_profilers) == 0:
+            for method_name, method in _elevator_methods.items():
+                setattr(Elevator, method_name, method)
+            _elevator_methods.clear()
+        self.building = self._dispatcher = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        # phases by self time, the biggest first; share is the part of all
+        # profiled time spent in the phase itself
+        total_self = sum(stats.self_seconds for stats in self.phases.values())
+        summary = {}
+        for name, stats in sorted(
+            self.phases.items(), key=lambda item: item[1].self_seconds, reverse=True
+        ):
+            summary[name] = stats.summary()
+            summary[name]["share"] = stats.self_seconds / total_self if total_self > 0 else None
+        return summary
+
+    def format_summary(self) -> str:
+        lines = ["{0:<40} {1:>10} {2:>10} {3:>10} {4:>7} {5:>10}".format(
+            "phase", "calls", "total ms", "self ms", "share", "max items"
+        )]
+        for name, stats in self.summary().items():
+            lines.append("{0:<40} {1:>10} {2:>10.2f} {3:>10.2f} {4:>6.1f}% {5:>10}".format(
+                name, stats["calls"], stats["total_seconds"] * 1000,
+                stats["self_seconds"] * 1000, (stats["share"] or 0) * 100,
+                stats["max_items"] if stats["max_items"] is not None else "-"
+            ))
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict:
+        events = []
+        for name, started, elapsed, items in self.trace_events:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (started - self._started) * 1e6,
+                "dur": elapsed * 1e6,
+                "pid": 0,
+                "tid": 0,
+            }
+            if items is not None:
+                event["args"] = {"items": items}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as output:
+            json.dump(self.chrome_trace(), output)
+
+    def write_folded(self, path: str) -> None:
+        # one "outer;inner;phase microseconds" line per call stack
+        with open(path, "w") as output:
+            for stack, seconds in sorted(self.stacks.items()):
+                output.write("{0} {1}\n".format(";".join(stack), int(round(seconds * 1e6))))
+
+
+def _elevator_wrapper(method_name: str, size: Callable) -> Callable:
+    method = _elevator_methods[method_name]
+    name = "Elevator." + method_name
+
+    def timed(elevator, *args, **kwargs):
+        building = kwargs.get("building")
+        if building is None:
+            building = next((arg for arg in args if type(arg) == Building), None)
+        profiler = _elevator_profilers.get(building)
+        if profiler is None:
+            return method(elevator, *args, **kwargs)
+        items = size(elevator)
+        profiler._enter(name)
+        try:
+            return method(elevator, *args, **kwargs)
+        finally:
+            profiler._exit(items)
+    return timed
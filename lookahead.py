@@ -0,0 +1,172 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from model import Building, Elevator, Floor, StopSet
+
+
+class Candidate:
+
+    # one car scored for a hall call: predicted wait of the new call, the
+    # extra ticks its other riders and waiting passengers would spend and
+    # the cost the two add up to
+
+    __slots__ = ("elevator", "wait", "delay", "cost")
+
+    def __init__(self, elevator: Elevator, wait: float, delay: float, cost: float):
+        self.elevator = elevator
+        self.wait = wait
+        self.delay = delay
+        self.cost = cost
+
+    def __str__(self):
+        return "Elevator {0}: wait {1}, delay {2}, cost {3}".format(
+            self.elevator.elevator_id, self.wait, self.delay, self.cost
+        )
+
+
+class LookaheadEvaluator:
+
+    # Scores handing a hall call to each candidate car by rolling the car
+    # forward up to `horizon` ticks, with and without the call. Assigning a
+    # call to one car doesn't change what the others do, so a candidate
+    # only needs its own position, direction and a copy of its StopSet, and
+    # the affected passengers are just the riders and waiting passengers at
+    # its stops; the building itself is never copied. The roll forward
+    # follows the LOOK order of StopSet.next_stop one stop at a time, with
+    # the car's flight time between stops and a stop taking a tick plus its
+    # door times. Per car the roll without the call is computed once and
+    # shared by every call evaluated against the same building state.
+
+    def __init__(self, horizon: int=300, delay_weight: float=1.0):
+        if horizon < 1:
+            raise ValueError("ERROR: horizon must be at least 1 tick")
+        if delay_weight < 0:
+            raise ValueError("ERROR: delay_weight may not be negative")
+        self.horizon = horizon
+        self.delay_weight = delay_weight
+
+    def _stops(self, building: Building, elevator: Elevator) -> StopSet:
+        stops = StopSet(building)
+        stops.up = list(elevator.stops.up)
+        stops.down = list(elevator.stops.down)
+        if elevator.desired_floor is not None and elevator.desired_floor not in stops:
+            # single scheduling keeps the run's target out of the stop set
+            stops.add(
+                elevator.desired_floor,
+                building.get_vector_direction(elevator.current_floor, elevator.desired_floor)
+            )
+        return stops
+
+    def roll(self, building: Building, elevator: Elevator, stops: StopSet,
+             call: Tuple[Floor, str]=None, call_stop_only: bool=False) -> Tuple[Dict[Floor, float], Optional[float]]:
+        # tick each stop in `stops` is first reached at, counted from now,
+        # for the stops reached within the horizon, and the tick `call` is
+        # picked up at (None if not within the horizon); call_stop_only says
+        # nothing else stops the car at the call's floor
+        spec = elevator.spec
+        stop_time = 1 + spec.door_open_time + spec.door_close_time
+        floor = elevator.current_floor
+        vector = elevator.current_vector
+        time = elevator.busy_time
+        if any(passenger.desired_floor == floor for passenger in elevator.passengers) or \
+                building.get_boarding_passenger(elevator) is not None:
+            # still has to stop right here first
+            time += stop_time
+        arrivals = {}
+        pickup_time = None
+        while time < self.horizon:
+            next_stop = stops.next_stop(floor, vector)
+            if next_stop is None:
+                break
+            vector = building.get_vector_direction(floor, next_stop)
+            time += spec.flight_time(building.floor_distance(floor, next_stop))
+            floor = next_stop
+            stops.discard(floor)
+            if time >= self.horizon:
+                break
+            arrivals.setdefault(floor, time)
+            if not stops.has_stops_ahead(floor, vector):
+                vector = " "
+            if call is not None and pickup_time is None and floor == call[0]:
+                if vector in (" ", call[1]):
+                    # boarding takes the stop's tick, then the passenger
+                    # picks the direction
+                    pickup_time = time + 1
+                    vector = call[1]
+                else:
+                    # passing by the other way, back on the return sweep
+                    stops.add(floor, call[1])
+                    if call_stop_only:
+                        # nobody to let on or off, the car doesn't stop
+                        continue
+            time += stop_time
+        return arrivals, pickup_time
+
+    def _waiting_at(self, building: Building, elevator: Elevator, floor: Floor) -> int:
+        riders = sum(1 for passenger in elevator.passengers if passenger.desired_floor == floor)
+        return riders + sum(
+            len(building.hall_calls.get((floor, vector), ())) for vector in ("^", "v")
+        )
+
+    def _score(self, building: Building, elevator: Elevator, base: Dict[Floor, float],
+               call: Tuple[Floor, str]) -> Candidate:
+        floor, vector = call
+        stops = self._stops(building, elevator)
+        if floor == elevator.current_floor and elevator.current_vector in (" ", vector):
+            # gets on in the next tick
+            arrivals = base
+            wait = elevator.busy_time + 1
+        else:
+            call_stop_only = floor not in stops
+            if floor == elevator.current_floor:
+                # the car is leaving the other way, back on the return sweep
+                stops.add(floor, vector)
+            else:
+                stops.add(floor, building.get_vector_direction(elevator.current_floor, floor))
+            arrivals, pickup_time = self.roll(building, elevator, stops, call, call_stop_only)
+            wait = pickup_time if pickup_time is not None else self.horizon
+        delay = 0.0
+        for stop, arrival in base.items():
+            extra = arrivals.get(stop, self.horizon) - arrival
+            if extra > 0:
+                delay += extra * self._waiting_at(building, elevator, stop)
+        return Candidate(elevator, wait, delay, wait + self.delay_weight * delay)
+
+    def candidates(self, building: Building, floor: Floor) -> List[Elevator]:
+        # cars that could pick somebody up at `floor`
+        return [
+            elevator
+            for elevator in building.elevators
+            if not elevator.is_full and (elevator.zone is None or floor in elevator.zone.floors)
+        ]
+
+    def evaluate_calls(self, building: Building, calls: Iterable[Tuple[Floor, str]],
+                       candidates: List[Elevator]=None) -> Dict[Tuple[Floor, str], List[Candidate]]:
+        # what-if of every call on its own against the current state, the
+        # candidates of each call cheapest first
+        base_rolls = {}
+        results = {}
+        for floor, vector in calls:
+            floor = building.get_floor(floor)
+            if floor is None:
+                raise ValueError("ERROR: floor does not exist in the building")
+            if vector not in ("^", "v"):
+                raise ValueError("ERROR: hall call vector must be ^ or v")
+            scored = []
+            for elevator in (candidates if candidates is not None else self.candidates(building, floor)):
+                if elevator not in base_rolls:
+                    base_rolls[elevator] = self.roll(
+                        building, elevator, self._stops(building, elevator)
+                    )[0]
+                scored.append(self._score(building, elevator, base_rolls[elevator], (floor, vector)))
+            scored.sort(key=lambda candidate: (candidate.cost, candidate.elevator.elevator_id))
+            results[(floor, vector)] = scored
+        return results
+
+    def evaluate(self, building: Building, floor: Floor, vector: str,
+                 candidates: List[Elevator]=None) -> List[Candidate]:
+        return next(iter(self.evaluate_calls(building, [(floor, vector)], candidates).values()))
+
+    def best(self, building: Building, floor: Floor, vector: str,
+             candidates: List[Elevator]=None) -> Optional[Candidate]:
+        scored = self.evaluate(building, floor, vector, candidates)
+        return scored[0] if len(scored) > 0 else None
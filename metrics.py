@@ -0,0 +1,274 @@
+import csv
+import struct
+from collections import deque
+from typing import Dict, Iterator, Tuple
+
+from model import Building, Elevator, Passenger
+
+
+class MetricsSink:
+
+    # Building calls record_trip for every passenger that gets off, after
+    # the arrival, boarding and alighting timestamps have been set
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        raise NotImplementedError()
+
+
+class PrintMetricsSink(MetricsSink):
+
+    # the original per-unload stdout line
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        print("Time waiting, Time inside Elevator = {0}, {1}".format(
+                passenger.time_waiting_for_elevator,
+                passenger.time_inside_elevator
+            )
+        )
+
+
+def nearest_rank(count: int, percent: float) -> int:
+    # 1-based rank of the nearest-rank percentile among count sorted values
+    if not 0 < percent <= 100:
+        raise ValueError("ERROR: percent must be in (0, 100]")
+    return int(max(1, -(-count * percent // 100)))
+
+
+class StreamingStats:
+
+    # Trip times are whole ticks, so an exact value -> count histogram keeps
+    # percentiles exact with memory bounded by the number of distinct values.
+
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = {}
+
+    def add(self, value: int) -> None:
+        self.count += 1
+        self.total += value
+        self.histogram[value] = self.histogram.get(value, 0) + 1
+
+    def merge(self, other) -> None:
+        self.count += other.count
+        self.total += other.total
+        for value, count in other.histogram.items():
+            self.histogram[value] = self.histogram.get(value, 0) + count
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent: float) -> int:
+        # nearest-rank percentile
+        rank = nearest_rank(self.count, percent)
+        if self.count == 0:
+            return None
+        seen = 0
+        for value in sorted(self.histogram):
+            seen += self.histogram[value]
+            if seen >= rank:
+                return value
+
+    def fraction_at_most(self, limit: int) -> float:
+        # share of the values <= limit, e.g. waits within a service level
+        if self.count == 0:
+            return None
+        return sum(count for value, count in self.histogram.items() if value <= limit) / self.count
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class TripStats:
+
+    __slots__ = ("wait", "ride", "trip")
+
+    def __init__(self):
+        self.wait = StreamingStats()
+        self.ride = StreamingStats()
+        self.trip = StreamingStats()
+
+    def add(self, wait: int, ride: int) -> None:
+        self.wait.add(wait)
+        self.ride.add(ride)
+        self.trip.add(wait + ride)
+
+    def merge(self, other) -> None:
+        self.wait.merge(other.wait)
+        self.ride.merge(other.ride)
+        self.trip.merge(other.trip)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            "wait": self.wait.summary(),
+            "ride": self.ride.summary(),
+            "trip": self.trip.summary(),
+        }
+
+
+class TripAggregator(MetricsSink):
+
+    # in memory wait, ride and total trip time stats, overall, per
+    # (origin, destination) floor pair and per elevator
+
+    def __init__(self):
+        self.overall = TripStats()
+        self.by_floor_pair = {}  # type: Dict[Tuple[str, str], TripStats]
+        self.by_elevator = {}  # type: Dict[int, TripStats]
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        wait = passenger.time_waiting_for_elevator
+        ride = passenger.time_inside_elevator
+        self.overall.add(wait, ride)
+        floor_pair = (passenger.origin_floor.floor_id, passenger.desired_floor.floor_id)
+        if floor_pair not in self.by_floor_pair:
+            self.by_floor_pair[floor_pair] = TripStats()
+        self.by_floor_pair[floor_pair].add(wait, ride)
+        if elevator.elevator_id not in self.by_elevator:
+            self.by_elevator[elevator.elevator_id] = TripStats()
+        self.by_elevator[elevator.elevator_id].add(wait, ride)
+
+    def merge(self, other) -> None:
+        self.overall.merge(other.overall)
+        for floor_pair, stats in other.by_floor_pair.items():
+            self.by_floor_pair.setdefault(floor_pair, TripStats()).merge(stats)
+        for elevator_id, stats in other.by_elevator.items():
+            self.by_elevator.setdefault(elevator_id, TripStats()).merge(stats)
+
+    def summary(self) -> Dict:
+        return {
+            "overall": self.overall.summary(),
+            "by_floor_pair": {
+                "{0}->{1}".format(*floor_pair): stats.summary()
+                for floor_pair, stats in self.by_floor_pair.items()
+            },
+            "by_elevator": {
+                elevator_id: stats.summary()
+                for elevator_id, stats in self.by_elevator.items()
+            },
+        }
+
+
+class HandlingCapacity(MetricsSink):
+
+    # passengers delivered per `window` ticks; with one tick a second the
+    # default window is the 5 minute handling capacity (HC5) banks are sized
+    # by. Keeps a count per consecutive window and the busiest sliding one.
+
+    def __init__(self, window: int=300):
+        if window < 1:
+            raise ValueError("ERROR: window must be at least 1 tick")
+        self.window = window
+        self.windows = {}  # type: Dict[int, int]
+        self.recent = deque()
+        self.peak = 0
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        alighting_time = passenger.alighting_time
+        window_idx = alighting_time // self.window
+        self.windows[window_idx] = self.windows.get(window_idx, 0) + 1
+        self.recent.append(alighting_time)
+        while self.recent[0] <= alighting_time - self.window:
+            self.recent.popleft()
+        self.peak = max(self.peak, len(self.recent))
+
+    def summary(self) -> Dict[str, float]:
+        if len(self.windows) == 0:
+            mean = None
+        else:
+            # quiet windows in between count as zero
+            mean = sum(self.windows.values()) / (max(self.windows) - min(self.windows) + 1)
+        return {
+            "window": self.window,
+            "peak": self.peak,
+            "mean": mean,
+        }
+
+
+TRIP_LOG_FIELDS = (
+    "origin", "destination", "elevator", "arrival_time", "boarding_time", "alighting_time"
+)
+# floor indices and elevator id as int32, timestamps as int64, little endian
+TRIP_LOG_RECORD = struct.Struct("<iiiqqq")
+
+
+class TripLogWriter(MetricsSink):
+
+    # Buffered trip log; rows are kept in memory and written buffer_size at a
+    # time so unloading a passenger never waits on I/O. "binary" files are
+    # packed TRIP_LOG_RECORDs, "csv" files have a TRIP_LOG_FIELDS header.
+
+    def __init__(self, path: str, log_format: str="binary", buffer_size: int=4096):
+        if log_format not in ("binary", "csv"):
+            raise ValueError("ERROR: log_format must be 'binary' or 'csv'")
+        if buffer_size < 1:
+            raise ValueError("ERROR: buffer_size must be at least 1")
+        self.log_format = log_format
+        self.buffer_size = buffer_size
+        self.buffer = []
+        if log_format == "binary":
+            self.log_file = open(path, "wb")
+        else:
+            self.log_file = open(path, "w", newline="")
+            self.csv_writer = csv.writer(self.log_file)
+            self.csv_writer.writerow(TRIP_LOG_FIELDS)
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        self.buffer.append((
+            building.floor_index[passenger.origin_floor],
+            building.floor_index[passenger.desired_floor],
+            elevator.elevator_id,
+            passenger.arrival_time,
+            passenger.boarding_time,
+            passenger.alighting_time,
+        ))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.log_format == "binary":
+            self.log_file.write(b"".join(
+                TRIP_LOG_RECORD.pack(*row) for row in self.buffer
+            ))
+        else:
+            self.csv_writer.writerows(self.buffer)
+        self.buffer = []
+        self.log_file.flush()
+
+    def close(self) -> None:
+        if not self.log_file.closed:
+            self.flush()
+            self.log_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trip_log(path: str, log_format: str="binary") -> Iterator[Tuple[int, ...]]:
+    if log_format == "binary":
+        with open(path, "rb") as log_file:
+            while True:
+                chunk = log_file.read(TRIP_LOG_RECORD.size * 4096)
+                if not chunk:
+                    return
+                yield from TRIP_LOG_RECORD.iter_unpack(chunk)
+    elif log_format == "csv":
+        with open(path, newline="") as log_file:
+            for row in csv.DictReader(log_file):
+                yield tuple(int(row[field]) for field in TRIP_LOG_FIELDS)
+    else:
+        raise ValueError("ERROR: log_format must be 'binary' or 'csv'")
@@ -1,29 +1,139 @@
 
-from typing import List, Union
+import bisect
+import heapq
+import itertools
+import math
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 FLOOR_STR_SIZE = 4 + 2 + 1 # 7, current format is 'F: ' + TWO_CHARS + ')'
 PASSENGER_STR_SIZE = 4 + (FLOOR_STR_SIZE*2) + 4 + 1 # 23, current format is '[P: ' + FLOOR + ' -> ' + FLOOR + ']'
 ELEVATOR_STR_SIZE = PASSENGER_STR_SIZE + 2 # 25, current format is '|' + PASSENGER + '|'
+# "single": one passenger gets on or off per elevator per tick and an elevator
+# heads for its single farthest desired_floor; "look": an elevator works
+# through its stop set in LOOK order and a stop lets everybody off and on;
+# "destination": destination dispatch, every passenger is given a car by
+# the dispatcher's assign_passenger as they arrive, cars run LOOK and only
+# pick up the passengers given to them
+SCHEDULING_MODES = ("single", "look", "destination")
+# get_pending_calls results kept per building, least recently used dropped
+PENDING_CALLS_CACHE_SIZE = 64
 
 
 class Floor:
-    floor_id = None
+
+    __slots__ = ("floor_id",)
 
     def __init__(self, floor_id: str):
         if floor_id is None:
             raise ValueError("ERROR: floor_id may not be None")
         self.floor_id = floor_id
 
+    def __eq__(self, other):
+        return type(other) == Floor and self.floor_id == other.floor_id
+
+    def __hash__(self):
+        return hash(self.floor_id)
+
     def __str__(self):
         return "(F: {0: >2s})".format(self.floor_id)
 
 
+class FloorPath:
+
+    # The floors an elevator still has to pass as a view on building.floors:
+    # indices start, start + step, ... up to but not including stop. Moving
+    # along it only bumps start, and a floor is on it if its index is in
+    # range, so travelling elevators don't allocate or scan lists.
+
+    __slots__ = ("floors", "floor_index", "start", "stop", "step")
+
+    def __init__(self, floors: List[Floor], floor_index: dict, start: int, stop: int, step: int=1):
+        if step not in (1, -1):
+            raise ValueError("ERROR: a floor path moves one floor at a time")
+        self.floors = floors
+        self.floor_index = floor_index
+        self.start = start
+        self.stop = stop
+        self.step = step
+
+    def __len__(self) -> int:
+        return max(0, (self.stop - self.start) * self.step)
+
+    def __getitem__(self, idx: int) -> Floor:
+        length = len(self)
+        if idx < 0:
+            idx += length
+        if not 0 <= idx < length:
+            raise IndexError("floor path index out of range")
+        return self.floors[self.start + idx * self.step]
+
+    def __iter__(self):
+        for floor_idx in range(self.start, self.stop, self.step):
+            yield self.floors[floor_idx]
+
+    def __contains__(self, floor: Floor) -> bool:
+        floor_idx = self.floor_index.get(floor)
+        if floor_idx is None:
+            return False
+        if self.step == 1:
+            return self.start <= floor_idx < self.stop
+        return self.stop < floor_idx <= self.start
+
+    def __eq__(self, other):
+        if type(other) not in (FloorPath, list):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def advance(self, floors: int=1) -> None:
+        self.start += self.step * min(floors, len(self))
+
+    def copy(self):
+        return FloorPath(self.floors, self.floor_index, self.start, self.stop, self.step)
+
+    def __str__(self):
+        return "[" + ", ".join(str(floor) for floor in self) + "]"
+
+
+class Zone:
+
+    # A group of elevators (a bank) and the floors it serves, e.g. a low rise
+    # bank, an express bank running from the lobby to a sky lobby, or a high
+    # rise bank above it. Built with Building.add_zone.
+
+    __slots__ = ("name", "floors", "floor_list", "parking_floors")
+
+    def __init__(self, name: str, floors: List[Floor], parking_floors: List[Floor]):
+        if len(floors) < 2:
+            raise ValueError("ERROR: a zone must serve at least two floors")
+        self.name = name
+        self.floor_list = floors # in building order
+        self.floors = set(floors)
+        if parking_floors is None:
+            parking_floors = [floors[(len(floors) - 1) // 2]]
+        if len(parking_floors) == 0 or any(floor not in self.floors for floor in parking_floors):
+            raise ValueError("ERROR: parking floors must be floors the zone serves")
+        self.parking_floors = parking_floors
+
+    def serves(self, passenger) -> bool:
+        return passenger.origin_floor in self.floors and passenger.desired_floor in self.floors
+
+    def __str__(self):
+        return "(Z: {0})".format(self.name)
+
+
 class Passenger:
 
-    origin_floor = None
-    desired_floor = None
-    time_waiting_for_elevator = 0
-    time_inside_elevator = 0
+    # arrival_time, boarding_time and alighting_time are the building.time
+    # ticks at which the passenger made the hall call, got on and got off
+    # final_floor is set while the passenger rides to a sky lobby to change
+    # to another zone; elevator is the car a waiting passenger was given
+    # under destination scheduling
+    __slots__ = (
+        "origin_floor", "desired_floor", "final_floor", "vector",
+        "time_waiting_for_elevator", "time_inside_elevator",
+        "arrival_time", "boarding_time", "alighting_time", "elevator",
+    )
 
     def __init__(self, origin_floor: Union[str, Floor], desired_floor: Union[str, Floor], building):
         if building is None:
@@ -32,16 +142,26 @@ class Passenger:
             raise ValueError("ERROR: origin_floor may not be None")
         if desired_floor is None:
             raise ValueError("ERROR: desired_floor may not be None")
-        origin_floor = origin_floor if type(origin_floor) == Floor else Floor(origin_floor)
-        desired_floor = desired_floor if type(desired_floor) == Floor else Floor(desired_floor)
-        if not building.floor_exists(origin_floor):
+        # resolve to the building's interned Floor instances so that no
+        # duplicate Floor objects are allocated per Passenger
+        origin_floor = building.get_floor(origin_floor)
+        desired_floor = building.get_floor(desired_floor)
+        if origin_floor is None:
             raise ValueError("ERROR: origin_floor does not exist in the building")
-        if not building.floor_exists(desired_floor):
+        if desired_floor is None:
             raise ValueError("ERROR: desired_floor does not exist in the building")
         if origin_floor == desired_floor:
             raise ValueError("ERROR: in order to be an Elevator Passenger, the person in question should want to go to another floor")
         self.origin_floor = origin_floor
         self.desired_floor = desired_floor
+        self.final_floor = None
+        self.vector = building.get_vector_direction(origin_floor, desired_floor)
+        self.time_waiting_for_elevator = 0
+        self.time_inside_elevator = 0
+        self.arrival_time = None
+        self.boarding_time = None
+        self.alighting_time = None
+        self.elevator = None
 
     def incr_elevator_wait_time(self):
         self.time_waiting_for_elevator += 1
@@ -55,49 +175,264 @@ class Passenger:
 
 class Building:
 
-    floors = []
-    elevators = []
-    passengers = []
-
-    def __init__(self, floors: List[Union[str, Floor]]):
+    def __init__(self, floors: List[Union[str, Floor]], dispatcher=None, metrics=None,
+                 scheduling: str="single", elevator_spec=None, demand=None):
+        if scheduling not in SCHEDULING_MODES:
+            raise ValueError("ERROR: scheduling must be one of {0}".format(", ".join(SCHEDULING_MODES)))
+        self.scheduling = scheduling
+        # ElevatorSpec for elevators built without one of their own
+        self.elevator_spec = elevator_spec if elevator_spec is not None else ElevatorSpec()
+        if dispatcher is None:
+            from dispatch import DestinationDispatcher, NearestCarDispatcher
+            if scheduling == "destination":
+                dispatcher = DestinationDispatcher()
+            else:
+                dispatcher = NearestCarDispatcher()
+        elif scheduling == "destination" and not hasattr(dispatcher, "assign_passenger"):
+            raise ValueError("ERROR: destination scheduling needs a dispatcher with assign_passenger")
+        self.dispatcher = dispatcher
+        # metrics.MetricsSink instances told about every completed trip
+        self.metrics = list(metrics) if metrics is not None else []
+        # demand.DemandModel learning from every arrival where to park idle
+        # elevators; without one they park in the middle of the building
+        self.demand = demand
         self.floors = [
             floor if type(floor) == Floor else Floor(floor)
             for floor in floors
         ]
+        self.elevators = []
+        self.zones = []  # type: List[Zone]
+        # floor lookups happen once per passenger per elevator per tick, so
+        # keep them constant time instead of scanning self.floors
+        self.floor_index = {
+            floor: idx
+            for idx, floor in enumerate(self.floors)
+        }
+        if len(self.floor_index) != len(self.floors):
+            raise ValueError("ERROR: floor ids must be unique within a building")
+        self.floors_by_id = {
+            floor.floor_id: floor
+            for floor in self.floors
+        }
+        # waiting passengers, queued FIFO per (floor, vector) hall call; only
+        # hall calls with someone waiting are kept, in the order they were made
+        self.hall_calls = {}
+        # number of ticks simulated so far
+        self.time = 0
+        # lazily consumed (time, origin, destination) arrival stream and its
+        # next, already pulled, arrival
+        self.arrivals = None
+        self.next_arrival = None
+        # passengers added from arrival streams so far
+        self.arrivals_added = 0
+        # destination scheduling: waiting passengers no car could be given
+        # yet (no elevator serves them), retried every tick
+        self.unassigned = []  # type: List[Passenger]
+        # bumped whenever the set of hall calls changes, and whenever any
+        # waiting passenger is added or removed, for dispatch signatures
+        self.calls_version = 0
+        self.waiting_version = 0
+        # up and down hall call floor indices in building order as of
+        # _sorted_calls_version, and get_pending_calls results by
+        # (zone, pending_calls_signature)
+        self._sorted_calls = None  # type: Dict[str, Tuple[List[int], Dict[int, int]]]
+        self._sorted_calls_version = None
+        self._pending_calls = OrderedDict()  # type: OrderedDict
+
+    @property
+    def passengers(self) -> List[Passenger]:
+        return [
+            passenger
+            for queue in self.hall_calls.values()
+                for passenger in queue
+        ]
 
     def add_passenger(self, passenger: Passenger) -> None:
-        self.passengers.append(passenger)
+        if len(self.zones) > 0 and not self.is_served(passenger):
+            self.route_passenger(passenger)
+        passenger.arrival_time = self.time
+        if self.demand is not None:
+            self.demand.record_arrival(passenger, self)
+        hall_call = (passenger.origin_floor, passenger.vector)
+        if hall_call not in self.hall_calls:
+            self.hall_calls[hall_call] = deque()
+            self.calls_version += 1
+        self.hall_calls[hall_call].append(passenger)
+        self.waiting_version += 1
+        if self.scheduling == "destination":
+            self.assign_passenger(passenger)
+
+    def assign_passenger(self, passenger: Passenger) -> None:
+        # destination scheduling: give a waiting passenger a car, which
+        # stops at their floor in their direction
+        elevator = self.dispatcher.assign_passenger(self, passenger)
+        if elevator is None:
+            self.unassigned.append(passenger)
+            return
+        passenger.elevator = elevator
+        elevator.assigned[passenger.desired_floor] = elevator.assigned.get(passenger.desired_floor, 0) + 1
+        elevator.stops.add(passenger.origin_floor, passenger.vector)
+
+    def unassign_passenger(self, passenger: Passenger) -> None:
+        elevator = passenger.elevator
+        if elevator is None:
+            return
+        passenger.elevator = None
+        if elevator.assigned[passenger.desired_floor] == 1:
+            del elevator.assigned[passenger.desired_floor]
+        else:
+            elevator.assigned[passenger.desired_floor] -= 1
+
+    def remove_passenger(self, passenger: Passenger) -> None:
+        hall_call = (passenger.origin_floor, passenger.vector)
+        queue = self.hall_calls[hall_call]
+        if queue[0] is passenger:
+            queue.popleft()
+        else:
+            queue.remove(passenger)
+        self.waiting_version += 1
+        if len(queue) == 0:
+            del self.hall_calls[hall_call]
+            self.calls_version += 1
+
+    def add_passengers(self, passengers: Iterable[Passenger]) -> None:
+        for passenger in passengers:
+            self.add_passenger(passenger)
+
+    def add_arrivals(self, arrivals: Iterable[Tuple[int, Union[str, Floor], Union[str, Floor]]]) -> None:
+        # arrivals must be in time order; several streams are merged lazily
+        arrivals = iter(arrivals)
+        if self.next_arrival is not None:
+            arrivals = heapq.merge(
+                itertools.chain([self.next_arrival], self.arrivals), arrivals,
+                key=lambda arrival: arrival[0]
+            )
+        self.arrivals = arrivals
+        self.next_arrival = next(arrivals, None)
+
+    @property
+    def arrivals_pending(self) -> bool:
+        return self.next_arrival is not None
 
-    def add_passengers(self, passengers: List[Passenger]) -> None:
-        self.add_passenger(passengers.pop(0))
-        if len(passengers) > 0:
-            self.add_passengers(passengers)
+    def is_idle(self) -> bool:
+        # everybody has been served and nobody else is due: running on only
+        # parks the cars
+        return self.next_arrival is None and len(self.hall_calls) == 0 and \
+            all(len(elevator.passengers) == 0 for elevator in self.elevators)
+
+    def pull_arrivals(self) -> None:
+        while self.next_arrival is not None and self.next_arrival[0] <= self.time:
+            time, origin_floor, desired_floor = self.next_arrival
+            self.add_passenger(Passenger(origin_floor, desired_floor, self))
+            self.arrivals_added += 1
+            self.next_arrival = next(self.arrivals, None)
 
     def build_elevator(self, elevator) -> None:
+        elevator.elevator_id = len(self.elevators)
         self.elevators.append(elevator)
 
-    def build_elevators(self, elevators=None, number=0) -> None:
+    def build_elevators(self, elevators=None, number=0, zone: Zone=None) -> None:
         if elevators != None:
             self.build_elevator(elevators.pop(0))
             if len(elevators) > 0:
                 self.build_elevators(elevators)
         elif number > 0:
             self.build_elevator(
-                Elevator(building=self)
+                Elevator(building=self, zone=zone)
             )
-            self.build_elevators(number=(number - 1))
+            self.build_elevators(number=(number - 1), zone=zone)
+
+    def add_zone(self, name: str, floors: List[Union[str, Floor]],
+                 parking_floors: List[Union[str, Floor]]=None) -> Zone:
+        if any(zone.name == name for zone in self.zones):
+            raise ValueError("ERROR: zone names must be unique within a building")
+        resolved = []
+        for floor in list(floors) + list(parking_floors or []):
+            resolved.append(self.get_floor(floor))
+            if resolved[-1] is None:
+                raise ValueError("ERROR: zone floor does not exist in the building")
+        zone_floors = sorted(set(resolved[:len(floors)]), key=self.floor_index.get)
+        zone = Zone(name, zone_floors, resolved[len(floors):] or None)
+        self.zones.append(zone)
+        return zone
+
+    def can_serve(self, elevator, passenger: Passenger) -> bool:
+        return (elevator.zone is None or elevator.zone.serves(passenger)) and \
+            (passenger.elevator is None or passenger.elevator is elevator)
+
+    def is_served(self, passenger: Passenger) -> bool:
+        return any(zone.serves(passenger) for zone in self.zones) or \
+            any(elevator.zone is None for elevator in self.elevators)
+
+    def route_passenger(self, passenger: Passenger) -> None:
+        # no zone serves the whole trip: send the passenger to the sky lobby
+        # where the fewest changes get them to a zone serving their floor,
+        # the closest one if there are several; unload_passenger hands them
+        # over to the next zone from there
+        destination = passenger.desired_floor
+        parents = {
+            zone: None
+            for zone in self.zones
+            if passenger.origin_floor in zone.floors
+        }
+        frontier = list(parents)
+        goal = None
+        while len(frontier) > 0:
+            goal = next((zone for zone in frontier if destination in zone.floors), None)
+            if goal is not None:
+                break
+            next_frontier = []
+            for zone in frontier:
+                for other in self.zones:
+                    if other not in parents and len(zone.floors & other.floors) > 0:
+                        parents[other] = zone
+                        next_frontier.append(other)
+            frontier = next_frontier
+        if goal is None:
+            raise ValueError("ERROR: no zone or chain of zones serves this trip")
+        route = [goal]
+        while parents[route[-1]] is not None:
+            route.append(parents[route[-1]])
+        transfer_floors = route[-1].floors & route[-2].floors
+        origin_idx = self.floor_index[passenger.origin_floor]
+        transfer_floor = min(
+            transfer_floors,
+            key=lambda floor: (abs(self.floor_index[floor] - origin_idx), self.floor_index[floor])
+        )
+        passenger.final_floor = destination
+        passenger.desired_floor = transfer_floor
+        passenger.vector = self.get_vector_direction(passenger.origin_floor, transfer_floor)
+
+    def transfer_passenger(self, passenger: Passenger) -> None:
+        # next leg of a trip through a sky lobby, a new hall call
+        passenger.origin_floor = passenger.desired_floor
+        passenger.desired_floor = passenger.final_floor
+        passenger.final_floor = None
+        passenger.vector = self.get_vector_direction(passenger.origin_floor, passenger.desired_floor)
+        passenger.time_waiting_for_elevator = 0
+        passenger.time_inside_elevator = 0
+        passenger.boarding_time = None
+        passenger.alighting_time = None
+        self.add_passenger(passenger)
+
+    def get_floor(self, floor: Union[str, Floor]) -> Floor:
+        if type(floor) == Floor:
+            floor = floor.floor_id
+        return self.floors_by_id.get(floor)
 
     def floor_exists(self, floor: Floor) -> bool:
-        return floor in self.floors
+        return floor in self.floor_index
 
     def floor_distance(self, floor1, floor2) -> int:
-        if self.floor_exists(floor1) and self.floor_exists(floor2):
-            return abs(self.floors.index(floor1) - self.floors.index(floor2))
+        idx_floor1 = self.floor_index.get(floor1)
+        idx_floor2 = self.floor_index.get(floor2)
+        if idx_floor1 is not None and idx_floor2 is not None:
+            return abs(idx_floor1 - idx_floor2)
         else:
             return -1
 
     def get_vector_direction(self, floor1, floor2) -> str:
-        vector = self.floors.index(floor2) - self.floors.index(floor1)
+        vector = self.floor_index[floor2] - self.floor_index[floor1]
         if vector > 0:
             return "^" # going up
         elif vector < 0:
@@ -105,7 +440,9 @@ class Building:
         else:
             return " " # idling
 
-    def get_starting_floor(self) -> Floor:
+    def get_starting_floor(self, zone: Zone=None) -> Floor:
+        if zone is not None:
+            return self._get_zone_starting_floor(zone)
         if len(self.elevators) == 0:
             return self.floors[0]
         elif len(self.elevators) == 1:
@@ -139,13 +476,13 @@ class Building:
                 max_distance = max(
                     map(lambda ed: ed['dist'], distances_between_elevators)
                 )
-                first_max_dist = filter(
+                first_max_dist = next(filter(
                     lambda ed: ed['dist'] == max_distance,
                     distances_between_elevators
-                ).next()
+                ))
                 min_floor = min(
-                    self.floors.index(first_max_dist['elevator1'].current_floor),
-                    self.floors.index(first_max_dist['elevator2'].current_floor),
+                    self.floor_index[first_max_dist['elevator1'].current_floor],
+                    self.floor_index[first_max_dist['elevator2'].current_floor],
                 )
                 if max_distance % 2 == 0:
                     return self.floors[min_floor + int(max_distance / 2)]
@@ -159,317 +496,603 @@ class Building:
                 middle_idx = int(middle_idx)
                 return self.floors[middle_idx]
 
+    def _get_zone_starting_floor(self, zone: Zone) -> Floor:
+        # the zone floor farthest from every elevator already in the zone,
+        # counted in zone floors so express runs don't look like gaps
+        positions = sorted(
+            zone.floor_list.index(elevator.current_floor)
+            for elevator in self.elevators
+            if elevator.zone is zone and elevator.current_floor in zone.floors
+        )
+        if len(positions) == 0:
+            return zone.parking_floors[0]
+        best_position, best_distance = 0, positions[0]
+        for lower, upper in zip(positions, positions[1:]):
+            if (upper - lower) // 2 > best_distance:
+                best_position, best_distance = lower + (upper - lower) // 2, (upper - lower) // 2
+        if len(zone.floor_list) - 1 - positions[-1] > best_distance:
+            best_position = len(zone.floor_list) - 1
+        return zone.floor_list[best_position]
+
+    def get_parking_floor(self, elevator) -> Floor:
+        if self.demand is not None:
+            return self.demand.get_parking_floor(self, elevator)
+        if elevator.zone is None:
+            return self.floors[(len(self.floors) - 1) // 2]
+        current_idx = self.floor_index[elevator.current_floor]
+        return min(
+            elevator.zone.parking_floors,
+            key=lambda floor: abs(self.floor_index[floor] - current_idx)
+        )
+
     def get_floor_path(self, floor1: Floor, floor2: Floor) -> List[Floor]:
+        return list(self.get_path_view(floor1, floor2))
+
+    def get_path_view(self, floor1: Floor, floor2: Floor) -> FloorPath:
+        # the floors after floor1 up to and including floor2
         if floor1 is None:
             raise ValueError("Floor 1 can't be None")
         if floor2 is None:
             raise ValueError("Floor 2 can't be None")
-        idx_floor1 = self.floors.index(floor1)
-        idx_floor2 = self.floors.index(floor2)
-        if idx_floor1 < idx_floor2:
-            return self.floors[idx_floor1+1:idx_floor2+1]
+        idx_floor1 = self.floor_index[floor1]
+        idx_floor2 = self.floor_index[floor2]
+        if idx_floor1 <= idx_floor2:
+            return FloorPath(self.floors, self.floor_index, idx_floor1 + 1, idx_floor2 + 1, 1)
+        return FloorPath(self.floors, self.floor_index, idx_floor1 - 1, idx_floor2 - 1, -1)
+
+    def get_boarding_passenger(self, elevator) -> Optional[Passenger]:
+        if elevator.is_full:
+            return None
+        if elevator.current_vector == " ":
+            vectors = ("^", "v")
+        else:
+            vectors = (elevator.current_vector,)
+        for vector in vectors:
+            queue = self.hall_calls.get((elevator.current_floor, vector))
+            if queue:
+                if elevator.zone is None and self.scheduling != "destination":
+                    return queue[0]
+                for passenger in queue:
+                    if self.can_serve(elevator, passenger):
+                        return passenger
+        return None
+
+    def get_zone_elevators(self, zone: Zone) -> List:
+        return [
+            elevator
+            for elevator in self.elevators
+            if elevator.zone is zone
+        ]
+
+    def has_calls(self, zone: Zone=None) -> bool:
+        if zone is None:
+            return len(self.hall_calls) > 0
+        return any(
+            floor in zone.floors and any(zone.serves(passenger) for passenger in queue)
+            for (floor, vector), queue in self.hall_calls.items()
+        )
+
+    def get_pending_calls(self, zone: Zone=None) -> List[Tuple[Floor, str]]:
+        # hall calls that no elevator is already on its way to serve; for a
+        # zone only calls with somebody the zone serves, covered by its own
+        # elevators. Under destination scheduling every waiting passenger
+        # already has a car coming.
+        if self.scheduling == "destination":
+            return []
+        signature = self.pending_calls_signature(zone)
+        key = (zone, signature)
+        cached = self._pending_calls.get(key)
+        if cached is not None:
+            self._pending_calls.move_to_end(key)
+            return list(cached)
+        if zone is None:
+            hall_calls = self.hall_calls
         else:
-            return self.floors[idx_floor2-1:idx_floor1-1:-1]
+            hall_calls = [
+                (floor, vector)
+                for (floor, vector), queue in self.hall_calls.items()
+                if floor in zone.floors and any(zone.serves(passenger) for passenger in queue)
+            ]
+        desired_floors = set()
+        covered = {"^": set(), "v": set()}
+        for desired_floor, vector, first, last in signature[1]:
+            if desired_floor is not None:
+                desired_floors.add(desired_floor)
+            if vector is not None:
+                covered[vector].update(range(first, last))
+        calls_by_vector = self._calls_by_vector()
+        pending_calls = [
+            (floor, vector)
+            for floor, vector in hall_calls
+            if floor not in desired_floors and
+                calls_by_vector[vector][1][self.floor_index[floor]] not in covered[vector]
+        ]
+        self._pending_calls[key] = pending_calls
+        if len(self._pending_calls) > PENDING_CALLS_CACHE_SIZE:
+            self._pending_calls.popitem(last=False)
+        return list(pending_calls)
+
+    def _calls_by_vector(self) -> Dict[str, Tuple[List[int], Dict[int, int]]]:
+        # floor indices of the up and of the down hall calls in building
+        # order, and every floor's position in that order; redone only when
+        # a hall call comes or goes
+        if self._sorted_calls_version != self.calls_version:
+            self._sorted_calls = {}
+            for vector in ("^", "v"):
+                floor_idxs = sorted(
+                    self.floor_index[floor]
+                    for floor, call_vector in self.hall_calls
+                    if call_vector == vector
+                )
+                self._sorted_calls[vector] = (
+                    floor_idxs, {floor_idx: pos for pos, floor_idx in enumerate(floor_idxs)}
+                )
+            self._sorted_calls_version = self.calls_version
+        return self._sorted_calls
+
+    def call_coverage(self, elevator) -> Tuple[Optional[Floor], Optional[str], int, int]:
+        # What an elevator takes off get_pending_calls: its desired_floor, and
+        # the hall calls in its direction on its floor_path, positions first
+        # to last (exclusive) in _calls_by_vector, which are all next to each
+        # other. Full elevators drive past everybody until someone gets off.
+        # A moving elevator only changes this when it passes a hall call or
+        # heads somewhere else, not every floor.
+        path = elevator.floor_path
+        vector = elevator.current_vector
+        if len(path) == 0 or elevator.is_full or vector not in ("^", "v"):
+            return (elevator.desired_floor, None, 0, 0)
+        floor_idxs = self._calls_by_vector()[vector][0]
+        if path.step == 1:
+            first = bisect.bisect_left(floor_idxs, path.start)
+            last = bisect.bisect_left(floor_idxs, path.stop)
+        else:
+            first = bisect.bisect_right(floor_idxs, path.stop)
+            last = bisect.bisect_right(floor_idxs, path.start)
+        return (elevator.desired_floor, vector, first, last)
+
+    def pending_calls_signature(self, zone: Zone=None) -> tuple:
+        # same signature, same get_pending_calls; zoned pending calls depend
+        # on who is waiting, not just where
+        elevators = self.elevators if zone is None else self.get_zone_elevators(zone)
+        return (
+            self.calls_version if len(self.zones) == 0 else self.waiting_version,
+            tuple(self.call_coverage(elevator) for elevator in elevators)
+        )
 
     def time_step(self) -> None:
-        for passenger in self.passengers:
-            passenger.incr_elevator_wait_time()
+        self.pull_arrivals()
+        self.incr_passenger_times()
+        self.advance_elevators()
+
+    def incr_passenger_times(self) -> None:
+        for queue in self.hall_calls.values():
+            for passenger in queue:
+                passenger.incr_elevator_wait_time()
         for elevator in self.elevators:
-            if len(elevator.passengers) > 0:
-                for passenger in elevator.passengers:
-                    passenger.incr_elevator_time()
-                passengers_who_want_to_get_off = list(
-                    filter(
-                        lambda passenger: (
-                            passenger.desired_floor ==
-                            elevator.current_floor
-                        ), elevator.passengers
-                    )
-                )
-                if len(passengers_who_want_to_get_off) > 0:
-                    elevator.unload_passenger(
-                        passengers_who_want_to_get_off[-1]
-                    )
-                else:
-                    passengers_who_want_to_get_on = list(
-                        filter(
-                            lambda passenger: (
-                                passenger.origin_floor ==
-                                elevator.current_floor
-                            ) and (
-                                elevator.current_vector == ' ' or
-                                self.get_vector_direction(
-                                    passenger.origin_floor,
-                                    passenger.desired_floor
-                                ) == elevator.current_vector
-                            ),
-                            self.passengers
-                        )
-                    )
-                    if len(passengers_who_want_to_get_on) > 0:
-                        elevator.load_passenger(
-                            passenger=passengers_who_want_to_get_on[0],
-                            building=self
-                        )
-                        self.passengers.remove(
-                            passengers_who_want_to_get_on[0]
-                        )
-                    else:
-                        if len(elevator.floor_path) == 0:
-                            if elevator.desired_floor is None:
-                                pending_passengers = self.passengers
-                                for passenger in self.passengers:
-                                    for inner_elevator in self.elevators:
-                                        if passenger.origin_floor in inner_elevator.floor_path \
-                                            and self.get_vector_direction(
-                                                passenger.origin_floor, passenger.desired_floor
-                                            ) == inner_elevator.current_vector:
-                                            pending_passengers.remove(passenger)
-                                distance_to_passengers = [
-                                    {
-                                        'passenger': passenger,
-                                        'distance': self.floor_distance(
-                                            elevator.current_floor, passenger.origin_floor
-                                        )
-                                    }
-                                    for passenger in pending_passengers
-                                ]
-                                min_distance = min(
-                                    map(
-                                        lambda passenger_dist: passenger_dist['distance'],
-                                        distance_to_passengers
-                                    )
-                                )
-                                closest_passenger = list(filter(
-                                    lambda passenger: passenger['distance'] == min_distance,
-                                    distance_to_passengers
-                                ))[0]
-                                elevator.move_to_floor(
-                                    floor=self.get_floor_path(
-                                        elevator.current_floor,
-                                        closest_passenger['passenger'].origin_floor
-                                    )[0],
-                                    desired_floor=closest_passenger['passenger'].origin_floor,
-                                    building=self
-                                )
-                            else:
-                                elevator.move_to_floor(
-                                    floor=self.get_floor_path(
-                                        elevator.current_floor,
-                                        elevator.desired_floor
-                                    )[0],
-                                    building=self
-                                )
-                        else:
-                            elevator.move_to_floor(
-                                floor=elevator.floor_path[0],
-                                building=self
-                            )
-            elif len(elevator.floor_path) > 0:
-                passengers_who_want_to_get_on = list(
-                    filter(
-                        lambda passenger: (
-                            passenger.origin_floor ==
-                            elevator.current_floor
-                        ) and (
-                            elevator.current_vector == ' ' or
-                            self.get_vector_direction(
-                                passenger.origin_floor,
-                                passenger.desired_floor
-                            ) == elevator.current_vector
-                        ),
-                        self.passengers
-                    )
+            for passenger in elevator.passengers:
+                passenger.incr_elevator_time()
+
+    def advance_elevators(self) -> None:
+        # one tick of elevator decisions, without the per passenger counters
+        # (wait and ride times are also recorded as building.time timestamps)
+        self.time += 1
+        idle_elevators = []
+        acting_elevators = []
+        for elevator in self.elevators:
+            if elevator.busy_time >= 1:
+                # still opening doors, moving people or travelling
+                elevator.busy_time -= 1
+                continue
+            acting_elevators.append(elevator)
+            current_floor = elevator.current_floor
+            if self.scheduling != "single":
+                busy = self._advance_look(elevator)
+            else:
+                busy = self._advance_single(elevator)
+            if elevator.current_floor == current_floor:
+                elevator.stop_running()
+            if not busy:
+                idle_elevators.append(elevator)
+        if len(self.unassigned) > 0:
+            unassigned, self.unassigned = self.unassigned, []
+            for passenger in unassigned:
+                if passenger.boarding_time is None:
+                    self.assign_passenger(passenger)
+        if len(self.zones) == 0:
+            self._dispatch(idle_elevators)
+        else:
+            # each zone only looks at its own elevators and calls
+            for zone in self.zones + [None]:
+                self._dispatch(
+                    [elevator for elevator in idle_elevators if elevator.zone is zone], zone
                 )
-                if len(passengers_who_want_to_get_on) > 0:
-                    elevator.load_passenger(
-                        passenger=passengers_who_want_to_get_on[0],
-                        building=self
-                    )
-                    building.passengers.remove(
-                        passengers_who_want_to_get_on[0]
-                    )
-                else:
-                    elevator.move_to_floor(
-                        floor=elevator.floor_path[0],
-                        building=self
-                    )
-            elif len(self.passengers) > 0:
-                passengers_who_want_to_get_on = list(
-                    filter(
-                        lambda passenger: (
-                            passenger.origin_floor ==
-                            elevator.current_floor
-                        ) and (
-                            elevator.current_vector == ' ' or
-                            self.get_vector_direction(
-                                passenger.origin_floor,
-                                passenger.desired_floor
-                            ) == elevator.current_vector
-                        ),
-                        self.passengers
+        for elevator in acting_elevators:
+            # whatever an elevator did this tick took the tick itself
+            elevator.busy_time = max(0.0, elevator.busy_time - 1)
+
+    def _dispatch(self, idle_elevators: List, zone: Zone=None) -> None:
+        if len(idle_elevators) == 0 and zone is not None:
+            return
+        if self.has_calls(zone):
+            if zone is None:
+                assignments = self.dispatcher.assign(self, idle_elevators)
+            else:
+                assignments = self.dispatcher.assign(self, idle_elevators, zone)
+            for elevator, floor in assignments.items():
+                if floor == elevator.current_floor:
+                    continue
+                if self.scheduling != "single":
+                    elevator.stops.add(
+                        floor, self.get_vector_direction(elevator.current_floor, floor)
                     )
+                elevator.move_to_floor(
+                    floor=self.get_path_view(elevator.current_floor, floor)[0],
+                    desired_floor=floor,
+                    building=self
                 )
-                if len(passengers_who_want_to_get_on) > 0:
-                    elevator.load_passenger(
-                        passenger=passengers_who_want_to_get_on[0],
-                        building=self
-                    )
-                    self.passengers.remove(
-                        passengers_who_want_to_get_on[0]
-                    )
-                else:
-                    pending_passengers = self.passengers
-                    for passenger in self.passengers:
-                        for inner_elevator in self.elevators:
-                            if passenger.origin_floor in inner_elevator.floor_path \
-                                and self.get_vector_direction(
-                                    passenger.origin_floor, passenger.desired_floor
-                                ) == inner_elevator.current_vector:
-                                pending_passengers.remove(passenger)
-                    distance_to_passengers = [
-                        {
-                            'passenger': passenger,
-                            'distance': self.floor_distance(
-                                elevator.current_floor, passenger.origin_floor
-                            )
-                        }
-                        for passenger in pending_passengers
-                    ]
-                    min_distance = min(
-                        map(
-                            lambda passenger_dist: passenger_dist['distance'],
-                            distance_to_passengers
-                        )
-                    )
-                    closest_passenger = list(
-                        filter(
-                            lambda passenger: passenger['distance'] == min_distance,
-                            distance_to_passengers
-                        )
-                    )[0]
+        else:
+            for elevator in idle_elevators:
+                # Idle elevators go back to the middle of the building where
+                # they are closest to all potential future passengers (assuming
+                # an even distribution throughout the building), or where the
+                # building's demand model expects the next calls. Parking
+                # moves don't commit the elevator to a desired_floor so it
+                # stays available for new hall calls. Zoned elevators park at
+                # their zone's nearest parking floor.
+                parking_floor = self.get_parking_floor(elevator)
+                if elevator.current_floor != parking_floor:
                     elevator.move_to_floor(
-                        floor=self.get_floor_path(
-                            elevator.current_floor,
-                            closest_passenger['passenger'].origin_floor
+                        floor=self.get_path_view(
+                            elevator.current_floor, parking_floor
                         )[0],
-                        desired_floor=closest_passenger['passenger'].origin_floor,
                         building=self
                     )
-            else:
-                # This is a simple and easy optimization, we reset idle
-                # elevators in the middle of the building where they are closest
-                # to all potential future passengers (assuming an even
-                # distribution throughout the building). Further optimizations
-                # are possible such as minimizing floor holes between elevators
-                # (real time floor balancing) but that is beyond the current
-                # scope of study.
-                top_floor_idx = len(self.floors) - 1
-                top_floor_idx = (
-                    top_floor_idx
-                    if top_floor_idx % 2 == 0
-                    else (
-                        top_floor_idx - 1
-                    )
-                )
-                elevator.move_to_floor(
-                    floor=self.get_floor_path(
-                        elevator.current_floor,
-                        self.floors[top_floor_idx / 2]
-                    )[0],
-                    desired_floor=self.floors[top_floor_idx / 2],
-                    building=self
-                )
 
-    def __str__(self):
-        floor_sep = ("-" * FLOOR_STR_SIZE)
-        for e in range(len(self.elevators)):
-            floor_sep += "+" + ("-" * (ELEVATOR_STR_SIZE - 2))
-        floor_sep += "+" + ("-" * PASSENGER_STR_SIZE)
-        building_str = floor_sep
-        for floor in self.floors:
-            floor_str = floor_sep + "\n" + str(floor) + "|"
-            elevators_on_this_floor = list(filter(
-                lambda elevator: elevator.current_floor == floor,
-                self.elevators
-            ))
-            max_elevator_passengers = 0
-            if len(elevators_on_this_floor) > 0:
-                max_elevator_passengers = max(
-                    map(
-                        lambda elevator: len(elevator.passengers),
-                        elevators_on_this_floor
-                    )
-                )
-            passengers_on_this_floor = list(
-                filter(
-                    lambda passenger: passenger.origin_floor == floor,
-                    self.passengers
-                )
+    def _advance_single(self, elevator) -> bool:
+        passengers_who_want_to_get_off = [
+            passenger
+            for passenger in elevator.passengers
+            if passenger.desired_floor == elevator.current_floor
+        ]
+        if len(passengers_who_want_to_get_off) > 0:
+            elevator.unload_passenger(
+                passengers_who_want_to_get_off[-1], building=self
+            )
+            return True
+        passenger_who_wants_to_get_on = self.get_boarding_passenger(elevator)
+        if passenger_who_wants_to_get_on is not None:
+            elevator.load_passenger(
+                passenger=passenger_who_wants_to_get_on,
+                building=self
             )
-            num_of_floor_lines = max(
-                max_elevator_passengers, len(passengers_on_this_floor), 1
+        elif len(elevator.floor_path) > 0:
+            elevator.move_to_floor(
+                floor=elevator.floor_path[0],
+                building=self
+            )
+        else:
+            return False
+        return True
+
+    def _advance_look(self, elevator) -> bool:
+        # a stop is one tick: everybody for this floor gets off and everybody
+        # waiting here in the elevator's direction gets on
+        current_floor = elevator.current_floor
+        stops = elevator.stops
+        stops.discard(current_floor)
+        stopped = False
+        for passenger in [
+            passenger
+            for passenger in elevator.passengers
+            if passenger.desired_floor == current_floor
+        ]:
+            elevator.unload_passenger(passenger, building=self)
+            stopped = True
+        if elevator.current_vector != " " and \
+                not stops.has_stops_ahead(current_floor, elevator.current_vector):
+            # end of the sweep, free to turn around
+            elevator.current_vector = " "
+        passenger = self.get_boarding_passenger(elevator)
+        if passenger is not None:
+            elevator.current_vector = passenger.vector
+            queue = self.hall_calls[(current_floor, passenger.vector)]
+            for passenger in list(queue):
+                if elevator.is_full:
+                    break
+                if self.can_serve(elevator, passenger):
+                    elevator.load_passenger(passenger=passenger, building=self)
+            stopped = True
+        if len(elevator.assigned) > 0:
+            self._recall_left_behind(elevator)
+        next_stop = stops.next_stop(current_floor, elevator.current_vector)
+        if next_stop != elevator.desired_floor:
+            # retarget as soon as the stop set changes so the dispatcher
+            # sees where the elevator is really going
+            elevator.desired_floor = next_stop
+            elevator.floor_path = self.get_path_view(
+                current_floor, next_stop if next_stop is not None else current_floor
             )
-            for line_num in range(num_of_floor_lines):
-                if line_num > 0:
-                    floor_str += (" " * FLOOR_STR_SIZE) + "|"
-                for elevator in self.elevators:
-                    if elevator.current_floor == floor:
-                        if len(elevator.passengers) > 0:
-                            if line_num < len(elevator.passengers):
-                                floor_str += str(elevator.passengers[line_num])
-                            else:
-                                if line_num == (num_of_floor_lines - 1):
-                                    floor_str += "*" * PASSENGER_STR_SIZE
-                                else:
-                                    floor_str += "*" + (" " * (PASSENGER_STR_SIZE - 2)) + "*"
-                        else:
-                            if line_num == 0 or line_num == (
-                                num_of_floor_lines - 1
-                            ):
-                                floor_str += "*" * PASSENGER_STR_SIZE
-                            else:
-                                floor_str += "*" + (" " * (PASSENGER_STR_SIZE - 2)) + "*"
-                    else:
-                        floor_str += " " * PASSENGER_STR_SIZE
-                    floor_str += "|"
-                if line_num < len(passengers_on_this_floor):
-                    floor_str += str(passengers_on_this_floor[line_num])
-                floor_str += "\n"
-            building_str = floor_str + building_str
-        return building_str
+        if stopped:
+            return True
+        if next_stop is None:
+            return False
+        vector = self.get_vector_direction(current_floor, next_stop)
+        elevator.move_to_floor(
+            floor=elevator.floor_path[0],
+            vector=vector,
+            building=self
+        )
+        if elevator.desired_floor is None and \
+                stops.has_stops_ahead(elevator.current_floor, vector):
+            elevator.current_vector = vector
+        return True
 
+    def _recall_left_behind(self, elevator) -> None:
+        # passengers given to this car who couldn't get on here are picked
+        # up on the way back, or given another car if this one is full
+        for vector in ("^", "v"):
+            queue = self.hall_calls.get((elevator.current_floor, vector))
+            if not queue:
+                continue
+            left_behind = [passenger for passenger in queue if passenger.elevator is elevator]
+            if len(left_behind) == 0:
+                continue
+            if elevator.is_full:
+                for passenger in left_behind:
+                    self.unassign_passenger(passenger)
+                    self.assign_passenger(passenger)
+            else:
+                elevator.stops.add(elevator.current_floor, vector)
 
-class Elevator:
+    def __str__(self):
+        from render import render_building
+        return render_building(self)
 
-    current_floor = None
-    desired_floor = None # no current destination
-    destination_floors = []
-    floor_path = []
-    passengers = []
-    current_vector = " " # neutral / idle
+
+class ElevatorSpec:
+
+    # Capacity and timing of an elevator, times in ticks (seconds). The
+    # defaults are the original model: no capacity limit, no door or
+    # transfer time on top of the tick a stop takes and one tick per floor.
+    # With floor_height (m), rated_speed (m/s) and acceleration (m/s^2) a run
+    # of n floors takes the time of accelerating, cruising and braking, and
+    # a car is busy for as many ticks as its doors, passengers and travel
+    # take; whatever an action does always takes at least the tick it
+    # happens in.
+
+    __slots__ = (
+        "capacity", "door_open_time", "door_close_time", "transfer_time",
+        "floor_height", "rated_speed", "acceleration",
+    )
+
+    def __init__(self, capacity: int=None, door_open_time: float=0.0, door_close_time: float=0.0,
+                 transfer_time: float=0.0, floor_height: float=None, rated_speed: float=None,
+                 acceleration: float=None):
+        if capacity is not None and capacity < 1:
+            raise ValueError("ERROR: capacity must be at least 1 passenger")
+        if min(door_open_time, door_close_time, transfer_time) < 0:
+            raise ValueError("ERROR: door and transfer times may not be negative")
+        travel = (floor_height, rated_speed, acceleration)
+        if any(value is not None for value in travel):
+            if any(value is None or value <= 0 for value in travel):
+                raise ValueError("ERROR: floor_height, rated_speed and acceleration must all be positive")
+        self.capacity = capacity
+        self.door_open_time = door_open_time
+        self.door_close_time = door_close_time
+        self.transfer_time = transfer_time
+        self.floor_height = floor_height
+        self.rated_speed = rated_speed
+        self.acceleration = acceleration
+
+    @property
+    def timed(self) -> bool:
+        # False when every action takes exactly one tick
+        return (
+            self.door_open_time != 0 or self.door_close_time != 0 or
+            self.transfer_time != 0 or self.rated_speed is not None
+        )
+
+    def _run_time(self, floors: int) -> float:
+        # from standstill to passing `floors` floors up, without braking
+        distance = floors * self.floor_height
+        if distance <= self.rated_speed ** 2 / (2 * self.acceleration):
+            return math.sqrt(2 * distance / self.acceleration)
+        return distance / self.rated_speed + self.rated_speed / (2 * self.acceleration)
+
+    def flight_time(self, floors: int) -> float:
+        # standstill to standstill `floors` floors away
+        if self.rated_speed is None:
+            return float(floors)
+        distance = floors * self.floor_height
+        if distance <= self.rated_speed ** 2 / self.acceleration:
+            return 2 * math.sqrt(distance / self.acceleration)
+        return distance / self.rated_speed + self.rated_speed / self.acceleration
+
+    def hop_time(self, floors: int) -> float:
+        # the floors-th floor of a run; braking is added by brake_time once
+        # the elevator stops, so a run that gets extended stays exact
+        if self.rated_speed is None:
+            return 1.0
+        return self._run_time(floors) - self._run_time(floors - 1)
+
+    def brake_time(self, floors: int) -> float:
+        if self.rated_speed is None or floors == 0:
+            return 0.0
+        return self.flight_time(floors) - self._run_time(floors)
+
+
+class StopSet:
+
+    # The floors an elevator still has to stop at, as two sorted lists of
+    # floor indices: stops to make on the way up and stops to make on the way
+    # down. Adding or removing a stop is a bisect plus a list insert or
+    # delete, and the next stop in LOOK order is a couple of lookups instead
+    # of re-sorting a destination list.
+
+    __slots__ = ("floors", "floor_index", "up", "down")
 
     def __init__(self, building: Building):
+        self.floors = building.floors
+        self.floor_index = building.floor_index
+        self.up = []  # type: List[int]
+        self.down = []  # type: List[int]
+
+    def add(self, floor: Floor, vector: str) -> None:
+        floor_idx = self.floor_index[floor]
+        stops = self.down if vector == "v" else self.up
+        idx = bisect.bisect_left(stops, floor_idx)
+        if idx == len(stops) or stops[idx] != floor_idx:
+            # O(n), like bisect.insort, but a stop list holds each floor at
+            # most once, so n is at most the floor count and the insert is
+            # one short memmove
+            stops.insert(idx, floor_idx)
+
+    def discard(self, floor: Floor) -> None:
+        floor_idx = self.floor_index[floor]
+        for stops in (self.up, self.down):
+            idx = bisect.bisect_left(stops, floor_idx)
+            if idx < len(stops) and stops[idx] == floor_idx:
+                del stops[idx]
+
+    def __contains__(self, floor: Floor) -> bool:
+        floor_idx = self.floor_index.get(floor)
+        for stops in (self.up, self.down):
+            idx = bisect.bisect_left(stops, floor_idx)
+            if idx < len(stops) and stops[idx] == floor_idx:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.up) + len(self.down)
+
+    def __iter__(self):
+        for floor_idx in sorted(set(self.up) | set(self.down)):
+            yield self.floors[floor_idx]
+
+    def has_stops_ahead(self, floor: Floor, vector: str) -> bool:
+        floor_idx = self.floor_index[floor]
+        if vector == "^":
+            return any(len(stops) > 0 and stops[-1] > floor_idx for stops in (self.up, self.down))
+        return any(len(stops) > 0 and stops[0] < floor_idx for stops in (self.up, self.down))
+
+    def next_stop(self, floor: Floor, vector: str) -> Optional[Floor]:
+        # LOOK: keep going while there are stops ahead, turning at the last
+        # one; an idle elevator takes the nearest stop, ties going up
+        floor_idx = self.floor_index[floor]
+        up_above = bisect.bisect_right(self.up, floor_idx)
+        up_below = bisect.bisect_left(self.up, floor_idx)
+        down_above = bisect.bisect_right(self.down, floor_idx)
+        down_below = bisect.bisect_left(self.down, floor_idx)
+        going_up = [
+            self.up[up_above] if up_above < len(self.up) else None,
+            self.down[-1] if down_above < len(self.down) else None,
+        ]
+        going_down = [
+            self.down[down_below - 1] if down_below > 0 else None,
+            self.up[0] if up_below > 0 else None,
+        ]
+        if vector == " ":
+            above = min([stop for stop in going_up if stop is not None], default=None)
+            below = max([stop for stop in going_down if stop is not None], default=None)
+            if above is None or (below is not None and floor_idx - below < above - floor_idx):
+                candidates = [below]
+            else:
+                candidates = [above]
+        elif vector == "^":
+            candidates = going_up + going_down
+        else:
+            candidates = going_down + going_up
+        for stop in candidates:
+            if stop is not None:
+                return self.floors[stop]
+        return None
+
+
+class Elevator:
+
+    __slots__ = (
+        "elevator_id", "current_floor", "desired_floor", "stops",
+        "floor_path", "passengers", "current_vector",
+        "spec", "busy_time", "run_floors", "doors_open", "zone", "assigned",
+    )
+
+    def __init__(self, building: Building, spec: ElevatorSpec=None, zone: Zone=None):
         if building is None:
             raise ValueError("ERROR: building may not be None")
-        self.current_floor = building.get_starting_floor()
+        if zone is not None and zone not in building.zones:
+            raise ValueError("ERROR: zone does not belong to the building")
+        self.elevator_id = None # set by Building.build_elevator
+        self.zone = zone # None serves every floor
+        self.spec = spec if spec is not None else building.elevator_spec
+        self.busy_time = 0.0 # ticks of door, transfer and travel time still to go
+        self.run_floors = 0 # floors travelled since the last stop
+        self.doors_open = False
+        self.current_floor = building.get_starting_floor(zone)
+        self.desired_floor = None # no current destination
+        self.stops = StopSet(building)
+        self.floor_path = building.get_path_view(self.current_floor, self.current_floor)
+        self.passengers = []
+        self.current_vector = " " # neutral / idle
+        # destination scheduling: desired floor -> passengers given to this
+        # car and still waiting for it
+        self.assigned = {}  # type: Dict[Floor, int]
+
+    @property
+    def is_full(self) -> bool:
+        return self.spec.capacity is not None and len(self.passengers) >= self.spec.capacity
+
+    def stop_running(self) -> None:
+        if self.run_floors > 0:
+            self.busy_time += self.spec.brake_time(self.run_floors)
+            self.run_floors = 0
+
+    def open_doors(self) -> None:
+        self.stop_running()
+        if not self.doors_open:
+            self.busy_time += self.spec.door_open_time
+            self.doors_open = True
 
     def move_to_floor(self, floor: Floor, vector: str=None, desired_floor: Floor=None, building: Building=None) -> None:
+        if self.doors_open:
+            self.busy_time += self.spec.door_close_time
+            self.doors_open = False
+        self.run_floors += 1
+        self.busy_time += self.spec.hop_time(self.run_floors)
         self.current_floor = floor
-        if floor in self.destination_floors:
-            self.destination_floors.remove(floor)
+        if len(self.floor_path) > 0 and self.floor_path[0] == floor:
+            self.floor_path.advance()
+        self.stops.discard(floor)
         if desired_floor is not None:
             self.desired_floor = desired_floor
-            self.floor_path = building.get_floor_path(self.current_floor, self.desired_floor)
+            self.floor_path = building.get_path_view(self.current_floor, self.desired_floor)
             self.current_vector = building.get_vector_direction(self.current_floor, self.desired_floor)
         if vector is not None:
-            self.vector = vector
+            self.current_vector = vector
         if self.desired_floor == floor:
             self.desired_floor = None
             self.current_vector = " "
+            self.stop_running()
 
     def load_passenger(self, passenger: Passenger, building: Building) -> None:
+        if self.is_full:
+            raise ValueError("ERROR: elevator is full")
+        building.remove_passenger(passenger)
+        building.unassign_passenger(passenger)
+        self.open_doors()
+        self.busy_time += self.spec.transfer_time
+        passenger.boarding_time = building.time
+        if passenger.arrival_time is not None:
+            passenger.time_waiting_for_elevator = (
+                passenger.boarding_time - passenger.arrival_time
+            )
         self.passengers.append(passenger)
+        self.stops.add(
+            passenger.desired_floor,
+            building.get_vector_direction(self.current_floor, passenger.desired_floor)
+        )
+        if building.scheduling != "single":
+            # Building._advance_look picks the next stop from self.stops
+            return
         if self.desired_floor is not None:
             current_vector_distance = building.floor_distance(
                 self.current_floor, self.desired_floor
@@ -479,27 +1102,26 @@ class Elevator:
             )
             if new_vector_distance > current_vector_distance:
                 self.desired_floor = passenger.desired_floor
-                self.floor_path = building.get_floor_path(self.current_floor, self.desired_floor)
+                self.floor_path = building.get_path_view(self.current_floor, self.desired_floor)
         else:
             self.desired_floor = passenger.desired_floor
-            self.floor_path = building.get_floor_path(self.current_floor, self.desired_floor)
-        if passenger.desired_floor not in self.destination_floors:
-            self.destination_floors.append(passenger.desired_floor)
-            self.destination_floors = sorted(
-                self.destination_floors,
-                key=lambda floor: building.floor_distance(
-                    self.current_floor, floor
-                )
-            )
+            self.floor_path = building.get_path_view(self.current_floor, self.desired_floor)
         if self.current_vector == " ":
             self.current_vector = building.get_vector_direction(
                 self.current_floor, self.desired_floor
             )
 
-    def unload_passenger(self, passenger: Passenger) -> None:
-        print("Time waiting, Time inside Elevator = {0}, {1}".format(
-                passenger.time_waiting_for_elevator,
-                passenger.time_inside_elevator
-            )
-        )
+    def unload_passenger(self, passenger: Passenger, building: Building=None) -> None:
         self.passengers.remove(passenger)
+        self.open_doors()
+        self.busy_time += self.spec.transfer_time
+        if building is not None:
+            passenger.alighting_time = building.time
+            if passenger.boarding_time is not None:
+                passenger.time_inside_elevator = (
+                    passenger.alighting_time - passenger.boarding_time
+                )
+            for sink in building.metrics:
+                sink.record_trip(passenger, self, building)
+            if passenger.final_floor is not None:
+                building.transfer_passenger(passenger)
@@ -0,0 +1,136 @@
+import heapq
+from typing import Dict, List, Optional
+
+from model import (
+    ELEVATOR_STR_SIZE, FLOOR_STR_SIZE, PASSENGER_STR_SIZE, Building, Floor
+)
+
+
+ELEVATOR_EDGE = "*" * PASSENGER_STR_SIZE
+ELEVATOR_SIDES = "*" + (" " * (PASSENGER_STR_SIZE - 2)) + "*"
+EMPTY_SHAFT = " " * PASSENGER_STR_SIZE
+FLOOR_MARGIN = (" " * FLOOR_STR_SIZE) + "|"
+
+
+class BuildingRenderer:
+
+    # Draws the same ASCII picture as Building.__str__, one cached block per
+    # floor. A floor is only redrawn when the elevators or waiting passengers
+    # on it changed since the previous frame; with every > 1 frame_for_tick
+    # only draws every `every` ticks so a headless run pays almost nothing.
+
+    def __init__(self, building: Building, every: int=1):
+        if building is None:
+            raise ValueError("ERROR: building may not be None")
+        if every < 1:
+            raise ValueError("ERROR: every must be at least 1")
+        self.building = building
+        self.every = every
+        self.floor_blocks = {}  # type: Dict[Floor, str]
+        self.floor_signatures = {}  # type: Dict[Floor, tuple]
+        self.updated_floors = []  # type: List[Floor]
+        self.floor_sep = None
+        self.frames_rendered = 0
+
+    def _floor_signatures(self) -> Dict[Floor, tuple]:
+        # only floors with an elevator or a waiting passenger on them; every
+        # other floor draws as an empty block
+        elevators_by_floor = {}
+        for elevator_idx, elevator in enumerate(self.building.elevators):
+            elevators_by_floor.setdefault(elevator.current_floor, []).append(
+                (elevator_idx, tuple(elevator.passengers))
+            )
+        waiting_by_floor = {}
+        for (floor, vector), queue in self.building.hall_calls.items():
+            waiting_by_floor.setdefault(floor, []).append(queue)
+        signatures = {}
+        for floor in set(elevators_by_floor) | set(waiting_by_floor):
+            # waiting passengers in arrival order like the original __str__;
+            # each direction's queue already is, so they are merged by
+            # arrival time (within a tick the older hall call goes first)
+            queues = waiting_by_floor.get(floor, [])
+            if len(queues) > 1:
+                waiting = tuple(heapq.merge(*queues, key=lambda passenger: passenger.arrival_time))
+            else:
+                waiting = tuple(queues[0]) if len(queues) > 0 else ()
+            signatures[floor] = (tuple(elevators_by_floor.get(floor, ())), waiting)
+        return signatures
+
+    def _render_floor(self, floor: Floor, signature: tuple) -> str:
+        elevators_on_this_floor, passengers_on_this_floor = signature
+        on_this_floor = dict(elevators_on_this_floor)
+        max_elevator_passengers = max(
+            [len(passengers) for passengers in on_this_floor.values()] or [0]
+        )
+        num_of_floor_lines = max(
+            max_elevator_passengers, len(passengers_on_this_floor), 1
+        )
+        last_line = num_of_floor_lines - 1
+        parts = [self.floor_sep, "\n", str(floor), "|"]
+        for line_num in range(num_of_floor_lines):
+            if line_num > 0:
+                parts.append(FLOOR_MARGIN)
+            for elevator_idx in range(len(self.building.elevators)):
+                passengers = on_this_floor.get(elevator_idx)
+                if passengers is None:
+                    parts.append(EMPTY_SHAFT)
+                elif line_num < len(passengers):
+                    parts.append(str(passengers[line_num]))
+                elif line_num == last_line or (len(passengers) == 0 and line_num == 0):
+                    parts.append(ELEVATOR_EDGE)
+                else:
+                    parts.append(ELEVATOR_SIDES)
+                parts.append("|")
+            if line_num < len(passengers_on_this_floor):
+                parts.append(str(passengers_on_this_floor[line_num]))
+            parts.append("\n")
+        return "".join(parts)
+
+    def _update(self) -> None:
+        floor_sep = "".join(
+            ["-" * FLOOR_STR_SIZE] +
+            ["+" + ("-" * (ELEVATOR_STR_SIZE - 2))] * len(self.building.elevators) +
+            ["+" + ("-" * PASSENGER_STR_SIZE)]
+        )
+        if floor_sep != self.floor_sep:
+            # the number of elevators changed, every floor has to be redrawn
+            self.floor_sep = floor_sep
+            self.floor_blocks = {}
+            self.floor_signatures = {}
+        signatures = self._floor_signatures()
+        self.updated_floors = []
+        for floor in self.building.floors:
+            signature = signatures.get(floor, ((), ()))
+            if floor in self.floor_blocks and \
+                    self.floor_signatures.get(floor, ((), ())) == signature:
+                continue
+            self.floor_blocks[floor] = self._render_floor(floor, signature)
+            self.updated_floors.append(floor)
+        self.floor_signatures = signatures
+
+    def render(self) -> str:
+        self._update()
+        self.frames_rendered += 1
+        return "".join(
+            [self.floor_blocks[floor] for floor in reversed(self.building.floors)] +
+            [self.floor_sep]
+        )
+
+    def render_changes(self) -> Dict[Floor, str]:
+        # just the floors redrawn since the previous frame, for displays that
+        # can update part of the screen
+        self._update()
+        self.frames_rendered += 1
+        return {
+            floor: self.floor_blocks[floor]
+            for floor in self.updated_floors
+        }
+
+    def frame_for_tick(self) -> Optional[str]:
+        if self.building.time % self.every != 0:
+            return None
+        return self.render()
+
+
+def render_building(building: Building) -> str:
+    return BuildingRenderer(building).render()
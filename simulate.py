@@ -0,0 +1,221 @@
+import argparse
+import json
+import sys
+import time
+from typing import Dict, Iterator, List
+
+from metrics import TripAggregator, TripStats
+from model import SCHEDULING_MODES, Building
+
+
+# Command line runner for a single simulation: `python -m simulate --floors 20
+# --cars 3 --profile up_peak` prints a short summary of the run. Only the
+# model and metrics are imported up front; dispatchers, traffic, the event
+# engine, the NumPy engine and the renderer are imported when a flag needs
+# them, so short runs in scripts don't pay for what they don't use.
+
+# dispatch module classes by command line name, imported on use
+DISPATCHERS = {
+    "nearest": "NearestCarDispatcher",
+    "cost": "CostBasedDispatcher",
+    "lookahead": "LookaheadDispatcher",
+    "destination": "DestinationDispatcher",
+}
+PROFILES = ("poisson", "up_peak", "down_peak", "lunch_time")
+ENGINES = ("tick", "event", "vectorized")
+FORMATS = ("text", "json")
+
+
+def floor_ids(floors: List[str]) -> List[str]:
+    # a single number is a floor count, G and then 1 up, like the benchmark
+    if len(floors) == 1 and floors[0].isdigit():
+        return ["G"] + [str(num) for num in range(1, int(floors[0]))]
+    return floors
+
+
+def build_arrivals(floors: List[str], profile: str=None, trace: str=None, passengers: int=100,
+                   duration: int=3600, seed: int=0) -> Iterator:
+    import itertools
+    from traffic import TRAFFIC_PROFILES, read_trace
+    if trace is not None:
+        return read_trace(trace)
+    arrivals = TRAFFIC_PROFILES[profile](floors, rate=passengers / duration, seed=seed)
+    return itertools.islice(arrivals, passengers)
+
+
+def build_building(floors: List[str], cars: int, dispatcher: str=None,
+                   scheduling: str="single") -> Building:
+    if dispatcher is not None:
+        if (dispatcher == "destination") != (scheduling == "destination"):
+            raise ValueError("ERROR: the destination dispatcher goes with scheduling=destination")
+        import dispatch
+        dispatcher = getattr(dispatch, DISPATCHERS[dispatcher])()
+    building = Building(
+        floors=floors, dispatcher=dispatcher, metrics=[TripAggregator()], scheduling=scheduling
+    )
+    building.build_elevators(number=cars)
+    return building
+
+
+def _run_tick(building: Building, max_ticks: int, render_every: int=None, frames=None) -> None:
+    renderer = None
+    if render_every is not None:
+        from render import BuildingRenderer
+        renderer = BuildingRenderer(building, every=render_every)
+    while (max_ticks is None or building.time < max_ticks) and not building.is_idle():
+        building.time_step()
+        if renderer is not None:
+            frame = renderer.frame_for_tick()
+            if frame is not None:
+                print("tick {0}\n{1}".format(building.time, frame), file=frames)
+
+
+def _run_event(building: Building, max_ticks: int) -> None:
+    from events import EventDrivenSimulation
+    simulation = EventDrivenSimulation(building)
+    simulation.take_arrivals()
+    simulation.run(until=max_ticks)
+
+
+def _run_vectorized(building: Building, max_ticks: int) -> Dict:
+    # VectorizedBuilding has no arrival stream, arrivals due at a tick are
+    # added just before it like Building.pull_arrivals does
+    from vectorized import VectorizedBuilding
+    engine = VectorizedBuilding.from_building(building)
+    arrivals = building.arrivals
+    next_arrival = building.next_arrival
+    building.arrivals = building.next_arrival = None
+    while (max_ticks is None or engine.ticks < max_ticks) and (
+        next_arrival is not None or engine.waiting_count + engine.riding_count > 0
+    ):
+        origins = []
+        destinations = []
+        while next_arrival is not None and next_arrival[0] <= engine.ticks:
+            origins.append(next_arrival[1])
+            destinations.append(next_arrival[2])
+            next_arrival = next(arrivals, None)
+        if len(origins) > 0:
+            engine.add_passengers(origins, destinations)
+        engine.time_step()
+    trips = TripStats()
+    ids, wait_ticks, ride_ticks = engine.completed_trips()
+    for wait, ride in zip(wait_ticks.tolist(), ride_ticks.tolist()):
+        trips.add(wait, ride)
+    return {
+        "ticks": engine.ticks,
+        "arrivals": engine._next_passenger_id,
+        "served": trips.trip.count,
+        "waiting": engine.waiting_count,
+        "riding": engine.riding_count,
+        "trips": trips,
+    }
+
+
+def run_simulation(floors: List[str], cars: int=1, profile: str="poisson", trace: str=None,
+                   passengers: int=100, duration: int=3600, seed: int=0, max_ticks: int=None,
+                   dispatcher: str=None, scheduling: str="single", engine: str="tick",
+                   render_every: int=None, frames=None) -> Dict:
+    # Runs one building until everybody is served or max_ticks and returns
+    # the summary. Generated traffic spreads `passengers` over `duration`
+    # ticks and stops at 4 * duration by default; a trace runs until it's
+    # served unless max_ticks says otherwise.
+    if engine not in ENGINES:
+        raise ValueError("ERROR: unknown engine {0}".format(engine))
+    if render_every is not None and engine != "tick":
+        raise ValueError("ERROR: only the tick engine renders frames")
+    if engine == "vectorized" and dispatcher not in (None, "nearest"):
+        raise ValueError("ERROR: the vectorized engine only reproduces the nearest dispatcher")
+    if trace is None and profile not in PROFILES:
+        raise ValueError("ERROR: unknown traffic profile {0}".format(profile))
+    if trace is None and max_ticks is None:
+        max_ticks = 4 * duration
+    floors = floor_ids(floors)
+    building = build_building(floors, cars, dispatcher, scheduling)
+    building.add_arrivals(build_arrivals(floors, profile, trace, passengers, duration, seed))
+    started = time.perf_counter()
+    if engine == "vectorized":
+        result = _run_vectorized(building, max_ticks)
+    else:
+        if engine == "event":
+            _run_event(building, max_ticks)
+        else:
+            _run_tick(building, max_ticks, render_every, frames)
+        result = {
+            "ticks": building.time,
+            "served": building.metrics[0].overall.trip.count,
+            "waiting": sum(len(queue) for queue in building.hall_calls.values()),
+            "riding": sum(len(elevator.passengers) for elevator in building.elevators),
+            "trips": building.metrics[0].overall,
+        }
+        # the event engine doesn't count arrivals, everybody who arrived is
+        # served, waiting or riding
+        result["arrivals"] = result["served"] + result["waiting"] + result["riding"]
+    wall_seconds = time.perf_counter() - started
+    summary = {
+        "engine": engine,
+        "floors": len(floors),
+        "cars": cars,
+        "traffic": trace if trace is not None else profile,
+    }
+    trips = result.pop("trips")
+    summary.update(result)
+    summary["wall_seconds"] = wall_seconds
+    summary.update(trips.summary())
+    return summary
+
+
+def format_summary(summary: Dict) -> str:
+    lines = [
+        "{engine} engine, {floors} floors, {cars} cars, {traffic}: {arrivals} arrivals".format(**summary),
+        "served {served}, waiting {waiting}, riding {riding} after {ticks} ticks "
+        "({wall_seconds:.3f}s)".format(**summary),
+    ]
+    for name in ("wait", "ride", "trip"):
+        stats = summary[name]
+        if stats["count"] == 0:
+            continue
+        lines.append("{0:<5} mean {1:.1f}  p50 {2}  p95 {3}  p99 {4}".format(
+            name, stats["mean"], stats["p50"], stats["p95"], stats["p99"]
+        ))
+    return "\n".join(lines)
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m simulate", description="Run one elevator simulation and summarize it"
+    )
+    parser.add_argument("--floors", nargs="+", default=["10"],
+                        help="floor ids from the bottom up, or a single floor count")
+    parser.add_argument("--cars", type=int, default=1)
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument("--profile", default="poisson", choices=PROFILES)
+    traffic.add_argument("--trace", help="replay a .csv or .jsonl time, origin, destination trace")
+    parser.add_argument("--passengers", type=int, default=100)
+    parser.add_argument("--duration", type=int, default=3600,
+                        help="ticks over which generated passengers arrive")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=None,
+                        help="tick budget, 4 * duration by default, unlimited for traces")
+    parser.add_argument("--dispatcher", choices=sorted(DISPATCHERS), default=None)
+    parser.add_argument("--scheduling", default="single", choices=SCHEDULING_MODES)
+    parser.add_argument("--engine", default="tick", choices=ENGINES,
+                        help="vectorized needs numpy")
+    parser.add_argument("--render", type=int, default=None, metavar="TICKS",
+                        help="draw the building to stderr every TICKS ticks")
+    parser.add_argument("--format", default="text", choices=FORMATS)
+    args = parser.parse_args(argv)
+    summary = run_simulation(
+        args.floors, cars=args.cars, profile=args.profile, trace=args.trace,
+        passengers=args.passengers, duration=args.duration, seed=args.seed,
+        max_ticks=args.max_ticks, dispatcher=args.dispatcher, scheduling=args.scheduling,
+        engine=args.engine, render_every=args.render, frames=sys.stderr
+    )
+    if args.format == "json":
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_summary(summary))
+
+
+if __name__ == '__main__':
+    main()
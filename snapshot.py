@@ -0,0 +1,409 @@
+import itertools
+import struct
+from collections import deque
+from typing import Dict, Iterable, List
+
+from demand import DecayingHistogram, DemandModel
+from model import Building, Elevator, ElevatorSpec, Passenger
+
+
+SNAPSHOT_MAGIC = b"ELVS"
+SNAPSHOT_VERSION = 5
+
+# everything little endian; floors are stored as their index in
+# building.floors, None times and floors as -1
+HEADER = struct.Struct("<4sH")
+BUILDING_RECORD = struct.Struct("<qqI")  # time, arrivals_added, floor count
+# capacity, door open and close, transfer, floor_height, rated_speed, acceleration
+SPEC_RECORD = struct.Struct("<idddddd")
+# origin, destination, final floor, wait, ride, arrival, boarding, alighting,
+# id of the elevator the passenger was given (destination scheduling)
+PASSENGER_RECORD = struct.Struct("<iiiqqqqqi")
+# id, current, desired, vector, busy_time, run_floors, doors_open, zone
+ELEVATOR_RECORD = struct.Struct("<iiicdiBi")
+# half_life, bin_ticks, day_ticks, day_decay, history_weight, uniform_weight,
+# replan_ticks, arrivals_seen
+DEMAND_RECORD = struct.Struct("<dqqdddqq")
+WEIGHT = struct.Struct("<d")
+COUNT = struct.Struct("<I")
+FLAG = struct.Struct("<B")
+TIME = struct.Struct("<q")
+FLOOR_INDEX = struct.Struct("<i")
+
+
+def _none_to(value, default):
+    return default if value is None else value
+
+
+def _to_none(value, default):
+    return None if value == default else value
+
+
+class _SnapshotWriter:
+
+    def __init__(self, building: Building):
+        self.floor_index = building.floor_index
+        self.parts = []  # type: List[bytes]
+
+    def pack(self, record: struct.Struct, *values) -> None:
+        self.parts.append(record.pack(*values))
+
+    def string(self, value: str) -> None:
+        encoded = value.encode("utf-8")
+        self.pack(COUNT, len(encoded))
+        self.parts.append(encoded)
+
+    def floor(self, floor) -> int:
+        return -1 if floor is None else self.floor_index[floor]
+
+    def floors(self, floor_idxs: Iterable[int]) -> None:
+        floor_idxs = list(floor_idxs)
+        self.pack(COUNT, len(floor_idxs))
+        self.parts.append(struct.pack("<{0}i".format(len(floor_idxs)), *floor_idxs))
+
+    def weights(self, weights: List[float]) -> None:
+        self.pack(COUNT, len(weights))
+        self.parts.append(struct.pack("<{0}d".format(len(weights)), *weights))
+
+    def demand(self, demand: DemandModel, building: Building) -> None:
+        # what the model learned and the parking plans of the current epoch
+        self.pack(
+            DEMAND_RECORD,
+            demand.half_life, demand.bin_ticks, demand.day_ticks, demand.day_decay,
+            demand.history_weight, demand.uniform_weight, demand.replan_ticks,
+            demand.arrivals_seen
+        )
+        self.pack(FLAG, demand.recent is not None)
+        if demand.recent is not None:
+            self.pack(TIME, demand.recent.origin)
+            self.pack(WEIGHT, demand.recent.total)
+            self.weights(demand.recent.counts)
+        self.pack(COUNT, len(demand.by_time_of_day))
+        for time_bin, (day, counts) in sorted(demand.by_time_of_day.items()):
+            self.pack(TIME, time_bin)
+            self.pack(TIME, day)
+            self.weights(counts)
+        self.pack(TIME, _none_to(demand._plan_epoch, -1))
+        self.pack(COUNT, len(demand._plans))
+        for zone, floors in demand._plans.items():
+            self.pack(FLOOR_INDEX, -1 if zone is None else building.zones.index(zone))
+            self.floors(self.floor(floor) for floor in floors)
+
+    def spec(self, spec: ElevatorSpec) -> None:
+        self.pack(
+            SPEC_RECORD,
+            _none_to(spec.capacity, -1), spec.door_open_time, spec.door_close_time,
+            spec.transfer_time, _none_to(spec.floor_height, -1.0),
+            _none_to(spec.rated_speed, -1.0), _none_to(spec.acceleration, -1.0)
+        )
+
+    def passengers(self, passengers: Iterable[Passenger]) -> None:
+        passengers = list(passengers)
+        self.pack(COUNT, len(passengers))
+        for passenger in passengers:
+            self.pack(
+                PASSENGER_RECORD,
+                self.floor(passenger.origin_floor), self.floor(passenger.desired_floor),
+                self.floor(passenger.final_floor), passenger.time_waiting_for_elevator, passenger.time_inside_elevator,
+                _none_to(passenger.arrival_time, -1), _none_to(passenger.boarding_time, -1),
+                _none_to(passenger.alighting_time, -1),
+                -1 if passenger.elevator is None else passenger.elevator.elevator_id
+            )
+
+
+class _SnapshotReader:
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, record: struct.Struct) -> tuple:
+        if self.offset + record.size > len(self.data):
+            raise ValueError("ERROR: snapshot is truncated")
+        values = record.unpack_from(self.data, self.offset)
+        self.offset += record.size
+        return values
+
+    def count(self) -> int:
+        return self.unpack(COUNT)[0]
+
+    def string(self) -> str:
+        size = self.count()
+        value = bytes(self.data[self.offset:self.offset + size]).decode("utf-8")
+        self.offset += size
+        return value
+
+    def floors(self) -> List[int]:
+        return list(self.unpack(struct.Struct("<{0}i".format(self.count()))))
+
+    def weights(self) -> List[float]:
+        return list(self.unpack(struct.Struct("<{0}d".format(self.count()))))
+
+    def demand(self, building: Building) -> DemandModel:
+        half_life, bin_ticks, day_ticks, day_decay, history_weight, uniform_weight, \
+            replan_ticks, arrivals_seen = self.unpack(DEMAND_RECORD)
+        demand = DemandModel(
+            half_life=half_life, bin_ticks=bin_ticks, day_ticks=day_ticks, day_decay=day_decay,
+            history_weight=history_weight, uniform_weight=uniform_weight,
+            replan_ticks=replan_ticks
+        )
+        demand.arrivals_seen = arrivals_seen
+        if self.unpack(FLAG)[0]:
+            origin, = self.unpack(TIME)
+            total, = self.unpack(WEIGHT)
+            counts = self.weights()
+            demand.recent = DecayingHistogram(len(counts), half_life)
+            demand.recent.origin = origin
+            demand.recent.total = total
+            demand.recent.counts = counts
+        for bin_idx in range(self.count()):
+            time_bin, = self.unpack(TIME)
+            day, = self.unpack(TIME)
+            demand.by_time_of_day[time_bin] = [day, self.weights()]
+        demand._plan_epoch = _to_none(self.unpack(TIME)[0], -1)
+        for plan_idx in range(self.count()):
+            zone_idx, = self.unpack(FLOOR_INDEX)
+            zone = None if zone_idx == -1 else building.zones[zone_idx]
+            demand._plans[zone] = [building.floors[floor_idx] for floor_idx in self.floors()]
+        return demand
+
+    def spec(self) -> ElevatorSpec:
+        capacity, door_open_time, door_close_time, transfer_time, floor_height, rated_speed, \
+            acceleration = self.unpack(SPEC_RECORD)
+        return ElevatorSpec(
+            capacity=_to_none(capacity, -1), door_open_time=door_open_time,
+            door_close_time=door_close_time, transfer_time=transfer_time,
+            floor_height=_to_none(floor_height, -1.0), rated_speed=_to_none(rated_speed, -1.0),
+            acceleration=_to_none(acceleration, -1.0)
+        )
+
+    def passengers(self, building: Building, assigned: list=None) -> List[Passenger]:
+        # (passenger, elevator id) of the passengers given an elevator go on
+        # `assigned`, to be linked up once the elevators exist
+        passengers = []
+        for passenger_idx in range(self.count()):
+            origin, destination, final, wait, ride, arrival, boarding, alighting, elevator_id = \
+                self.unpack(PASSENGER_RECORD)
+            passenger = Passenger(building.floors[origin], building.floors[destination], building)
+            passenger.final_floor = None if final == -1 else building.floors[final]
+            passenger.time_waiting_for_elevator = wait
+            passenger.time_inside_elevator = ride
+            passenger.arrival_time = _to_none(arrival, -1)
+            passenger.boarding_time = _to_none(boarding, -1)
+            passenger.alighting_time = _to_none(alighting, -1)
+            if elevator_id != -1 and assigned is not None:
+                assigned.append((passenger, elevator_id))
+            passengers.append(passenger)
+        return passengers
+
+
+def snapshot(building: Building) -> bytes:
+    # The whole simulation state in a versioned binary format, including
+    # what a demand model learned. Dispatchers, metrics sinks and arrival
+    # streams are code rather than state: restore takes them as arguments,
+    # and the already pulled next arrival plus the count of arrivals added
+    # so far let a restored run pick its stream up where the snapshot left
+    # it.
+    writer = _SnapshotWriter(building)
+    writer.pack(HEADER, SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+    writer.string(building.scheduling)
+    writer.pack(BUILDING_RECORD, building.time, building.arrivals_added, len(building.floors))
+    for floor in building.floors:
+        writer.string(floor.floor_id)
+    writer.spec(building.elevator_spec)
+    writer.pack(COUNT, len(building.zones))
+    for zone in building.zones:
+        writer.string(zone.name)
+        writer.floors(writer.floor(floor) for floor in zone.floor_list)
+        writer.floors(writer.floor(floor) for floor in zone.parking_floors)
+    writer.pack(FLAG, building.demand is not None)
+    if building.demand is not None:
+        writer.demand(building.demand, building)
+
+    writer.pack(FLAG, building.next_arrival is not None)
+    if building.next_arrival is not None:
+        time, origin_floor, desired_floor = building.next_arrival
+        writer.pack(TIME, time)
+        writer.pack(FLOOR_INDEX, writer.floor(building.get_floor(origin_floor)))
+        writer.pack(FLOOR_INDEX, writer.floor(building.get_floor(desired_floor)))
+
+    writer.pack(COUNT, len(building.hall_calls))
+    for (floor, vector), queue in building.hall_calls.items():
+        writer.pack(FLOOR_INDEX, writer.floor(floor))
+        writer.pack(FLAG, vector == "^")
+        writer.passengers(queue)
+
+    writer.pack(COUNT, len(building.elevators))
+    for elevator in building.elevators:
+        writer.pack(
+            ELEVATOR_RECORD,
+            elevator.elevator_id, writer.floor(elevator.current_floor),
+            writer.floor(elevator.desired_floor), elevator.current_vector.encode("ascii"),
+            elevator.busy_time, elevator.run_floors, elevator.doors_open,
+            -1 if elevator.zone is None else building.zones.index(elevator.zone)
+        )
+        writer.floors(writer.floor(floor) for floor in elevator.floor_path)
+        writer.floors(elevator.stops.up)
+        writer.floors(elevator.stops.down)
+        writer.pack(FLAG, elevator.spec is building.elevator_spec)
+        if elevator.spec is not building.elevator_spec:
+            writer.spec(elevator.spec)
+        writer.passengers(elevator.passengers)
+    return b"".join(writer.parts)
+
+
+def restore(data: bytes, dispatcher=None, metrics=None, arrivals: Iterable=None,
+            demand=None) -> Building:
+    # arrivals, if given, is the same stream the snapshotted building was
+    # fed from the start; the arrivals it already added are skipped. The
+    # building gets the snapshot's demand model unless another one is given
+    reader = _SnapshotReader(data)
+    magic, version = reader.unpack(HEADER)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("ERROR: not a building snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError("ERROR: unsupported snapshot version {0}".format(version))
+    scheduling = reader.string()
+    time, arrivals_added, floor_count = reader.unpack(BUILDING_RECORD)
+    floors = [reader.string() for floor_idx in range(floor_count)]
+    building = Building(
+        floors, dispatcher=dispatcher, metrics=metrics,
+        scheduling=scheduling, elevator_spec=reader.spec(), demand=demand
+    )
+    building.time = time
+    building.arrivals_added = arrivals_added
+    for zone_idx in range(reader.count()):
+        name = reader.string()
+        zone_floors = reader.floors()
+        parking_floors = reader.floors()
+        building.add_zone(
+            name, [building.floors[floor_idx] for floor_idx in zone_floors],
+            parking_floors=[building.floors[floor_idx] for floor_idx in parking_floors]
+        )
+    if reader.unpack(FLAG)[0]:
+        restored_demand = reader.demand(building)
+        if building.demand is None:
+            building.demand = restored_demand
+
+    next_arrival = None
+    if reader.unpack(FLAG)[0]:
+        next_time, = reader.unpack(TIME)
+        origin_idx, = reader.unpack(FLOOR_INDEX)
+        desired_idx, = reader.unpack(FLOOR_INDEX)
+        next_arrival = (next_time, building.floors[origin_idx], building.floors[desired_idx])
+    if arrivals is not None:
+        building.add_arrivals(itertools.islice(arrivals, arrivals_added, None))
+    elif next_arrival is not None:
+        building.add_arrivals([next_arrival])
+
+    assigned = []
+    for hall_call_idx in range(reader.count()):
+        floor = building.floors[reader.unpack(FLOOR_INDEX)[0]]
+        vector = "^" if reader.unpack(FLAG)[0] else "v"
+        building.hall_calls[(floor, vector)] = deque(reader.passengers(building, assigned))
+
+    for elevator_idx in range(reader.count()):
+        elevator_id, current_idx, desired_idx, vector, busy_time, run_floors, doors_open, \
+            zone_idx = reader.unpack(ELEVATOR_RECORD)
+        floor_path = reader.floors()
+        stops_up = reader.floors()
+        stops_down = reader.floors()
+        spec = None if reader.unpack(FLAG)[0] else reader.spec()
+        zone = None if zone_idx == -1 else building.zones[zone_idx]
+        elevator = Elevator(building, spec=spec, zone=zone)
+        building.build_elevator(elevator)
+        elevator.elevator_id = elevator_id
+        elevator.current_floor = building.floors[current_idx]
+        elevator.desired_floor = None if desired_idx == -1 else building.floors[desired_idx]
+        elevator.current_vector = vector.decode("ascii")
+        elevator.floor_path = building.get_path_view(
+            elevator.current_floor,
+            building.floors[floor_path[-1]] if len(floor_path) > 0 else elevator.current_floor
+        )
+        elevator.stops.up = stops_up
+        elevator.stops.down = stops_down
+        elevator.busy_time = busy_time
+        elevator.run_floors = run_floors
+        elevator.doors_open = bool(doors_open)
+        elevator.passengers = reader.passengers(building)
+    if reader.offset != len(reader.data):
+        raise ValueError("ERROR: snapshot has trailing data")
+    elevators = {elevator.elevator_id: elevator for elevator in building.elevators}
+    for passenger, elevator_id in assigned:
+        elevator = passenger.elevator = elevators[elevator_id]
+        elevator.assigned[passenger.desired_floor] = elevator.assigned.get(passenger.desired_floor, 0) + 1
+    if scheduling == "destination":
+        building.unassigned = [
+            passenger
+            for queue in building.hall_calls.values()
+            for passenger in queue
+            if passenger.elevator is None
+        ]
+    return building
+
+
+def save_snapshot(building: Building, path: str) -> int:
+    data = snapshot(building)
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(data)
+    return len(data)
+
+
+def load_snapshot(path: str, dispatcher=None, metrics=None, arrivals: Iterable=None,
+                  demand=None) -> Building:
+    with open(path, "rb") as snapshot_file:
+        return restore(
+            snapshot_file.read(), dispatcher=dispatcher, metrics=metrics, arrivals=arrivals,
+            demand=demand
+        )
+
+
+def _copy_passenger(passenger: Passenger) -> Passenger:
+    copied = Passenger.__new__(Passenger)
+    for slot in Passenger.__slots__:
+        setattr(copied, slot, getattr(passenger, slot))
+    return copied
+
+
+def fork(building: Building, dispatcher=None, metrics=None) -> Building:
+    # In memory copy to run a what-if branch from. Floors, elevator specs and
+    # (unless another one is given) the dispatcher are shared, everything a
+    # time_step changes, including what the demand model learned, is
+    # copied. The arrival stream is split with tee so both buildings see the
+    # same future arrivals and only the ones between the two are buffered.
+    forked = Building(
+        building.floors,
+        dispatcher=dispatcher if dispatcher is not None else building.dispatcher,
+        metrics=metrics, scheduling=building.scheduling,
+        elevator_spec=building.elevator_spec,
+        demand=building.demand.copy() if building.demand is not None else None
+    )
+    forked.time = building.time
+    forked.zones = list(building.zones)
+    forked.arrivals_added = building.arrivals_added
+    forked.next_arrival = building.next_arrival
+    if building.arrivals is not None:
+        building.arrivals, forked.arrivals = itertools.tee(building.arrivals)
+    waiting = {}  # type: Dict[Passenger, Passenger]
+    for hall_call, queue in building.hall_calls.items():
+        forked.hall_calls[hall_call] = deque(_copy_passenger(passenger) for passenger in queue)
+        waiting.update(zip(queue, forked.hall_calls[hall_call]))
+    elevators = {}  # type: Dict[Elevator, Elevator]
+    for elevator in building.elevators:
+        copied = elevators[elevator] = Elevator(forked, spec=elevator.spec, zone=elevator.zone)
+        forked.build_elevator(copied)
+        for slot in Elevator.__slots__:
+            if slot not in ("stops", "floor_path", "passengers", "assigned"):
+                setattr(copied, slot, getattr(elevator, slot))
+        copied.floor_path = elevator.floor_path.copy()
+        copied.stops.up = list(elevator.stops.up)
+        copied.stops.down = list(elevator.stops.down)
+        copied.passengers = [_copy_passenger(passenger) for passenger in elevator.passengers]
+        copied.assigned = dict(elevator.assigned)
+    for passenger in waiting.values():
+        if passenger.elevator is not None:
+            passenger.elevator = elevators[passenger.elevator]
+    forked.unassigned = [
+        waiting[passenger] for passenger in building.unassigned if passenger in waiting
+    ]
+    return forked
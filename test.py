@@ -1,8 +1,47 @@
 
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
 import random
+from collections import OrderedDict
 
-from model import Building, Elevator, Floor, Passenger
+from batch import BatchSummary, Sweep, expand_grid, read_grid, run_batch
+from controller import CAR_CALL, HALL_CALL, RealTimeController, SimulatedDevice, serve_calls
+from demand import DecayingHistogram, DemandModel
+from benchmark import build_scenario, compare_engines, run_benchmarks, run_scenario
+from dispatch import (
+    CostBasedDispatcher, DestinationDispatcher, LookaheadDispatcher, NearestCarDispatcher
+)
+from events import EventDrivenSimulation
+from fleet import fleet_scenarios, partition_fleet, run_fleet
+from instrument import PhaseProfiler
+from lookahead import LookaheadEvaluator
+from metrics import (
+    HandlingCapacity, PrintMetricsSink, StreamingStats, TripAggregator, TripLogWriter, TripStats,
+    read_trip_log
+)
+from model import (
+    PENDING_CALLS_CACHE_SIZE, Building, Elevator, ElevatorSpec, Floor, FloorPath, Passenger,
+    StopSet
+)
+from render import BuildingRenderer, render_building
+from simulate import main as simulate_main
+from simulate import run_simulation
+from snapshot import SNAPSHOT_VERSION, fork, load_snapshot, restore, save_snapshot, snapshot
+from traffic import (
+    down_peak_arrivals, lunch_time_arrivals, poisson_arrivals, read_trace,
+    up_peak_arrivals, write_trace
+)
+from trips import MappedTripStore, MappedTrips, TripStore
+from trips import main as trips_main
+from vectorized import VectorizedBuilding, np
 
 
 class TestFloorClass(unittest.TestCase):
@@ -16,11 +55,30 @@ class TestFloorClass(unittest.TestCase):
         self.assertEqual(str(Floor("LB")),  "(F: LB)")
         self.assertEqual(str(Floor("100")), "(F: 100)")
 
+    def test_eq_hash(self):
+        self.assertEqual(Floor("1"), Floor("1"))
+        self.assertNotEqual(Floor("1"), Floor("2"))
+        self.assertEqual(len({Floor("1"), Floor("1"), Floor("2")}), 2)
+
 
 class TestPassengerClass(unittest.TestCase):
 
     def test_constructor(self):
-        pass
+        building = Building(floors=["G", "1", "2"])
+        passenger = Passenger("G", "2", building)
+        self.assertIs(passenger.origin_floor, building.floors[0])
+        self.assertIs(passenger.desired_floor, building.floors[2])
+        with self.assertRaises(ValueError):
+            Passenger("G", "3", building)
+        with self.assertRaises(ValueError):
+            Passenger("1", "1", building)
+
+    def test_compact(self):
+        building = Building(floors=["G", "1"])
+        passenger = Passenger("G", "1", building)
+        building.build_elevators(number=1)
+        for obj in (Floor("G"), passenger, building.elevators[0]):
+            self.assertFalse(hasattr(obj, "__dict__"))
 
     def test_elevator_wait_time(self):
         pass
@@ -38,11 +96,59 @@ class TestBuildingClass(unittest.TestCase):
         pass
 
     def test_add_passenger(self):
-        pass
+        building = Building(floors=["G", "1", "2"])
+        first = Passenger("1", "2", building)
+        second = Passenger("1", "G", building)
+        third = Passenger("1", "2", building)
+        for passenger in (first, second, third):
+            building.add_passenger(passenger)
+        self.assertEqual(
+            list(building.hall_calls[(Floor("1"), "^")]), [first, third]
+        )
+        self.assertEqual(list(building.hall_calls[(Floor("1"), "v")]), [second])
+        self.assertEqual(len(building.passengers), 3)
+        building.remove_passenger(first)
+        self.assertEqual(list(building.hall_calls[(Floor("1"), "^")]), [third])
+        building.remove_passenger(second)
+        self.assertNotIn((Floor("1"), "v"), building.hall_calls)
 
     def test_add_passengers(self):
         pass
 
+    def test_add_many_passengers(self):
+        building = Building(floors=["G", "1"])
+        building.add_passengers(
+            Passenger("G", "1", building) for i in range(5000)
+        )
+        self.assertEqual(len(building.passengers), 5000)
+
+    def test_add_arrivals(self):
+        building = Building(floors=["G", "1", "2"])
+        arrivals = iter([(0, "G", "2"), (2, "1", "G"), (2, "2", "1"), (9, "G", "1")])
+        building.add_arrivals(arrivals)
+        building.add_arrivals([(1, "2", "G")])
+        building.pull_arrivals()
+        self.assertEqual(len(building.passengers), 1)
+        building.time_step()
+        building.time_step()
+        self.assertEqual(len(building.passengers), 2)
+        building.time_step()
+        self.assertEqual(len(building.passengers), 4)
+        self.assertTrue(building.arrivals_pending)
+        for i in range(7):
+            building.time_step()
+        self.assertFalse(building.arrivals_pending)
+        self.assertEqual(len(building.passengers), 5)
+        self.assertFalse(building.is_idle())
+        self.assertTrue(Building(floors=["G", "1"]).is_idle())
+
+    def test_instances_are_isolated(self):
+        first = Building(floors=["G", "1"])
+        second = Building(floors=["G", "1"])
+        first.build_elevators(number=2)
+        self.assertEqual(len(first.elevators), 2)
+        self.assertEqual(len(second.elevators), 0)
+
     def test_build_elevator(self):
         pass
 
@@ -50,7 +156,484 @@ class TestBuildingClass(unittest.TestCase):
         pass
 
     def test_floor_exists(self):
-        pass
+        building = Building(floors=["G", "1", "2"])
+        self.assertTrue(building.floor_exists(Floor("1")))
+        self.assertFalse(building.floor_exists(Floor("3")))
+
+    def test_floor_lookups(self):
+        building = Building(floors=["G", "1", "2", "3"])
+        self.assertIs(building.get_floor("2"), building.floors[2])
+        self.assertIs(building.get_floor(Floor("2")), building.floors[2])
+        self.assertIsNone(building.get_floor("4"))
+        self.assertEqual(building.floor_distance(Floor("G"), Floor("3")), 3)
+        self.assertEqual(building.floor_distance(Floor("G"), Floor("4")), -1)
+        self.assertEqual(building.get_vector_direction(Floor("2"), Floor("1")), "v")
+        self.assertEqual(
+            building.get_floor_path(Floor("G"), Floor("2")),
+            [Floor("1"), Floor("2")]
+        )
+        self.assertEqual(
+            building.get_floor_path(Floor("3"), Floor("G")),
+            [Floor("2"), Floor("1"), Floor("G")]
+        )
+        with self.assertRaises(ValueError):
+            Building(floors=["G", "1", "1"])
+
+    def test_path_views(self):
+        building = Building(floors=["G", "1", "2", "3", "4"])
+        up = building.get_path_view(Floor("G"), Floor("3"))
+        down = building.get_path_view(Floor("4"), Floor("1"))
+        self.assertEqual(up, [Floor("1"), Floor("2"), Floor("3")])
+        self.assertEqual(down, [Floor("3"), Floor("2"), Floor("1")])
+        self.assertEqual(len(building.get_path_view(Floor("2"), Floor("2"))), 0)
+        self.assertIn(Floor("2"), down)
+        self.assertNotIn(Floor("4"), down)
+        self.assertNotIn(Floor("G"), up)
+        self.assertEqual(down[-1], Floor("1"))
+        copied = up.copy()
+        up.advance()
+        self.assertEqual(up[0], Floor("2"))
+        self.assertNotIn(Floor("1"), up)
+        self.assertEqual(len(copied), 3)
+        up.advance(5)
+        self.assertEqual(len(up), 0)
+        with self.assertRaises(IndexError):
+            up[0]
+        with self.assertRaises(ValueError):
+            FloorPath(building.floors, building.floor_index, 0, 4, 2)
+
+
+class TestLookScheduling(unittest.TestCase):
+
+    def build(self, cars=1):
+        building = Building(
+            floors=["G"] + [str(num) for num in range(1, 10)],
+            scheduling="look"
+        )
+        building.build_elevators(number=cars)
+        return building
+
+    def test_stop_set_look_order(self):
+        building = self.build()
+        stops = StopSet(building)
+        stops.add(Floor("7"), "^")
+        stops.add(Floor("2"), "^")
+        stops.add(Floor("8"), "v")
+        stops.add(Floor("3"), "v")
+        stops.add(Floor("7"), "^")
+        self.assertEqual(len(stops), 4)
+        self.assertEqual(list(stops), [Floor("2"), Floor("3"), Floor("7"), Floor("8")])
+        self.assertEqual(stops.next_stop(Floor("5"), "^"), Floor("7"))
+        self.assertEqual(stops.next_stop(Floor("5"), "v"), Floor("3"))
+        self.assertEqual(stops.next_stop(Floor("4"), " "), Floor("3"))
+        stops.discard(Floor("7"))
+        self.assertNotIn(Floor("7"), stops)
+        # nothing left to pick up going up, so turn at the highest down stop
+        self.assertEqual(stops.next_stop(Floor("5"), "^"), Floor("8"))
+        self.assertTrue(stops.has_stops_ahead(Floor("5"), "^"))
+        stops.discard(Floor("8"))
+        self.assertFalse(stops.has_stops_ahead(Floor("5"), "^"))
+        self.assertEqual(stops.next_stop(Floor("5"), "^"), Floor("3"))
+        with self.assertRaises(ValueError):
+            Building(floors=["G", "1"], scheduling="scan")
+
+    def test_everybody_gets_on_and_off_in_one_stop(self):
+        building = self.build()
+        elevator = building.elevators[0]
+        elevator.current_floor = building.get_floor("G")
+        for destination in ["3", "3", "5"]:
+            building.add_passenger(Passenger("G", destination, building))
+        building.time_step()
+        self.assertEqual(len(elevator.passengers), 3)
+        self.assertEqual(len(building.passengers), 0)
+        self.assertEqual(elevator.desired_floor, Floor("3"))
+        for i in range(4):
+            building.time_step()
+        self.assertEqual(elevator.current_floor, Floor("3"))
+        self.assertEqual(len(elevator.passengers), 1)
+        self.assertEqual(elevator.desired_floor, Floor("5"))
+
+    def test_look_matches_event_mode(self):
+        arrivals = list(itertools.islice(
+            lunch_time_arrivals(["G"] + [str(num) for num in range(1, 10)], 0.4, seed=2), 80
+        ))
+        tick_building = self.build(cars=2)
+        tick_building.metrics.append(TripStore(tick_building))
+        tick_building.add_arrivals(arrivals)
+        while tick_building.time < 1000 and (
+            tick_building.arrivals_pending or
+            len(tick_building.hall_calls) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in tick_building.elevators)
+        ):
+            tick_building.time_step()
+        event_building = self.build(cars=2)
+        simulation = EventDrivenSimulation(event_building)
+        simulation.add_arrivals(arrivals)
+        simulation.run()
+        self.assertEqual(len(simulation.completed_passengers), 80)
+        trips = tick_building.metrics[0]
+        self.assertEqual(len(trips), 80)
+        self.assertEqual(
+            sorted(
+                (passenger.arrival_time, passenger.boarding_time, passenger.alighting_time)
+                for passenger in simulation.completed_passengers
+            ),
+            sorted(
+                trip[3:]
+                for trip in trips
+            )
+        )
+
+
+class TestElevatorSpec(unittest.TestCase):
+
+    def build(self, spec, scheduling="look", dispatcher=None):
+        building = Building(
+            floors=["G"] + [str(num) for num in range(1, 10)],
+            dispatcher=dispatcher,
+            scheduling=scheduling,
+            elevator_spec=spec
+        )
+        building.build_elevators(number=1)
+        building.elevators[0].current_floor = building.get_floor("G")
+        return building
+
+    def test_flight_times(self):
+        spec = ElevatorSpec(floor_height=4.0, rated_speed=2.0, acceleration=1.0)
+        # 4m reached before rated speed: 2 * sqrt(4 / 1)
+        self.assertAlmostEqual(spec.flight_time(1), 4.0)
+        # 20m: 20 / 2 + 2 / 1
+        self.assertAlmostEqual(spec.flight_time(5), 12.0)
+        self.assertAlmostEqual(
+            sum(spec.hop_time(floors) for floors in range(1, 6)) + spec.brake_time(5),
+            spec.flight_time(5)
+        )
+        self.assertEqual(ElevatorSpec().flight_time(3), 3.0)
+        self.assertFalse(ElevatorSpec(capacity=8).timed)
+        self.assertTrue(ElevatorSpec(door_open_time=2).timed)
+        with self.assertRaises(ValueError):
+            ElevatorSpec(capacity=0)
+        with self.assertRaises(ValueError):
+            ElevatorSpec(floor_height=3.0)
+
+    def test_capacity(self):
+        building = self.build(ElevatorSpec(capacity=2))
+        elevator = building.elevators[0]
+        for destination in ["3", "4", "5"]:
+            building.add_passenger(Passenger("G", destination, building))
+        building.time_step()
+        self.assertEqual(len(elevator.passengers), 2)
+        self.assertTrue(elevator.is_full)
+        self.assertEqual(len(building.passengers), 1)
+        self.assertIsNone(building.get_boarding_passenger(elevator))
+        self.assertEqual(building.dispatcher.assign(building, [elevator]), {})
+        with self.assertRaises(ValueError):
+            elevator.load_passenger(building.passengers[0], building)
+        instants = 0
+        while instants < 100 and (
+            len(building.passengers) > 0 or len(elevator.passengers) > 0
+        ):
+            building.time_step()
+            instants += 1
+        self.assertNotEqual(instants, 100)
+
+    def test_door_and_transfer_times(self):
+        spec = ElevatorSpec(door_open_time=2, door_close_time=3, transfer_time=1)
+        building = self.build(spec)
+        trips = TripStore(building)
+        building.metrics.append(trips)
+        building.add_passenger(Passenger("G", "1", building))
+        building.add_passenger(Passenger("G", "1", building))
+        for i in range(9):
+            building.time_step()
+        # on at tick 1 (doors 2 + 2 people), off at tick 9 (close 3 + 1 floor)
+        self.assertEqual([trip[3:] for trip in trips], [(0, 1, 9), (0, 1, 9)])
+        with self.assertRaises(ValueError):
+            EventDrivenSimulation(building)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    floors = ["G"] + [str(num) for num in range(1, 12)]
+
+    def arrivals(self):
+        return list(itertools.islice(lunch_time_arrivals(self.floors, 0.4, seed=8), 200))
+
+    def build(self):
+        building = Building(
+            self.floors, scheduling="look",
+            elevator_spec=ElevatorSpec(capacity=4, door_open_time=2, transfer_time=1)
+        )
+        building.build_elevators(number=3)
+        building.add_arrivals(self.arrivals())
+        for instant in range(150):
+            building.time_step()
+        return building
+
+    def finish(self, building):
+        trips = TripStore(building)
+        building.metrics.append(trips)
+        for instant in range(1000):
+            building.time_step()
+        return list(trips)
+
+    def test_restore_continues_the_same_run(self):
+        building = self.build()
+        data = snapshot(building)
+        restored = restore(data, arrivals=self.arrivals())
+        self.assertEqual(snapshot(restored), data)
+        self.assertEqual(str(restored), str(building))
+        expected = self.finish(building)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(self.finish(restored), expected)
+
+    def test_save_and_load(self):
+        building = self.build()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "building.snapshot")
+            self.assertGreater(save_snapshot(building, path), 0)
+            restored = load_snapshot(path, arrivals=self.arrivals())
+        self.assertEqual(snapshot(restored), snapshot(building))
+
+    def test_bad_snapshots(self):
+        data = snapshot(self.build())
+        with self.assertRaises(ValueError):
+            restore(b"NOPE" + data[4:])
+        with self.assertRaises(ValueError):
+            restore(data[:4] + bytes([SNAPSHOT_VERSION + 1, 0]) + data[6:])
+        with self.assertRaises(ValueError):
+            restore(data[:-1])
+
+    def test_demand_parking_continues(self):
+        # a run restarted from a snapshot or forked at an arbitrary tick
+        # carries on exactly like the uninterrupted one
+        floors = ["G"] + [str(num) for num in range(1, 20)]
+        arrivals = list(poisson_arrivals(floors, 0.1, seed=46, end=600))
+        building = Building(floors, demand=DemandModel())
+        building.build_elevators(number=4)
+        building.add_arrivals(arrivals)
+        for instant in range(44):
+            building.time_step()
+        restored = restore(snapshot(building), arrivals=arrivals)
+        forked = fork(building)
+        runs = [building, restored, forked]
+        stores = [TripStore(run) for run in runs]
+        for run, trips in zip(runs, stores):
+            run.metrics.append(trips)
+        for instant in range(600):
+            for run in runs:
+                run.time_step()
+            positions = [[elevator.current_floor for elevator in run.elevators] for run in runs]
+            self.assertEqual(positions[1], positions[0])
+            self.assertEqual(positions[2], positions[0])
+            self.assertEqual(len(stores[1]), len(stores[0]))
+            self.assertEqual(len(stores[2]), len(stores[0]))
+        self.assertGreater(len(stores[0]), 0)
+        self.assertEqual(list(stores[1]), list(stores[0]))
+        self.assertEqual(list(stores[2]), list(stores[0]))
+
+    def test_fork(self):
+        building = self.build()
+        forked = fork(building)
+        self.assertEqual(snapshot(forked), snapshot(building))
+        self.assertIs(forked.floors[0], building.floors[0])
+        self.assertIsNot(forked.elevators[0], building.elevators[0])
+        forked.time_step()
+        self.assertNotEqual(forked.time, building.time)
+        building.time_step()
+        self.assertEqual(snapshot(forked), snapshot(building))
+        self.assertEqual(self.finish(forked), self.finish(building))
+
+
+class TestZones(unittest.TestCase):
+
+    floors = ["G"] + [str(num) for num in range(1, 30)]
+
+    def build(self, scheduling="single"):
+        building = Building(self.floors, scheduling=scheduling)
+        low = building.add_zone("low", self.floors[:15])
+        shuttle = building.add_zone("shuttle", ["G", "15"], parking_floors=["G"])
+        high = building.add_zone("high", self.floors[15:], parking_floors=["15"])
+        building.build_elevators(number=2, zone=low)
+        building.build_elevators(number=1, zone=shuttle)
+        building.build_elevators(number=2, zone=high)
+        return building
+
+    def test_add_zone(self):
+        building = self.build()
+        low, shuttle, high = building.zones
+        self.assertEqual(low.parking_floors, [Floor("7")])
+        self.assertEqual(
+            [str(elevator.current_floor.floor_id) for elevator in building.elevators],
+            ["7", "G", "G", "15", "29"]
+        )
+        with self.assertRaises(ValueError):
+            building.add_zone("low", ["G", "1"])
+        with self.assertRaises(ValueError):
+            building.add_zone("roof", ["29", "30"])
+        with self.assertRaises(ValueError):
+            building.add_zone("roof", ["28", "29"], parking_floors=["G"])
+        with self.assertRaises(ValueError):
+            Elevator(Building(self.floors), zone=low)
+
+    def test_calls_go_to_eligible_elevators(self):
+        building = self.build()
+        low, shuttle, high = building.zones
+        building.add_passenger(Passenger("20", "25", building))
+        self.assertEqual(building.get_pending_calls(low), [])
+        self.assertEqual(building.get_pending_calls(high), [(Floor("20"), "^")])
+        low_elevators = building.get_zone_elevators(low)
+        self.assertEqual(building.dispatcher.assign(building, low_elevators, low), {})
+        building.time_step()
+        self.assertEqual(building.elevators[3].desired_floor, Floor("20"))
+
+    def test_sky_lobby_transfers(self):
+        building = self.build(scheduling="look")
+        trips = TripStore(building)
+        building.metrics.append(trips)
+        passenger = Passenger("5", "20", building)
+        building.add_passenger(passenger)
+        self.assertEqual(passenger.desired_floor, Floor("G"))
+        self.assertEqual(passenger.final_floor, Floor("20"))
+        for instant in range(200):
+            building.time_step()
+        self.assertEqual(
+            [trip[:2] for trip in trips],
+            [(5, 0), (0, 15), (15, 20)]
+        )
+        self.assertEqual(passenger.origin_floor, Floor("15"))
+        self.assertIsNone(passenger.final_floor)
+
+    def test_zones_match_event_mode_and_snapshots(self):
+        arrivals = list(itertools.islice(poisson_arrivals(self.floors, 0.2, seed=1), 60))
+        tick_building = self.build(scheduling="look")
+        tick_trips = TripStore(tick_building)
+        tick_building.metrics.append(tick_trips)
+        tick_building.add_arrivals(arrivals)
+        for instant in range(100):
+            tick_building.time_step()
+        self.assertEqual(snapshot(restore(snapshot(tick_building))), snapshot(tick_building))
+        self.assertEqual(snapshot(fork(tick_building)), snapshot(tick_building))
+        for instant in range(1000):
+            tick_building.time_step()
+        event_building = self.build(scheduling="look")
+        event_trips = TripStore(event_building)
+        event_building.metrics.append(event_trips)
+        simulation = EventDrivenSimulation(event_building)
+        simulation.add_arrivals(arrivals)
+        simulation.run()
+        self.assertGreater(len(tick_trips), 60)
+        self.assertEqual(sorted(event_trips), sorted(tick_trips))
+
+
+class TestDispatchers(unittest.TestCase):
+
+    def build(self, dispatcher):
+        building = Building(
+            floors=["G"] + [str(num) for num in range(1, 10)],
+            dispatcher=dispatcher
+        )
+        building.build_elevators(number=2)
+        building.elevators[0].current_floor = building.get_floor("G")
+        building.elevators[1].current_floor = building.get_floor("8")
+        return building
+
+    def test_default_dispatcher(self):
+        building = Building(floors=["G", "1"])
+        self.assertIsInstance(building.dispatcher, NearestCarDispatcher)
+
+    def test_nearest_car(self):
+        building = self.build(NearestCarDispatcher())
+        building.add_passenger(Passenger("7", "G", building))
+        building.add_passenger(Passenger("2", "5", building))
+        assignments = building.dispatcher.assign(building, building.elevators)
+        self.assertEqual(assignments[building.elevators[0]], Floor("2"))
+        self.assertEqual(assignments[building.elevators[1]], Floor("7"))
+
+    def test_cost_based(self):
+        building = self.build(CostBasedDispatcher())
+        building.add_passenger(Passenger("9", "G", building))
+        building.add_passenger(Passenger("1", "5", building))
+        assignments = building.dispatcher.assign(building, building.elevators)
+        self.assertEqual(assignments[building.elevators[0]], Floor("1"))
+        self.assertEqual(assignments[building.elevators[1]], Floor("9"))
+
+    def test_cost_based_leaves_call_for_busy_elevator(self):
+        building = self.build(CostBasedDispatcher())
+        busy, idle = building.elevators[1], building.elevators[0]
+        busy.move_to_floor(
+            floor=Floor("8"), desired_floor=Floor("9"), building=building
+        )
+        building.add_passenger(Passenger("9", "G", building))
+        self.assertEqual(building.get_pending_calls(), [])
+        building.add_passenger(Passenger("7", "G", building))
+        self.assertEqual(
+            building.dispatcher.assign(building, [idle]), {}
+        )
+
+    def test_cost_based_serves_all_passengers(self):
+        building = self.build(CostBasedDispatcher())
+        for origin, destination in [("G", "9"), ("5", "1"), ("9", "2"), ("3", "4")]:
+            building.add_passenger(Passenger(origin, destination, building))
+        instants = 0
+        while instants < 100 and (
+            len(building.passengers) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in building.elevators)
+        ):
+            building.time_step()
+            instants += 1
+        self.assertNotEqual(instants, 100)
+
+    def test_pending_calls_follow_moving_elevators(self):
+        building = self.build(NearestCarDispatcher())
+        low, high = building.elevators
+        for origin, destination in [("3", "9"), ("5", "9"), ("6", "G"), ("7", "9")]:
+            building.add_passenger(Passenger(origin, destination, building))
+        low.move_to_floor(floor=Floor("1"), desired_floor=Floor("6"), building=building)
+        # on its way up past 3 and 5, not the down call at 6
+        self.assertEqual(building.get_pending_calls(), [(Floor("7"), "^")])
+        signature = building.pending_calls_signature()
+        low.move_to_floor(floor=Floor("2"), building=building)
+        self.assertEqual(building.pending_calls_signature(), signature)
+        low.move_to_floor(floor=Floor("3"), building=building)
+        low.move_to_floor(floor=Floor("4"), building=building)
+        self.assertNotEqual(building.pending_calls_signature(), signature)
+        self.assertEqual(building.get_pending_calls(), [(Floor("3"), "^"), (Floor("7"), "^")])
+
+    def test_pending_calls_cache(self):
+        class CountingCache(OrderedDict):
+            misses = 0
+
+            def __setitem__(self, key, value):
+                CountingCache.misses += 1
+                super().__setitem__(key, value)
+
+        building = Building(floors=["G"] + [str(num) for num in range(1, 100)])
+        building.build_elevators(number=2)
+        building._pending_calls = CountingCache()
+        building.add_passenger(Passenger("3", "9", building))
+        self.assertEqual(building.get_pending_calls(), [(Floor("3"), "^")])
+        self.assertEqual(CountingCache.misses, 1)
+        # another passenger on the same hall call changes no version
+        building.add_passenger(Passenger("3", "7", building))
+        for repeat in range(3):
+            self.assertEqual(building.get_pending_calls(), [(Floor("3"), "^")])
+        self.assertEqual(CountingCache.misses, 1)
+        building.add_passenger(Passenger("5", "G", building))
+        self.assertEqual(len(building.get_pending_calls()), 2)
+        self.assertEqual(CountingCache.misses, 2)
+        # least recently used signatures go once the cache is full
+        elevator = building.elevators[0]
+        for floor in building.floors[:PENDING_CALLS_CACHE_SIZE + 1]:
+            elevator.desired_floor = floor
+            building.get_pending_calls()
+        self.assertEqual(len(building._pending_calls), PENDING_CALLS_CACHE_SIZE)
+        misses = CountingCache.misses
+        building.get_pending_calls()
+        self.assertEqual(CountingCache.misses, misses)
+        elevator.desired_floor = building.floors[0]
+        building.get_pending_calls()
+        self.assertEqual(CountingCache.misses, misses + 1)
 
 
 class CompleteTestElevators(unittest.TestCase):
@@ -117,5 +700,1108 @@ class CompleteTestElevators(unittest.TestCase):
         )
 
 
+class TestLookahead(unittest.TestCase):
+
+    def setUp(self):
+        self.building = Building(
+            floors=["G"] + [str(num) for num in range(1, 20)], scheduling="look"
+        )
+        self.building.build_elevators(number=2)
+        self.low, self.high = self.building.elevators
+        self.low.current_floor = self.building.get_floor("2")
+        self.high.current_floor = self.building.get_floor("15")
+        self.evaluator = LookaheadEvaluator()
+
+    def test_predicted_wait_matches_the_building(self):
+        # a rider going down to G, then a new call at 6 that has to wait for
+        # the car to come back up
+        building = Building(floors=["G"] + [str(num) for num in range(1, 10)], scheduling="look")
+        building.build_elevators(number=1)
+        elevator = building.elevators[0]
+        elevator.current_floor = building.get_floor("2")
+        building.add_passenger(Passenger("2", "G", building))
+        for instant in range(2):
+            building.time_step()
+        self.assertEqual(elevator.current_floor, Floor("1"))
+        candidate = self.evaluator.best(building, "6", "^")
+        passenger = Passenger("6", "9", building)
+        building.add_passenger(passenger)
+        elevator.stops.add(Floor("6"), "^")
+        while passenger.boarding_time is None:
+            building.time_step()
+        self.assertEqual(candidate.wait, passenger.time_waiting_for_elevator)
+        self.assertEqual(candidate.delay, 0)
+
+    def test_best_and_delay(self):
+        best = self.evaluator.best(self.building, "12", "v")
+        self.assertIs(best.elevator, self.high)
+        self.assertEqual(best.wait, 4)
+        # a detour past its rider's floor delays the rider
+        self.building.add_passenger(Passenger("15", "17", self.building))
+        self.building.time_step()
+        scored = self.evaluator.evaluate(self.building, "G", "^", [self.high])
+        self.assertTrue(scored[0].delay == 0 and scored[0].wait > 17)
+        scored = self.evaluator.evaluate(self.building, "18", "v", [self.high])
+        self.assertEqual(scored[0].delay, 0)
+        scored = self.evaluator.evaluate(self.building, "16", "^", [self.high])
+        self.assertEqual((scored[0].wait, scored[0].delay), (2, 1))
+        self.assertEqual(scored[0].cost, 3)
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate(self.building, "5", " ")
+
+    def test_evaluate_calls_and_horizon(self):
+        results = LookaheadEvaluator(horizon=5).evaluate_calls(
+            self.building, [("3", "^"), ("G", "^")]
+        )
+        self.assertEqual(
+            [candidate.elevator for candidate in results[(Floor("3"), "^")]],
+            [self.low, self.high]
+        )
+        self.assertEqual(
+            [candidate.wait for candidate in results[(Floor("3"), "^")]], [2, 5]
+        )
+
+    def test_lookahead_dispatcher(self):
+        building = Building(
+            floors=["G"] + [str(num) for num in range(1, 15)],
+            dispatcher=LookaheadDispatcher(), metrics=[TripAggregator()], scheduling="look"
+        )
+        building.build_elevators(number=3)
+        building.add_arrivals(lunch_time_arrivals(building.floors, 0.3, seed=8, end=300))
+        while building.arrivals_pending or len(building.hall_calls) > 0 or \
+                any(len(elevator.passengers) > 0 for elevator in building.elevators):
+            building.time_step()
+        self.assertEqual(building.metrics[0].overall.trip.count, building.arrivals_added)
+
+
+class TestDestinationDispatch(unittest.TestCase):
+
+    floors = ["G"] + [str(num) for num in range(1, 12)]
+
+    def build(self, cars=2, elevator_spec=None):
+        building = Building(
+            self.floors, scheduling="destination", elevator_spec=elevator_spec
+        )
+        building.build_elevators(number=cars)
+        for elevator in building.elevators:
+            elevator.current_floor = building.get_floor("G")
+        return building
+
+    def run_out(self, building):
+        while building.time < 3000 and (
+            building.arrivals_pending or len(building.hall_calls) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in building.elevators)
+        ):
+            building.time_step()
+
+    def test_passengers_are_grouped_by_destination(self):
+        building = self.build()
+        self.assertEqual(type(building.dispatcher), DestinationDispatcher)
+        first, second = building.elevators
+        passengers = [
+            Passenger("G", destination, building) for destination in ["8", "8", "3", "9"]
+        ]
+        for passenger in passengers:
+            building.add_passenger(passenger)
+        self.assertEqual(
+            [passenger.elevator for passenger in passengers], [first, first, second, first]
+        )
+        self.assertEqual(first.assigned, {Floor("8"): 2, Floor("9"): 1})
+        self.assertEqual(building.get_pending_calls(), [])
+        building.time_step()
+        # each car only takes the passengers given to it
+        self.assertEqual(
+            sorted(passenger.desired_floor.floor_id for passenger in first.passengers),
+            ["8", "8", "9"]
+        )
+        self.assertEqual([passenger.desired_floor for passenger in second.passengers], [Floor("3")])
+        self.assertEqual(first.assigned, {})
+        self.assertTrue(all(passenger.elevator is None for passenger in passengers))
+        with self.assertRaises(ValueError):
+            Building(self.floors, dispatcher=NearestCarDispatcher(), scheduling="destination")
+
+    def test_full_car_hands_passengers_on(self):
+        building = self.build(cars=1, elevator_spec=ElevatorSpec(capacity=2))
+        elevator = building.elevators[0]
+        passengers = [Passenger("G", "5", building) for passenger_idx in range(3)]
+        for passenger in passengers:
+            building.add_passenger(passenger)
+        building.time_step()
+        self.assertEqual(len(elevator.passengers), 2)
+        # given the only car again, which comes back for them
+        self.assertIs(passengers[2].elevator, elevator)
+        self.assertEqual(elevator.assigned, {Floor("5"): 1})
+        self.run_out(building)
+        self.assertIsNotNone(passengers[2].alighting_time)
+
+    def test_run_matches_event_mode_and_snapshots(self):
+        arrivals = list(itertools.islice(lunch_time_arrivals(self.floors, 0.5, seed=4), 150))
+        spec = ElevatorSpec(capacity=4)
+        tick_building = self.build(cars=3, elevator_spec=spec)
+        tick_building.metrics.append(TripStore(tick_building))
+        tick_building.add_arrivals(arrivals)
+        for instant in range(100):
+            tick_building.time_step()
+        data = snapshot(tick_building)
+        restored = restore(data, arrivals=arrivals)
+        self.assertEqual(snapshot(restored), data)
+        forked = fork(tick_building)
+        self.assertEqual(snapshot(forked), data)
+        self.run_out(tick_building)
+        self.assertEqual(len(tick_building.metrics[0]), 150)
+        event_building = self.build(cars=3, elevator_spec=spec)
+        simulation = EventDrivenSimulation(event_building)
+        simulation.add_arrivals(arrivals)
+        simulation.run()
+        self.assertEqual(
+            sorted(
+                (passenger.arrival_time, passenger.boarding_time, passenger.alighting_time)
+                for passenger in simulation.completed_passengers
+            ),
+            sorted(trip[3:] for trip in tick_building.metrics[0])
+        )
+        for branch in (restored, forked):
+            trips = TripStore(branch)
+            branch.metrics = [trips]
+            self.run_out(branch)
+            self.assertEqual(
+                list(trips), [trip for trip in tick_building.metrics[0] if trip[5] >= 100]
+            )
+
+    def test_event_mode_picks_up_passengers_of_passed_floors(self):
+        # car 0 passes 10 on the way down with the 10 -> 4 passenger given to
+        # it; event mode has to simulate the tick that puts the stop back
+        floors = ["G"] + [str(num) for num in range(1, 15)]
+        traces = [[(0, "10", "7"), (1, "13", "3"), (3, "G", "12"), (5, "6", "G"),
+                   (6, "6", "3"), (7, "10", "4"), (8, "4", "5")]]
+        rng = random.Random(7)
+        for trace_idx in range(20):
+            arrivals = []
+            for arrival_idx in range(15):
+                origin, destination = rng.sample(floors, 2)
+                arrivals.append((arrival_idx * rng.randint(0, 3), origin, destination))
+            traces.append(sorted(arrivals, key=lambda arrival: arrival[0]))
+        for arrivals in traces:
+            tick_building = Building(floors, scheduling="destination")
+            tick_building.build_elevators(number=2)
+            tick_building.metrics = [TripStore(tick_building)]
+            tick_building.add_arrivals(arrivals)
+            self.run_out(tick_building)
+            event_building = Building(floors, scheduling="destination")
+            event_building.build_elevators(number=2)
+            simulation = EventDrivenSimulation(event_building)
+            simulation.add_arrivals(arrivals)
+            simulation.run()
+            self.assertEqual(len(event_building.hall_calls), 0)
+            self.assertEqual(
+                sorted(
+                    (passenger.arrival_time, passenger.boarding_time, passenger.alighting_time)
+                    for passenger in simulation.completed_passengers
+                ),
+                sorted(trip[3:] for trip in tick_building.metrics[0])
+            )
+
+
+class TestEventDrivenSimulation(unittest.TestCase):
+
+    def build(self):
+        building = Building(floors=["G"] + [str(num) for num in range(1, 20)])
+        building.build_elevators(number=3)
+        return building
+
+    def test_take_arrivals(self):
+        arrivals = list(itertools.islice(
+            poisson_arrivals(["G"] + [str(num) for num in range(1, 20)], 0.2, seed=4), 50
+        ))
+        tick_building = self.build()
+        tick_building.metrics.append(TripAggregator())
+        tick_building.add_arrivals(arrivals)
+        while not tick_building.is_idle():
+            tick_building.time_step()
+        event_building = self.build()
+        event_building.metrics.append(TripAggregator())
+        event_building.add_arrivals(arrivals)
+        event_building.pull_arrivals()
+        simulation = EventDrivenSimulation(event_building)
+        simulation.take_arrivals()
+        self.assertFalse(event_building.arrivals_pending)
+        simulation.run()
+        self.assertTrue(event_building.is_idle())
+        self.assertEqual(
+            event_building.metrics[0].overall.summary(), tick_building.metrics[0].overall.summary()
+        )
+
+    def test_matches_tick_mode(self):
+        requests = sorted(
+            [random.randrange(200)] + random.sample(range(20), 2)
+            for i in range(30)
+        )
+        tick_building = self.build()
+        tick_passengers = [
+            (arrival, Passenger(tick_building.floors[origin], tick_building.floors[destination], tick_building))
+            for arrival, origin, destination in requests
+        ]
+        next_arrival = 0
+        while tick_building.time < 1000 and (
+            next_arrival < len(tick_passengers) or
+            len(tick_building.passengers) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in tick_building.elevators)
+        ):
+            while next_arrival < len(tick_passengers) and \
+                    tick_passengers[next_arrival][0] == tick_building.time:
+                tick_building.add_passenger(tick_passengers[next_arrival][1])
+                next_arrival += 1
+            tick_building.time_step()
+        self.assertNotEqual(tick_building.time, 1000)
+
+        event_building = self.build()
+        simulation = EventDrivenSimulation(event_building)
+        event_passengers = []
+        for arrival, origin, destination in requests:
+            passenger = Passenger(event_building.floors[origin], event_building.floors[destination], event_building)
+            simulation.add_passenger(passenger, time=arrival)
+            event_passengers.append(passenger)
+        simulation.run()
+        self.assertEqual(len(simulation.completed_passengers), 30)
+        self.assertEqual(
+            [
+                (passenger.time_waiting_for_elevator, passenger.time_inside_elevator)
+                for arrival, passenger in tick_passengers
+            ],
+            [
+                (passenger.time_waiting_for_elevator, passenger.time_inside_elevator)
+                for passenger in event_passengers
+            ]
+        )
+
+    def test_run_until(self):
+        building = self.build()
+        simulation = EventDrivenSimulation(building)
+        simulation.add_passenger(Passenger("G", "19", building), time=5)
+        with self.assertRaises(ValueError):
+            EventDrivenSimulation(building).add_passenger(
+                Passenger("G", "19", building), time=-1
+            )
+        simulation.run(until=3)
+        self.assertEqual(building.time, 3)
+        self.assertEqual(len(building.passengers), 0)
+        simulation.run(until=5)
+        self.assertEqual(len(building.passengers), 1)
+        simulation.run()
+        self.assertEqual(len(simulation.completed_passengers), 1)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def run_building(self, metrics):
+        building = Building(
+            floors=["G"] + [str(num) for num in range(1, 10)], metrics=metrics
+        )
+        building.build_elevators(number=2)
+        building.add_passengers([
+            Passenger("G", "5", building),
+            Passenger("7", "2", building),
+            Passenger("3", "9", building),
+            Passenger("G", "5", building),
+        ])
+        while building.time < 100 and (
+            len(building.passengers) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in building.elevators)
+        ):
+            building.time_step()
+        return building
+
+    def test_streaming_stats(self):
+        stats = StreamingStats()
+        self.assertIsNone(stats.mean)
+        self.assertIsNone(stats.percentile(50))
+        for value in range(1, 101):
+            stats.add(value)
+        self.assertEqual(stats.mean, 50.5)
+        self.assertEqual(stats.percentile(50), 50)
+        self.assertEqual(stats.percentile(95), 95)
+        self.assertEqual(stats.percentile(99), 99)
+        self.assertEqual(stats.percentile(100), 100)
+        with self.assertRaises(ValueError):
+            stats.percentile(0)
+        other = StreamingStats()
+        other.add(1000)
+        stats.merge(other)
+        self.assertEqual(stats.count, 101)
+        self.assertEqual(stats.percentile(100), 1000)
+
+    def test_handling_capacity(self):
+        building = Building(floors=["G", "1"])
+        handling_capacity = HandlingCapacity(window=10)
+        for alighting_time in [1, 2, 9, 12, 15, 18, 35]:
+            passenger = Passenger("G", "1", building)
+            passenger.alighting_time = alighting_time
+            handling_capacity.record_trip(passenger, None, building)
+        self.assertEqual(handling_capacity.peak, 4)
+        self.assertEqual(handling_capacity.windows, {0: 3, 1: 3, 3: 1})
+        self.assertEqual(
+            handling_capacity.summary(), {"window": 10, "peak": 4, "mean": 7 / 4}
+        )
+        with self.assertRaises(ValueError):
+            HandlingCapacity(window=0)
+
+    def test_trip_aggregator(self):
+        aggregator = TripAggregator()
+        self.run_building([aggregator])
+        summary = aggregator.summary()
+        self.assertEqual(summary["overall"]["wait"]["count"], 4)
+        self.assertEqual(summary["by_floor_pair"]["G->5"]["ride"]["count"], 2)
+        self.assertEqual(
+            sum(stats["trip"]["count"] for stats in summary["by_elevator"].values()), 4
+        )
+        self.assertEqual(
+            aggregator.overall.trip.total,
+            aggregator.overall.wait.total + aggregator.overall.ride.total
+        )
+
+    def test_print_sink(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.run_building([PrintMetricsSink()])
+        self.assertEqual(output.getvalue().count("Time waiting, Time inside Elevator"), 4)
+
+    def test_trip_log_writer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for log_format in ("binary", "csv"):
+                path = os.path.join(directory, "trips." + log_format)
+                with TripLogWriter(path, log_format=log_format, buffer_size=3) as writer:
+                    building = self.run_building([writer])
+                rows = list(read_trip_log(path, log_format=log_format))
+                self.assertEqual(len(rows), 4)
+                for origin, destination, elevator, arrival, boarding, alighting in rows:
+                    self.assertIn(elevator, (0, 1))
+                    self.assertTrue(arrival <= boarding < alighting <= building.time)
+        with self.assertRaises(ValueError):
+            TripLogWriter(os.path.join(directory, "trips.log"), log_format="xml")
+
+
+class TestTripStore(unittest.TestCase):
+
+    def test_collects_completed_trips(self):
+        building = Building(floors=["G"] + [str(num) for num in range(1, 10)])
+        building.build_elevators(number=2)
+        store = TripStore(building)
+        building.metrics.append(store)
+        passengers = [
+            Passenger("G", "5", building),
+            Passenger("7", "2", building),
+            Passenger("3", "9", building),
+        ]
+        building.add_passengers(passengers)
+        while building.time < 100 and (
+            len(building.passengers) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in building.elevators)
+        ):
+            building.time_step()
+        self.assertEqual(len(store), 3)
+        self.assertEqual(
+            sorted(zip(store.origin, store.destination, store.wait_times(), store.ride_times())),
+            sorted(
+                (
+                    building.floor_index[passenger.origin_floor],
+                    building.floor_index[passenger.desired_floor],
+                    passenger.time_waiting_for_elevator,
+                    passenger.time_inside_elevator
+                )
+                for passenger in passengers
+            )
+        )
+        self.assertEqual(len(list(store)), 3)
+        self.assertEqual(store.trip(0), next(iter(store)))
+        with self.assertRaises(ValueError):
+            store.add_passenger(Passenger("G", "1", building))
+
+    def test_mapped_trip_store(self):
+        floors = ["G"] + [str(num) for num in range(1, 12)]
+        building = Building(floors, scheduling="look")
+        building.build_elevators(number=3)
+        aggregator = TripAggregator()
+        building.metrics.append(aggregator)
+        building.add_arrivals(itertools.islice(lunch_time_arrivals(floors, 0.5, seed=2), 300))
+        with tempfile.TemporaryDirectory() as directory:
+            with MappedTripStore(building, directory, buffer_size=64) as store:
+                building.metrics.append(store)
+                for instant in range(300):
+                    building.time_step()
+            # a second store on the same directory carries on appending,
+            # after dropping a row the first one only half wrote
+            with open(os.path.join(directory, "wait.col"), "ab") as column_file:
+                column_file.write(bytes(8))
+            with MappedTripStore(building, directory) as store:
+                building.metrics[-1] = store
+                for instant in range(700):
+                    building.time_step()
+                self.assertEqual(len(store), 300)
+            with self.assertRaises(ValueError):
+                MappedTripStore(Building(["G", "1"]), directory)
+            expected = aggregator.summary()
+            for use_numpy in (True, False):
+                with MappedTrips(directory, use_numpy=use_numpy) as trips:
+                    self.assertEqual(len(trips), 300)
+                    self.assertEqual(trips.summary(), expected["overall"]["trip"])
+                    self.assertEqual(trips.summary("wait"), expected["overall"]["wait"])
+                    self.assertEqual(
+                        {
+                            "{0}->{1}".format(*floor_pair): summary
+                            for floor_pair, summary in trips.by_floor_pair("ride").items()
+                        },
+                        {
+                            floor_pair: stats["ride"]
+                            for floor_pair, stats in expected["by_floor_pair"].items()
+                        }
+                    )
+                    self.assertEqual(
+                        trips.by_elevator(),
+                        {
+                            elevator_id: stats["trip"]
+                            for elevator_id, stats in expected["by_elevator"].items()
+                        }
+                    )
+                    waits = list(trips.column("wait"))
+                    self.assertEqual(
+                        trips.histogram("wait", 5),
+                        {
+                            start: sum(1 for wait in waits if start <= wait < start + 5)
+                            for start in sorted(set(wait // 5 * 5 for wait in waits))
+                        }
+                    )
+                    self.assertEqual(trips.percentiles("wait", (100,)), {100: max(waits)})
+                    self.assertEqual(
+                        trips.summary(since=100, until=200)["count"],
+                        sum(1 for arrival in trips.column("arrival_time") if 100 <= arrival < 200)
+                    )
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                trips_main([directory, "--column", "wait", "--histogram", "10", "--by-floor-pair"])
+            report = json.loads(output.getvalue())
+        self.assertEqual(report["summary"], expected["overall"]["wait"])
+        self.assertEqual(report["trips"], 300)
+
+
+class TestTraffic(unittest.TestCase):
+
+    floors = ["G"] + [str(num) for num in range(1, 10)]
+
+    def test_generators(self):
+        for generator in (poisson_arrivals, up_peak_arrivals,
+                          down_peak_arrivals, lunch_time_arrivals):
+            arrivals = list(generator(self.floors, 0.5, seed=7, end=1000))
+            self.assertEqual(arrivals, list(generator(self.floors, 0.5, seed=7, end=1000)))
+            times = [time for time, origin, destination in arrivals]
+            self.assertEqual(times, sorted(times))
+            self.assertTrue(all(time < 1000 for time in times))
+            self.assertTrue(all(origin != destination for time, origin, destination in arrivals))
+        with self.assertRaises(ValueError):
+            poisson_arrivals(self.floors, 0)
+        with self.assertRaises(ValueError):
+            up_peak_arrivals(self.floors, 1, lobby="B")
+
+    def test_up_and_down_peak(self):
+        up_peak = list(itertools.islice(up_peak_arrivals(self.floors, 1, seed=1), 1000))
+        from_lobby = sum(1 for time, origin, destination in up_peak if origin == "G")
+        self.assertGreater(from_lobby, 700)
+        down_peak = list(itertools.islice(down_peak_arrivals(self.floors, 1, seed=1), 1000))
+        to_lobby = sum(1 for time, origin, destination in down_peak if destination == "G")
+        self.assertGreater(to_lobby, 700)
+
+    def test_trace_round_trip(self):
+        arrivals = list(poisson_arrivals(self.floors, 0.2, seed=3, end=500))
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("trace.csv", "trace.jsonl"):
+                path = os.path.join(directory, name)
+                self.assertEqual(write_trace(path, arrivals), len(arrivals))
+                self.assertEqual(list(read_trace(path)), arrivals)
+            with self.assertRaises(ValueError):
+                write_trace(os.path.join(directory, "trace.txt"), arrivals)
+
+    def test_streamed_event_simulation_matches_tick_mode(self):
+        tick_building = Building(floors=self.floors)
+        tick_building.build_elevators(number=2)
+        tick_building.add_arrivals(lunch_time_arrivals(self.floors, 0.1, seed=5, end=300))
+        while tick_building.time < 2000 and (
+            tick_building.arrivals_pending or
+            len(tick_building.passengers) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in tick_building.elevators)
+        ):
+            tick_building.time_step()
+        event_building = Building(floors=self.floors)
+        event_building.build_elevators(number=2)
+        simulation = EventDrivenSimulation(event_building)
+        simulation.add_arrivals(lunch_time_arrivals(self.floors, 0.1, seed=5, end=300))
+        simulation.run()
+        self.assertEqual(
+            len(simulation.completed_passengers),
+            len(list(lunch_time_arrivals(self.floors, 0.1, seed=5, end=300)))
+        )
+        self.assertEqual(event_building.time, tick_building.time)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        report = run_benchmarks(
+            floors=[10], cars=[1, 4], passengers=[20], profiles=["up_peak"],
+            dispatchers=["nearest", "cost"], engines=["tick", "event"],
+            seed=3, duration=100
+        )
+        report = json.loads(json.dumps(report))
+        self.assertEqual(len(report["results"]), 8)
+        for result in report["results"]:
+            self.assertEqual(result["served"], 20)
+            self.assertGreater(result["ticks_per_second"], 0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+            self.assertEqual(result["wait"]["count"], 20)
+            self.assertGreater(result["handling_capacity"]["peak"], 0)
+        tick_result, event_result = report["results"][:2]
+        self.assertEqual(tick_result["ticks"], event_result["ticks"])
+        self.assertEqual(tick_result["wait"], event_result["wait"])
+
+    def test_compare_engines(self):
+        # busy enough for the event engine to tick straight through stretches
+        rows = compare_engines(passengers=[20, 400], floors=10, cars=2, duration=600)
+        self.assertEqual([row["passengers"] for row in rows], [20, 400])
+        for row in rows:
+            self.assertTrue(row["same_trips"])
+            self.assertGreater(row["speedup"], 0)
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_expand_grid(self):
+        scenarios = expand_grid({"floors": 10, "cars": Sweep([1, 2]), "seed": Sweep([0, 1, 2])})
+        self.assertEqual(len(scenarios), 6)
+        self.assertIn({"floors": 10, "cars": 2, "seed": 1}, scenarios)
+        # plain lists are values, not axes
+        scenarios = expand_grid({"cars": Sweep([2, 3]), "starting_floors": ["G", "G"]})
+        self.assertEqual(
+            scenarios,
+            [{"cars": 2, "starting_floors": ["G", "G"]}, {"cars": 3, "starting_floors": ["G", "G"]}]
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "grid.json")
+            with open(path, "w") as grid_file:
+                json.dump({"cars": {"sweep": [2, 3]}, "elevator_spec": {"capacity": 8}}, grid_file)
+            self.assertEqual(read_grid(path), {"cars": [2, 3], "elevator_spec": {"capacity": 8}})
+            self.assertIsInstance(read_grid(path)["cars"], Sweep)
+
+    def test_run_batch(self):
+        scenarios = expand_grid({
+            "floors": 10, "cars": Sweep([1, 3]), "passengers": 30, "seed": Sweep([0, 1]),
+            "duration": 200, "starting_floors": None,
+        })
+        summary = BatchSummary()
+        results = []
+        for result in run_batch(scenarios, max_workers=2):
+            summary.add(result)
+            results.append(result)
+        self.assertEqual(summary.runs, 4)
+        self.assertEqual(summary.served, 120)
+        expected = run_scenario(
+            floors=10, cars=3, passengers=30, seed=1, duration=200, measure_memory=False
+        )
+        result = next(
+            result for result in results
+            if result["cars"] == 3 and result["seed"] == 1
+        )
+        self.assertEqual(result["wait"], expected["wait"])
+        self.assertLessEqual(summary.best["wait"]["mean"], result["wait"]["mean"])
+        mean_wait = summary.summary()["mean_wait"]
+        self.assertEqual(mean_wait["count"], 4)
+        self.assertIn(result["wait"]["mean"], summary.wait_means)
+        self.assertLessEqual(mean_wait["p50"], mean_wait["p99"])
+
+    def test_starting_floors(self):
+        result = run_scenario(
+            floors=10, cars=2, passengers=5, duration=50,
+            starting_floors=["G", "G"], measure_memory=False
+        )
+        self.assertEqual(result["served"], 5)
+        with self.assertRaises(ValueError):
+            run_scenario(floors=10, cars=2, passengers=5, starting_floors=["G"])
+
+
+class TestSimulate(unittest.TestCase):
+
+    def test_engines_agree(self):
+        tick = run_simulation(["12"], cars=2, profile="up_peak", passengers=40, duration=300)
+        self.assertEqual(tick["floors"], 12)
+        self.assertEqual(tick["served"], 40)
+        self.assertEqual(tick["arrivals"], 40)
+        expected = run_scenario(
+            floors=12, cars=2, passengers=40, profile="up_peak", duration=300,
+            measure_memory=False
+        )
+        self.assertEqual(tick["wait"], expected["wait"])
+        engines = ["event"] + (["vectorized"] if np is not None else [])
+        for engine in engines:
+            result = run_simulation(
+                ["12"], cars=2, profile="up_peak", passengers=40, duration=300, engine=engine
+            )
+            self.assertEqual(result["ticks"], tick["ticks"])
+            self.assertEqual(result["trip"], tick["trip"])
+        with self.assertRaises(ValueError):
+            run_simulation(["12"], engine="vectorized", dispatcher="cost")
+        with self.assertRaises(ValueError):
+            run_simulation(["12"], dispatcher="destination")
+
+    def test_cli_trace_and_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.csv")
+            write_trace(path, [(0, "G", "3"), (2, "3", "1"), (40, "2", "G")])
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                simulate_main([
+                    "--floors", "G", "1", "2", "3", "--trace", path, "--max-ticks", "20",
+                    "--format", "json"
+                ])
+        summary = json.loads(output.getvalue())
+        self.assertEqual(summary["ticks"], 20)
+        self.assertEqual(summary["served"], 2)
+        self.assertEqual(summary["waiting"] + summary["riding"], 0)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            simulate_main(["--floors", "6", "--passengers", "5", "--duration", "50"])
+        self.assertIn("served 5", output.getvalue())
+        self.assertEqual(len(output.getvalue().splitlines()), 5)
+
+    def test_optional_pieces_are_imported_on_use(self):
+        code = (
+            "import sys\n"
+            "from simulate import main\n"
+            "main(['--passengers', '5', '--duration', '50'])\n"
+            "print(sorted(name for name in ('numpy', 'render', 'events', 'vectorized', 'benchmark')"
+            " if name in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout
+        self.assertEqual(output.splitlines()[-1], "[]")
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        self.traffic = {"duration": 200, "seed": 3}
+        self.buildings = [
+            {"name": "tower", "floors": 15, "cars": 3, "passengers": 60},
+            {"name": "annex", "floors": 6, "cars": 1, "passengers": 20},
+            {"name": "hq", "floors": 10, "cars": 2, "passengers": 40, "profile": "up_peak"},
+        ]
+
+    def test_partition_fleet(self):
+        scenarios = fleet_scenarios(self.buildings, self.traffic)
+        self.assertEqual([scenario["seed"] for name, scenario in scenarios], [3, 4, 5])
+        shards = partition_fleet(scenarios, 2)
+        self.assertEqual([[name for name, scenario in shard] for shard in shards],
+                         [["tower"], ["hq", "annex"]])
+        self.assertEqual(len(partition_fleet(scenarios, 5)), 3)
+        with self.assertRaises(ValueError):
+            fleet_scenarios([{"name": "a"}, {"name": "a"}])
+
+    def test_run_fleet_matches_separate_runs(self):
+        batches = []
+        report = run_fleet(
+            self.buildings, traffic=self.traffic, workers=2, batch_ticks=50,
+            progress=lambda summary: batches.append(summary.overall.trip.count)
+        )
+        self.assertEqual(report["workers"], 2)
+        self.assertEqual(report["batches"], len(batches))
+        self.assertEqual(batches, sorted(batches))
+        self.assertEqual(report["served"], 120)
+        self.assertEqual(report["still_waiting"], 0)
+        overall = TripStats()
+        for name, scenario in fleet_scenarios(self.buildings, self.traffic):
+            building = build_scenario(**scenario)
+            while building.arrivals_pending or len(building.hall_calls) > 0 or \
+                    any(len(elevator.passengers) > 0 for elevator in building.elevators):
+                building.time_step()
+            trips = building.metrics[0].overall
+            overall.merge(trips)
+            self.assertEqual(report["by_building"][name]["trip"], trips.trip.summary())
+            self.assertTrue(report["by_building"][name]["done"])
+            self.assertEqual(report["by_building"][name]["ticks"], building.time)
+        self.assertEqual(report["overall"]["wait"], overall.wait.summary())
+        self.assertEqual(report["overall"]["trip"], overall.trip.summary())
+        self.assertEqual(
+            report["overall"]["waits_within_service_level"], overall.wait.fraction_at_most(30)
+        )
+
+    def test_worker_errors_reach_the_coordinator(self):
+        with self.assertRaises(RuntimeError):
+            run_fleet([{"floors": 5, "cars": 1, "passengers": 5, "profile": "nope"}], workers=1)
+
+
+class TestRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.building = Building(
+            floors=[Floor("G")] + [Floor(str(num)) for num in range(1, 10)]
+        )
+        self.building.build_elevators(number=3)
+
+    def test_incremental_matches_full_render(self):
+        renderer = BuildingRenderer(self.building)
+        self.building.add_arrivals(
+            lunch_time_arrivals(self.building.floors, 0.3, seed=3, end=80)
+        )
+        for instant in range(120):
+            self.building.time_step()
+            self.assertEqual(renderer.render(), render_building(self.building))
+        self.assertEqual(str(self.building), render_building(self.building))
+
+    def test_waiting_passengers_in_arrival_order(self):
+        # what the original Building.__str__ drew for the same state
+        building = Building(["G", "1", "2", "3"])
+        building.build_elevators(number=1)
+        for instant, desired_floor in enumerate(["G", "3", "1"]):
+            building.time = instant
+            building.add_passenger(Passenger("2", desired_floor, building))
+        self.assertEqual(render_building(building), "\n".join([
+            "-------+-----------------------+-----------------------",
+            "(F:  3)|                       |",
+            "-------+-----------------------+-----------------------",
+            "(F:  2)|                       |[P: (F:  2) -> (F:  G)]",
+            "       |                       |[P: (F:  2) -> (F:  3)]",
+            "       |                       |[P: (F:  2) -> (F:  1)]",
+            "-------+-----------------------+-----------------------",
+            "(F:  1)|                       |",
+            "-------+-----------------------+-----------------------",
+            "(F:  G)|***********************|",
+            "-------+-----------------------+-----------------------",
+        ]))
+
+    def test_only_changed_floors_are_redrawn(self):
+        renderer = BuildingRenderer(self.building)
+        self.assertEqual(len(renderer.render_changes()), len(self.building.floors))
+        self.assertEqual(renderer.render_changes(), {})
+        top_floor = self.building.floors[-1]
+        self.building.add_passenger(Passenger(top_floor, "G", self.building))
+        self.assertEqual(list(renderer.render_changes()), [top_floor])
+
+    def test_frame_for_tick_every(self):
+        renderer = BuildingRenderer(self.building, every=5)
+        frames = []
+        for instant in range(20):
+            self.building.time_step()
+            frames.append(renderer.frame_for_tick())
+        self.assertEqual(
+            [instant for instant, frame in enumerate(frames, 1) if frame is not None],
+            [5, 10, 15, 20]
+        )
+        self.assertEqual(renderer.frames_rendered, 4)
+        with self.assertRaises(ValueError):
+            BuildingRenderer(self.building, every=0)
+
+
+class TestDemandModel(unittest.TestCase):
+
+    def setUp(self):
+        self.demand = DemandModel(replan_ticks=10)
+        self.building = Building(
+            floors=["G"] + [str(num) for num in range(1, 20)], demand=self.demand
+        )
+        self.building.build_elevators(number=4)
+
+    def run_building(self, ticks):
+        for instant in range(ticks):
+            self.building.time_step()
+
+    def test_up_peak_parks_at_lobby(self):
+        self.building.add_arrivals(
+            up_peak_arrivals(self.building.floors, 0.2, seed=4, end=600)
+        )
+        self.run_building(1000)
+        self.assertEqual(self.demand.arrivals_seen, self.building.arrivals_added)
+        # most calls come from the lobby, the last car covers the rest
+        self.assertEqual(
+            sorted(elevator.current_floor.floor_id for elevator in self.building.elevators),
+            ["7", "G", "G", "G"]
+        )
+
+    def test_spread_demand_spreads_cars(self):
+        self.assertEqual(
+            [floor.floor_id for floor in self.demand.parking_floors(
+                self.building, self.building.floors, 4
+            )],
+            ["2", "7", "12", "17"]
+        )
+        self.building.add_arrivals(
+            poisson_arrivals(self.building.floors, 0.1, seed=5, end=600)
+        )
+        self.run_building(900)
+        parked = sorted(
+            self.building.floor_index[elevator.current_floor]
+            for elevator in self.building.elevators
+        )
+        self.assertEqual(len(set(parked)), 4)
+        self.assertTrue(parked[0] < 6 and parked[-1] > 13)
+
+    def test_decay(self):
+        histogram = DecayingHistogram(2, half_life=10)
+        histogram.add(0, 0)
+        histogram.add(1, 10)
+        self.assertEqual(histogram.shares(), [1 / 3, 2 / 3])
+        histogram.add(1, 10000)
+        self.assertEqual(histogram.origin, 10000)
+        self.assertAlmostEqual(histogram.shares()[1], 1.0)
+        demand = DemandModel(bin_ticks=10, day_ticks=100, day_decay=0.5, history_weight=1.0,
+                             uniform_weight=0.0)
+        building = Building(["G", "1", "2"], demand=demand)
+        building.add_passenger(Passenger("G", "2", building))
+        building.time = 100
+        building.add_passenger(Passenger("2", "G", building))
+        self.assertEqual(demand.expected_demand(building), [1 / 3, 0.0, 2 / 3])
+        self.assertEqual(demand.expected_demand(building, time=150)[1], 0.0)
+        with self.assertRaises(ValueError):
+            DemandModel(history_weight=2)
+
+    def test_engines_and_fork(self):
+        self.building.add_passenger(Passenger("G", "5", self.building))
+        forked = fork(self.building)
+        self.assertIsNot(forked.demand, self.demand)
+        self.assertEqual(forked.demand.recent.counts, self.demand.recent.counts)
+        with self.assertRaises(ValueError):
+            EventDrivenSimulation(self.building)
+        with self.assertRaises(ValueError):
+            VectorizedBuilding.from_building(self.building)
+
+    def test_snapshots(self):
+        arrivals = list(poisson_arrivals(self.building.floors, 0.1, seed=5, end=600))
+        self.building.add_arrivals(arrivals)
+        # in the middle of a replan_ticks epoch, whose parking plans were
+        # made from the counts at its start
+        self.run_building(253)
+        data = snapshot(self.building)
+        restored = restore(data, arrivals=arrivals)
+        self.assertIsNot(restored.demand, self.demand)
+        self.assertEqual(restored.demand.by_time_of_day, self.demand.by_time_of_day)
+        self.assertEqual(snapshot(restored), data)
+        for instant in range(300):
+            self.building.time_step()
+            restored.time_step()
+            self.assertEqual(
+                [elevator.current_floor for elevator in restored.elevators],
+                [elevator.current_floor for elevator in self.building.elevators]
+            )
+        other = DemandModel()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "building.snapshot")
+            save_snapshot(self.building, path)
+            self.assertIs(load_snapshot(path, demand=other).demand, other)
+
+
+class TestPhaseProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.building = Building(
+            floors=["G"] + [str(num) for num in range(1, 15)], metrics=[TripAggregator()]
+        )
+        self.building.build_elevators(number=3)
+        self.building.add_arrivals(
+            lunch_time_arrivals(self.building.floors, 0.3, seed=6, end=200)
+        )
+
+    def test_counts_phases_without_changing_the_run(self):
+        reference = Building(
+            floors=["G"] + [str(num) for num in range(1, 15)], metrics=[TripAggregator()]
+        )
+        reference.build_elevators(number=3)
+        reference.add_arrivals(lunch_time_arrivals(reference.floors, 0.3, seed=6, end=200))
+        with PhaseProfiler().attach(self.building) as profiler:
+            for instant in range(300):
+                self.building.time_step()
+                reference.time_step()
+        summary = profiler.summary()
+        self.assertEqual(summary["Building.time_step"]["calls"], 300)
+        self.assertEqual(summary["Building._advance_single"]["calls"], 900)
+        self.assertEqual(
+            summary["Elevator.unload_passenger"]["calls"],
+            self.building.metrics[0].overall.trip.count
+        )
+        self.assertTrue(summary["Building.incr_passenger_times"]["max_items"] > 0)
+        self.assertIsNone(summary["Building.time_step"]["max_items"])
+        self.assertAlmostEqual(sum(stats["share"] for stats in summary.values()), 1.0)
+        for stats in summary.values():
+            self.assertTrue(stats["self_seconds"] <= stats["total_seconds"])
+        self.assertEqual(
+            self.building.metrics[0].overall.summary(), reference.metrics[0].overall.summary()
+        )
+        # reference was never attached, so its elevators weren't counted
+        self.assertEqual(summary["Elevator.load_passenger"]["calls"], self.building.arrivals_added)
+        self.assertIn("Building.time_step", profiler.format_summary())
+
+    def test_detach_restores_methods(self):
+        profiler = PhaseProfiler().attach(self.building)
+        with self.assertRaises(ValueError):
+            PhaseProfiler().attach(self.building)
+        profiler.detach()
+        self.assertNotIn("time_step", vars(self.building))
+        self.assertNotIn("assign", vars(self.building.dispatcher))
+        self.assertIs(Elevator.move_to_floor, vars(Elevator)["move_to_floor"])
+        self.assertEqual(Elevator.move_to_floor.__name__, "move_to_floor")
+
+    def test_exports(self):
+        with PhaseProfiler(trace=True, max_trace_events=50) as profiler:
+            profiler.attach(self.building)
+            for instant in range(20):
+                self.building.time_step()
+        self.assertEqual(len(profiler.trace_events), 50)
+        self.assertTrue(profiler.trace_events_dropped > 0)
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = os.path.join(tmp, "trace.json")
+            profiler.write_chrome_trace(trace_path)
+            with open(trace_path) as trace_file:
+                events = json.load(trace_file)["traceEvents"]
+            self.assertEqual(len(events), 50)
+            self.assertEqual(events[0]["ph"], "X")
+            folded_path = os.path.join(tmp, "stacks.folded")
+            profiler.write_folded(folded_path)
+            with open(folded_path) as folded_file:
+                stacks = [line.rsplit(" ", 1)[0] for line in folded_file]
+        self.assertIn("Building.time_step;Building.advance_elevators", stacks)
+
+
+class TestController(unittest.TestCase):
+
+    def setUp(self):
+        self.building = Building(
+            floors=["G"] + [str(num) for num in range(1, 20)], scheduling="look"
+        )
+        self.building.build_elevators(number=4)
+
+    def test_serves_burst_and_device(self):
+        controller = RealTimeController(self.building, tick_seconds=0.001)
+        for num in range(1000):
+            controller.submit((HALL_CALL, str(num % 19 + 1), "G"))
+        device = SimulatedDevice(
+            controller,
+            itertools.islice(lunch_time_arrivals(self.building.floors, 0.5, seed=2), 100)
+        )
+        async def run_device():
+            await device.run(1500)
+            return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+        self.assertEqual(asyncio.run(run_device()), [])
+        self.assertEqual(device.calls_sent, 100)
+        self.assertEqual(controller.calls_applied, 1100)
+        self.assertEqual(controller.ticks, 1500)
+        self.assertEqual(len(self.building.hall_calls), 0)
+        self.assertEqual(sum(len(elevator.passengers) for elevator in self.building.elevators), 0)
+        self.assertTrue(len(device.received) > 0)
+        self.assertTrue(device.received[-1][0] <= 1500)
+
+    def test_car_calls_and_rejected_events(self):
+        controller = RealTimeController(self.building)
+        controller.submit((CAR_CALL, 0, "5"))
+        controller.submit((CAR_CALL, 9, "5"))
+        controller.submit((HALL_CALL, "G", "G"))
+        controller.submit(("bogus", "G", "5"))
+        controller.submit(("too", "short"))
+        for instant in range(5):
+            controller.step()
+        self.assertEqual(controller.calls_applied, 1)
+        self.assertEqual(controller.calls_rejected, 4)
+        self.assertEqual(self.building.elevators[0].current_floor.floor_id, "5")
+        single = Building(["G", "1"])
+        single.build_elevators(number=1)
+        controller = RealTimeController(single)
+        controller.submit((CAR_CALL, 0, "1"))
+        controller.step()
+        self.assertEqual(controller.calls_rejected, 1)
+
+    def test_full_command_queue_drops_oldest(self):
+        controller = RealTimeController(self.building, max_pending_commands=1)
+        controller.submit((HALL_CALL, "9", "G"))
+        for instant in range(3):
+            controller.step()
+        self.assertEqual(controller.commands.qsize(), 1)
+        self.assertTrue(controller.commands_dropped > 0)
+        self.assertEqual(controller.commands.get_nowait()[0], 3)
+        with self.assertRaises(ValueError):
+            RealTimeController(self.building, tick_seconds=0)
+
+    def test_serve_calls(self):
+        controller = RealTimeController(self.building, tick_seconds=0.001)
+
+        async def send():
+            server = await serve_calls(controller)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(
+                b'{"kind": "hall", "origin": "G", "destination": 7}\n'
+                b'{"kind": "car", "elevator": 1, "floor": "12"}\n'
+                b'not json\n'
+            )
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+            while controller.calls_rejected + len(controller.calls) < 3:
+                await asyncio.sleep(0.001)
+            await controller.run(ticks=1)
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(send())
+        self.assertEqual(controller.calls_applied, 2)
+        self.assertEqual(controller.calls_rejected, 1)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestVectorizedBuilding(unittest.TestCase):
+
+    def test_matches_object_model(self):
+        building = Building(
+            floors=[Floor("G")] + [Floor(str(num)) for num in range(1, 10)]
+        )
+        building.build_elevators(number=3)
+        for i in range(10):
+            pick_two_floors = random.sample(building.floors, 2)
+            building.add_passenger(
+                Passenger(pick_two_floors[0], pick_two_floors[1], building)
+            )
+        passengers = building.passengers
+        engine = VectorizedBuilding.from_building(building)
+        self.assertEqual(engine.waiting_count, 10)
+        instants = 0
+        while instants < 100 and (
+            len(building.passengers) > 0 or
+            any(len(elevator.passengers) > 0 for elevator in building.elevators)
+        ):
+            building.time_step()
+            engine.time_step()
+            instants += 1
+        self.assertNotEqual(instants, 100)
+        self.assertEqual(engine.waiting_count + engine.riding_count, 0)
+        ids, wait_ticks, ride_ticks = engine.completed_trips()
+        self.assertEqual(list(ids), list(range(10)))
+        self.assertEqual(
+            list(wait_ticks),
+            [passenger.time_waiting_for_elevator for passenger in passengers]
+        )
+        self.assertEqual(
+            list(ride_ticks),
+            [passenger.time_inside_elevator for passenger in passengers]
+        )
+
+    def test_add_passengers(self):
+        engine = VectorizedBuilding(["G", "1", "2"], ["G"])
+        with self.assertRaises(ValueError):
+            engine.add_passengers(["G"], ["3"])
+        with self.assertRaises(ValueError):
+            engine.add_passengers(["1"], ["1"])
+        engine.add_passengers(["G", "2"], ["2", "1"])
+        self.assertEqual(engine.waiting_count, 2)
+        self.assertEqual(engine.queue_len[0, 0], 1)
+        self.assertEqual(engine.queue_len[1, 2], 1)
+        with self.assertRaises(ValueError):
+            VectorizedBuilding.from_building(Building(["G", "1"], scheduling="look"))
+
+
 if __name__ == '__main__':
     unittest.main()
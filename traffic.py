@@ -0,0 +1,159 @@
+import csv
+import json
+import random
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+from model import Floor
+
+
+# an arrival is a (time, origin floor, desired floor) tuple, time being the
+# building.time tick after which the passenger makes the hall call; streams of
+# arrivals are expected in time order
+Arrival = Tuple[int, Union[str, Floor], Union[str, Floor]]
+
+
+def _floor_id(floor: Union[str, Floor]) -> str:
+    return floor.floor_id if type(floor) == Floor else floor
+
+
+def _floor_ids(floors: List[Union[str, Floor]]) -> List[str]:
+    if len(floors) < 2:
+        raise ValueError("ERROR: traffic needs at least two floors")
+    return [_floor_id(floor) for floor in floors]
+
+
+def _lobby_id(floor_ids: List[str], lobby: Union[str, Floor]) -> str:
+    if lobby is None:
+        return floor_ids[0]
+    lobby = _floor_id(lobby)
+    if lobby not in floor_ids:
+        raise ValueError("ERROR: lobby does not exist in the building")
+    return lobby
+
+
+def _arrivals(rate: float, pick_trip: Callable[[random.Random], Tuple[str, str]],
+              seed=None, start: int=0, end: int=None) -> Iterator[Arrival]:
+    if rate <= 0:
+        raise ValueError("ERROR: arrival rate must be positive")
+    rng = random.Random(seed)
+
+    def generate() -> Iterator[Arrival]:
+        clock = float(start)
+        while True:
+            clock += rng.expovariate(rate)
+            if end is not None and clock >= end:
+                return
+            origin, destination = pick_trip(rng)
+            yield int(clock), origin, destination
+    return generate()
+
+
+def poisson_arrivals(floors: List[Union[str, Floor]], rate: float, seed=None,
+                     start: int=0, end: int=None) -> Iterator[Arrival]:
+    # uniform interfloor traffic, rate being passengers per tick
+    floor_ids = _floor_ids(floors)
+    return _arrivals(
+        rate, lambda rng: tuple(rng.sample(floor_ids, 2)),
+        seed=seed, start=start, end=end
+    )
+
+
+def _lobby_trip(floor_ids: List[str], lobby: str, to_lobby: float, from_lobby: float):
+    upper_floors = [floor_id for floor_id in floor_ids if floor_id != lobby]
+
+    def pick_trip(rng: random.Random) -> Tuple[str, str]:
+        draw = rng.random()
+        if draw < from_lobby:
+            return lobby, rng.choice(upper_floors)
+        elif draw < from_lobby + to_lobby:
+            return rng.choice(upper_floors), lobby
+        elif len(upper_floors) > 1:
+            return tuple(rng.sample(upper_floors, 2))
+        else:
+            return lobby, upper_floors[0]
+    return pick_trip
+
+
+def up_peak_arrivals(floors: List[Union[str, Floor]], rate: float, lobby: Union[str, Floor]=None,
+                     seed=None, start: int=0, end: int=None) -> Iterator[Arrival]:
+    # morning: most passengers come in at the lobby and go up
+    floor_ids = _floor_ids(floors)
+    lobby = _lobby_id(floor_ids, lobby)
+    return _arrivals(
+        rate, _lobby_trip(floor_ids, lobby, to_lobby=0.05, from_lobby=0.85),
+        seed=seed, start=start, end=end
+    )
+
+
+def down_peak_arrivals(floors: List[Union[str, Floor]], rate: float, lobby: Union[str, Floor]=None,
+                       seed=None, start: int=0, end: int=None) -> Iterator[Arrival]:
+    # evening: most passengers head down to the lobby
+    floor_ids = _floor_ids(floors)
+    lobby = _lobby_id(floor_ids, lobby)
+    return _arrivals(
+        rate, _lobby_trip(floor_ids, lobby, to_lobby=0.85, from_lobby=0.05),
+        seed=seed, start=start, end=end
+    )
+
+
+def lunch_time_arrivals(floors: List[Union[str, Floor]], rate: float, lobby: Union[str, Floor]=None,
+                        seed=None, start: int=0, end: int=None) -> Iterator[Arrival]:
+    # midday: people going out and coming back at the same time
+    floor_ids = _floor_ids(floors)
+    lobby = _lobby_id(floor_ids, lobby)
+    return _arrivals(
+        rate, _lobby_trip(floor_ids, lobby, to_lobby=0.45, from_lobby=0.45),
+        seed=seed, start=start, end=end
+    )
+
+
+TRAFFIC_PROFILES = {
+    "poisson": poisson_arrivals,
+    "up_peak": up_peak_arrivals,
+    "down_peak": down_peak_arrivals,
+    "lunch_time": lunch_time_arrivals,
+}
+
+
+def _trace_format(path: str) -> str:
+    if path.endswith(".csv"):
+        return "csv"
+    elif path.endswith(".jsonl"):
+        return "jsonl"
+    raise ValueError("ERROR: traces must be .csv or .jsonl files")
+
+
+def _read_trace(path: str, trace_format: str) -> Iterator[Arrival]:
+    with open(path, newline="") as trace_file:
+        if trace_format == "csv":
+            for row in csv.DictReader(trace_file):
+                yield int(row["time"]), row["origin"], row["destination"]
+        else:
+            for line in trace_file:
+                if line.strip():
+                    row = json.loads(line)
+                    yield int(row["time"]), str(row["origin"]), str(row["destination"])
+
+
+def read_trace(path: str) -> Iterator[Arrival]:
+    # replays a time, origin, destination trace one line at a time
+    return _read_trace(path, _trace_format(path))
+
+
+def write_trace(path: str, arrivals: Iterable[Arrival]) -> int:
+    trace_format = _trace_format(path)
+    count = 0
+    with open(path, "w", newline="") as trace_file:
+        if trace_format == "csv":
+            writer = csv.writer(trace_file)
+            writer.writerow(["time", "origin", "destination"])
+        for time, origin, destination in arrivals:
+            origin, destination = _floor_id(origin), _floor_id(destination)
+            if trace_format == "csv":
+                writer.writerow([time, origin, destination])
+            else:
+                trace_file.write(json.dumps(
+                    {"time": time, "origin": origin, "destination": destination}
+                ) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,457 @@
+import argparse
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from metrics import MetricsSink, StreamingStats, nearest_rank
+from model import Building, Elevator, Passenger
+
+
+class TripStore(MetricsSink):
+
+    # Completed trips stored as a struct of arrays: one typed array per
+    # column instead of one Passenger object per trip, so a finished trip
+    # costs a few dozen bytes and the Passenger itself can be dropped.
+
+    COLUMNS = (
+        "origin", "destination", "elevator", "arrival_time", "boarding_time", "alighting_time"
+    )
+
+    def __init__(self, building: Building):
+        if building is None:
+            raise ValueError("ERROR: building may not be None")
+        self.building = building
+        self.origin = array("l")
+        self.destination = array("l")
+        self.elevator = array("l")
+        self.arrival_time = array("q")
+        self.boarding_time = array("q")
+        self.alighting_time = array("q")
+
+    def __len__(self) -> int:
+        return len(self.alighting_time)
+
+    def add_passenger(self, passenger: Passenger, elevator_id: int=-1) -> None:
+        if passenger.alighting_time is None:
+            raise ValueError("ERROR: only passengers who got off can be stored as trips")
+        self.origin.append(self.building.floor_index[passenger.origin_floor])
+        self.destination.append(self.building.floor_index[passenger.desired_floor])
+        self.elevator.append(elevator_id)
+        self.arrival_time.append(passenger.arrival_time)
+        self.boarding_time.append(passenger.boarding_time)
+        self.alighting_time.append(passenger.alighting_time)
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        self.add_passenger(passenger, elevator_id=elevator.elevator_id)
+
+    def trip(self, idx: int) -> Tuple[int, ...]:
+        return tuple(getattr(self, column)[idx] for column in self.COLUMNS)
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        return zip(*(getattr(self, column) for column in self.COLUMNS))
+
+    def wait_times(self) -> array:
+        return array("q", (
+            boarding - arrival
+            for arrival, boarding in zip(self.arrival_time, self.boarding_time)
+        ))
+
+    def ride_times(self) -> array:
+        return array("q", (
+            alighting - boarding
+            for boarding, alighting in zip(self.boarding_time, self.alighting_time)
+        ))
+
+
+MAPPED_TRIPS_VERSION = 1
+MAPPED_TRIPS_HEADER = "trips.json"
+# column name and array typecode ("i" int32, "q" int64); every column is a
+# <name>.col file of little endian values, row n of each file is trip n
+MAPPED_TRIP_COLUMNS = (
+    ("arrival_time", "q"),
+    ("origin", "i"),
+    ("destination", "i"),
+    ("elevator", "i"),
+    ("wait", "q"),
+    ("ride", "q"),
+)
+NUMPY_DTYPES = {"i": "<i4", "q": "<i8"}
+# columns queries can look at: the stored ones and trip, wait + ride
+QUERY_COLUMNS = tuple(name for name, typecode in MAPPED_TRIP_COLUMNS) + ("trip",)
+# largest (group, value) count table a grouped query builds before it sorts
+GROUPED_CELLS_LIMIT = 1 << 24
+
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, name + ".col")
+
+
+def _read_header(path: str) -> Dict:
+    with open(os.path.join(path, MAPPED_TRIPS_HEADER)) as header_file:
+        header = json.load(header_file)
+    if header.get("version") != MAPPED_TRIPS_VERSION:
+        raise ValueError("ERROR: unsupported trip store version {0}".format(header.get("version")))
+    return header
+
+
+def _stored_rows(path: str) -> int:
+    # a run that died mid flush can leave some columns a row or so longer
+    # than others; only rows every column has count
+    return min(
+        os.path.getsize(_column_path(path, name)) // array(typecode).itemsize
+        for name, typecode in MAPPED_TRIP_COLUMNS
+    )
+
+
+class MappedTripStore(MetricsSink):
+
+    # Append only trip log for runs too long to keep their trips in memory:
+    # one file per column under `path`, rows buffered in typed arrays and
+    # appended buffer_size at a time. MappedTrips maps the files back for
+    # queries. Opening an existing store (of the same building) appends to
+    # it, after dropping any rows a crashed run only half wrote.
+
+    def __init__(self, building: Building, path: str, buffer_size: int=65536):
+        if building is None:
+            raise ValueError("ERROR: building may not be None")
+        if buffer_size < 1:
+            raise ValueError("ERROR: buffer_size must be at least 1")
+        self.building = building
+        self.path = path
+        self.buffer_size = buffer_size
+        floor_ids = [floor.floor_id for floor in building.floors]
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, MAPPED_TRIPS_HEADER)):
+            if _read_header(path)["floors"] != floor_ids:
+                raise ValueError("ERROR: trip store at {0} is for other floors".format(path))
+            self.rows = _stored_rows(path)
+        else:
+            with open(os.path.join(path, MAPPED_TRIPS_HEADER), "w") as header_file:
+                json.dump({
+                    "version": MAPPED_TRIPS_VERSION,
+                    "columns": dict(MAPPED_TRIP_COLUMNS),
+                    "floors": floor_ids,
+                }, header_file)
+            self.rows = 0
+        self.files = {}
+        self.buffers = {}
+        for name, typecode in MAPPED_TRIP_COLUMNS:
+            column_file = open(_column_path(path, name), "ab")
+            column_file.truncate(self.rows * array(typecode).itemsize)
+            self.files[name] = column_file
+            self.buffers[name] = array(typecode)
+
+    def __len__(self) -> int:
+        return self.rows + len(self.buffers["wait"])
+
+    def add_passenger(self, passenger: Passenger, elevator_id: int=-1) -> None:
+        if passenger.alighting_time is None:
+            raise ValueError("ERROR: only passengers who got off can be stored as trips")
+        buffers = self.buffers
+        buffers["arrival_time"].append(passenger.arrival_time)
+        buffers["origin"].append(self.building.floor_index[passenger.origin_floor])
+        buffers["destination"].append(self.building.floor_index[passenger.desired_floor])
+        buffers["elevator"].append(elevator_id)
+        buffers["wait"].append(passenger.time_waiting_for_elevator)
+        buffers["ride"].append(passenger.time_inside_elevator)
+        if len(buffers["wait"]) >= self.buffer_size:
+            self.flush()
+
+    def record_trip(self, passenger: Passenger, elevator: Elevator, building: Building) -> None:
+        self.add_passenger(passenger, elevator_id=elevator.elevator_id)
+
+    def flush(self) -> None:
+        rows = len(self.buffers["wait"])
+        if rows == 0:
+            return
+        for name, typecode in MAPPED_TRIP_COLUMNS:
+            buffer = self.buffers[name]
+            if sys.byteorder != "little":
+                buffer.byteswap()
+            buffer.tofile(self.files[name])
+            self.files[name].flush()
+            self.buffers[name] = array(typecode)
+        self.rows += rows
+
+    def close(self) -> None:
+        if len(self.files) > 0:
+            self.flush()
+            for column_file in self.files.values():
+                column_file.close()
+            self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MappedTrips:
+
+    # Read only view of a MappedTripStore directory for offline analysis.
+    # Every column file is memory mapped and handed out as a NumPy array
+    # over the mapping (a memoryview of it without NumPy), so opening a day
+    # long run reads nothing up front and a query only pages in the columns
+    # it looks at. Queries take the arrival window [since, until) to look
+    # at; percentiles are nearest rank, the same as StreamingStats.
+
+    def __init__(self, path: str, use_numpy: bool=True):
+        header = _read_header(path)
+        self.path = path
+        self.floors = header["floors"]
+        self.use_numpy = use_numpy and np is not None
+        self.rows = _stored_rows(path)
+        self.maps = []  # type: List[mmap.mmap]
+        self.columns = {}
+        for name, typecode in MAPPED_TRIP_COLUMNS:
+            size = self.rows * array(typecode).itemsize
+            if size == 0:
+                # mmap can't map an empty file
+                column = np.zeros(0, dtype=NUMPY_DTYPES[typecode]) if self.use_numpy else array(typecode)
+            else:
+                with open(_column_path(path, name), "rb") as column_file:
+                    mapped = mmap.mmap(column_file.fileno(), size, access=mmap.ACCESS_READ)
+                self.maps.append(mapped)
+                if self.use_numpy:
+                    column = np.frombuffer(mapped, dtype=NUMPY_DTYPES[typecode], count=self.rows)
+                elif sys.byteorder == "little":
+                    column = memoryview(mapped).cast(typecode)
+                else:
+                    # no zero copy view of little endian values here
+                    column = array(typecode, mapped)
+                    column.byteswap()
+            self.columns[name] = column
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        self.columns = {}
+        for mapped in self.maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # an array handed out earlier still points into it, the
+                # mapping goes once that array does
+                pass
+        self.maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _window(self, since: int=None, until: int=None):
+        # NumPy: boolean mask of the rows in the window, or None for all
+        # rows; otherwise the row indices in the window
+        if since is None and until is None:
+            return None
+        arrival_time = self.columns["arrival_time"]
+        if self.use_numpy:
+            mask = np.ones(self.rows, dtype=bool)
+            if since is not None:
+                mask &= arrival_time >= since
+            if until is not None:
+                mask &= arrival_time < until
+            return mask
+        return [
+            row for row, arrival in enumerate(arrival_time)
+            if (since is None or arrival >= since) and (until is None or arrival < until)
+        ]
+
+    def column(self, name: str, since: int=None, until: int=None):
+        # the column for the rows in the window; a view of the mapping when
+        # there's no window and NumPy is there
+        if name not in QUERY_COLUMNS:
+            raise ValueError("ERROR: unknown trip column {0}".format(name))
+        rows = self._window(since, until)
+        if self.use_numpy:
+            if name == "trip":
+                values = self.columns["wait"] + self.columns["ride"]
+            else:
+                values = self.columns[name]
+            return values if rows is None else values[rows]
+        if name == "trip":
+            values = [wait + ride for wait, ride in zip(self.columns["wait"], self.columns["ride"])]
+        else:
+            values = self.columns[name]
+        return values if rows is None else [values[row] for row in rows]
+
+    def percentiles(self, name: str="trip", percents: Iterable[float]=(50, 95, 99),
+                    since: int=None, until: int=None) -> Dict[float, int]:
+        return self._summarize(self.column(name, since, until), percents)["percentiles"]
+
+    def summary(self, name: str="trip", since: int=None, until: int=None) -> Dict[str, float]:
+        # same keys as StreamingStats.summary
+        return _summary_dict(self._summarize(self.column(name, since, until), (50, 95, 99)))
+
+    def histogram(self, name: str="trip", bin_width: int=1,
+                  since: int=None, until: int=None) -> Dict[int, int]:
+        # first value of every non empty bin -> trips in it
+        if bin_width < 1:
+            raise ValueError("ERROR: bin_width must be at least 1")
+        values = self.column(name, since, until)
+        if self.use_numpy:
+            bins, counts = np.unique(values // bin_width, return_counts=True)
+            return {int(bin_idx) * bin_width: int(count) for bin_idx, count in zip(bins, counts)}
+        histogram = {}
+        for value in values:
+            bin_start = value // bin_width * bin_width
+            histogram[bin_start] = histogram.get(bin_start, 0) + 1
+        return dict(sorted(histogram.items()))
+
+    def by_floor_pair(self, name: str="trip", since: int=None,
+                      until: int=None) -> Dict[Tuple[str, str], Dict[str, float]]:
+        # (origin floor id, destination floor id) -> summary
+        floors = len(self.floors)
+        groups = self._grouped(
+            self.column("origin", since, until), self.column("destination", since, until),
+            floors, self.column(name, since, until)
+        )
+        return {
+            (self.floors[key // floors], self.floors[key % floors]): summary
+            for key, summary in groups.items()
+        }
+
+    def by_elevator(self, name: str="trip", since: int=None,
+                    until: int=None) -> Dict[int, Dict[str, float]]:
+        return self._grouped(
+            self.column("elevator", since, until), None, 1, self.column(name, since, until)
+        )
+
+    def _grouped(self, major, minor, minor_count: int, values) -> Dict[int, Dict[str, float]]:
+        # summary of values per key major * minor_count + minor
+        if self.use_numpy:
+            keys = major.astype(np.int64) * minor_count
+            if minor is not None:
+                keys += minor
+            if len(keys) == 0:
+                return {}
+            return _grouped_counts(keys, values, (50, 95, 99))
+        stats = {}
+        minor = minor if minor is not None else [0] * len(values)
+        for major_key, minor_key, value in zip(major, minor, values):
+            key = major_key * minor_count + minor_key
+            if key not in stats:
+                stats[key] = StreamingStats()
+            stats[key].add(value)
+        return {key: stats[key].summary() for key in sorted(stats)}
+
+    def _summarize(self, values, percents: Iterable[float]) -> Dict:
+        if self.use_numpy:
+            return _sorted_summary(np.sort(values), percents)
+        stats = StreamingStats()
+        for value in values:
+            stats.add(value)
+        return {
+            "count": stats.count,
+            "mean": stats.mean,
+            "percentiles": {percent: stats.percentile(percent) for percent in percents},
+        }
+
+
+def _grouped_counts(keys, values, percents: Iterable[float]) -> Dict[int, Dict[str, float]]:
+    # Trip times are whole ticks in a small range, so one bincount over
+    # (key, value) cells gives every group's exact value histogram in a
+    # single pass, and the percentiles fall out of its running sums; only
+    # when that table would be huge do the rows get sorted instead.
+    first_key, first_value = int(keys.min()), int(values.min())
+    key_span = int(keys.max()) - first_key + 1
+    value_span = int(values.max()) - first_value + 1
+    if key_span * value_span > GROUPED_CELLS_LIMIT:
+        order = np.lexsort((values, keys))
+        keys, values = keys[order], values[order]
+        starts = np.flatnonzero(np.diff(keys)) + 1
+        return {
+            int(keys[start]): _summary_dict(_sorted_summary(values[start:end], percents))
+            for start, end in zip(
+                np.concatenate(([0], starts)), np.concatenate((starts, [len(keys)]))
+            )
+        }
+    counts = np.bincount(
+        (keys - first_key) * value_span + (values - first_value), minlength=key_span * value_span
+    ).reshape(key_span, value_span)
+    running = counts.cumsum(axis=1)
+    totals = running[:, -1]
+    sums = counts @ np.arange(value_span, dtype=np.int64) + first_value * totals
+    present = np.flatnonzero(totals)
+    percentiles = {}
+    for percent in percents:
+        ranks = np.maximum(1, -(-totals[present] * percent // 100))
+        percentiles[percent] = (running[present] < ranks[:, None]).sum(axis=1) + first_value
+    return {
+        int(key_idx) + first_key: _summary_dict({
+            "count": int(totals[key_idx]),
+            "mean": int(sums[key_idx]) / int(totals[key_idx]),
+            "percentiles": {
+                percent: int(values_at[present_idx]) for percent, values_at in percentiles.items()
+            },
+        })
+        for present_idx, key_idx in enumerate(present)
+    }
+
+
+def _sorted_summary(values, percents: Iterable[float]) -> Dict:
+    # count, mean and nearest rank percentiles of an already sorted array
+    count = len(values)
+    percentiles = {}
+    for percent in percents:
+        rank = nearest_rank(count, percent)
+        percentiles[percent] = int(values[rank - 1]) if count > 0 else None
+    return {
+        "count": count,
+        "mean": int(values.sum()) / count if count > 0 else None,
+        "percentiles": percentiles,
+    }
+
+
+def _summary_dict(summary: Dict) -> Dict[str, float]:
+    return {
+        "count": summary["count"],
+        "mean": summary["mean"],
+        "p50": summary["percentiles"][50],
+        "p95": summary["percentiles"][95],
+        "p99": summary["percentiles"][99],
+    }
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="Query a MappedTripStore directory")
+    parser.add_argument("path")
+    parser.add_argument("--column", default="trip", choices=QUERY_COLUMNS)
+    parser.add_argument("--since", type=int, help="first arrival tick to look at")
+    parser.add_argument("--until", type=int, help="arrival tick to stop before")
+    parser.add_argument("--histogram", type=int, metavar="BIN_WIDTH",
+                        help="add a histogram with bins this many ticks wide")
+    parser.add_argument("--by-floor-pair", action="store_true")
+    parser.add_argument("--by-elevator", action="store_true")
+    args = parser.parse_args(argv)
+
+    with MappedTrips(args.path) as trips:
+        window = {"since": args.since, "until": args.until}
+        report = {"trips": len(trips), "summary": trips.summary(args.column, **window)}
+        if args.histogram is not None:
+            report["histogram"] = trips.histogram(args.column, args.histogram, **window)
+        if args.by_floor_pair:
+            report["by_floor_pair"] = {
+                "{0}->{1}".format(*floor_pair): summary
+                for floor_pair, summary in trips.by_floor_pair(args.column, **window).items()
+            }
+        if args.by_elevator:
+            report["by_elevator"] = trips.by_elevator(args.column, **window)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
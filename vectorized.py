@@ -0,0 +1,324 @@
+from typing import List, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from model import Building, Floor
+
+
+# car and passenger vectors are stored as ints: 1 going up, -1 going down and
+# 0 idling; hall calls live in slot 0 (up) or slot 1 (down)
+UP = 1
+IDLE = 0
+DOWN = -1
+
+
+class VectorizedBuilding:
+
+    # Same tick semantics as Building.time_step with the NearestCarDispatcher,
+    # but elevator and passenger state are kept in NumPy arrays so a tick is a
+    # handful of array operations instead of per-object Python loops. Only
+    # passengers still waiting or riding are kept in the passenger arrays;
+    # completed trips are moved out as they finish.
+
+    def __init__(self, floors: List[Union[str, Floor]], elevator_floors: List[Union[str, Floor]]):
+        if np is None:
+            raise ImportError("ERROR: VectorizedBuilding requires numpy")
+        self.floors = [
+            floor if type(floor) == Floor else Floor(floor)
+            for floor in floors
+        ]
+        self.floor_index = {
+            floor: idx
+            for idx, floor in enumerate(self.floors)
+        }
+        if len(self.floor_index) != len(self.floors):
+            raise ValueError("ERROR: floor ids must be unique within a building")
+        self.ticks = 0
+        # elevator state
+        self.car_floor = np.array(
+            [self.get_floor_index(floor) for floor in elevator_floors],
+            dtype=np.int64
+        )
+        self.car_vector = np.zeros(len(self.car_floor), dtype=np.int64)
+        self.car_target = np.full(len(self.car_floor), -1, dtype=np.int64)
+        # hall call state, indexed [slot, floor]
+        self.queue_len = np.zeros((2, len(self.floors)), dtype=np.int64)
+        self.call_seq = np.full((2, len(self.floors)), -1, dtype=np.int64)
+        self._next_call_seq = 0
+        # active passenger state, kept in arrival (passenger_id) order
+        self.passenger_id = np.zeros(0, dtype=np.int64)
+        self.origin = np.zeros(0, dtype=np.int64)
+        self.destination = np.zeros(0, dtype=np.int64)
+        self.vector = np.zeros(0, dtype=np.int64)
+        self.wait_ticks = np.zeros(0, dtype=np.int64)
+        self.ride_ticks = np.zeros(0, dtype=np.int64)
+        self.car = np.zeros(0, dtype=np.int64)
+        self.board_seq = np.zeros(0, dtype=np.int64)
+        self._next_passenger_id = 0
+        self._next_board_seq = 0
+        # completed trips
+        self._done_id = []
+        self._done_wait = []
+        self._done_ride = []
+
+    @classmethod
+    def from_building(cls, building: Building):
+        # waiting passengers get ids in Building.passengers order, riders
+        # follow in elevator and boarding order
+        if len(building.zones) > 0:
+            raise ValueError("ERROR: VectorizedBuilding only reproduces buildings without zones")
+        if building.scheduling != "single":
+            raise ValueError("ERROR: VectorizedBuilding only reproduces single scheduling")
+        if building.demand is not None:
+            raise ValueError("ERROR: VectorizedBuilding only reproduces middle floor parking")
+        for elevator in building.elevators:
+            if elevator.spec.capacity is not None or elevator.spec.timed:
+                raise ValueError("ERROR: VectorizedBuilding only reproduces unlimited, untimed elevators")
+        engine = cls(
+            floors=building.floors,
+            elevator_floors=[
+                elevator.current_floor
+                for elevator in building.elevators
+            ]
+        )
+        for car, elevator in enumerate(building.elevators):
+            engine.car_vector[car] = {"^": UP, " ": IDLE, "v": DOWN}[elevator.current_vector]
+            if elevator.desired_floor is not None:
+                engine.car_target[car] = engine.get_floor_index(elevator.desired_floor)
+        waiting = building.passengers
+        engine.add_passengers(
+            origins=[passenger.origin_floor for passenger in waiting],
+            destinations=[passenger.desired_floor for passenger in waiting],
+            wait_ticks=[passenger.time_waiting_for_elevator for passenger in waiting]
+        )
+        for car, elevator in enumerate(building.elevators):
+            first_row = len(engine.passenger_id)
+            engine._append_passengers(
+                origins=[
+                    engine.get_floor_index(passenger.origin_floor)
+                    for passenger in elevator.passengers
+                ],
+                destinations=[
+                    engine.get_floor_index(passenger.desired_floor)
+                    for passenger in elevator.passengers
+                ],
+                wait_ticks=[
+                    passenger.time_waiting_for_elevator
+                    for passenger in elevator.passengers
+                ],
+                ride_ticks=[
+                    passenger.time_inside_elevator
+                    for passenger in elevator.passengers
+                ]
+            )
+            for row in range(first_row, len(engine.passenger_id)):
+                engine.car[row] = car
+                engine.board_seq[row] = engine._next_board_seq
+                engine._next_board_seq += 1
+        return engine
+
+    def get_floor_index(self, floor: Union[str, Floor]) -> int:
+        if type(floor) != Floor:
+            floor = Floor(floor)
+        if floor not in self.floor_index:
+            raise ValueError("ERROR: floor does not exist in the building")
+        return self.floor_index[floor]
+
+    @property
+    def waiting_count(self) -> int:
+        return int(self.queue_len.sum())
+
+    @property
+    def riding_count(self) -> int:
+        return len(self.passenger_id) - self.waiting_count
+
+    def _append_passengers(self, origins, destinations, wait_ticks=None, ride_ticks=None) -> np.ndarray:
+        origins = np.asarray(origins, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        count = len(origins)
+        if wait_ticks is None:
+            wait_ticks = np.zeros(count, dtype=np.int64)
+        if ride_ticks is None:
+            ride_ticks = np.zeros(count, dtype=np.int64)
+        ids = np.arange(
+            self._next_passenger_id, self._next_passenger_id + count,
+            dtype=np.int64
+        )
+        self._next_passenger_id += count
+        self.passenger_id = np.concatenate((self.passenger_id, ids))
+        self.origin = np.concatenate((self.origin, origins))
+        self.destination = np.concatenate((self.destination, destinations))
+        self.vector = np.concatenate((self.vector, np.sign(destinations - origins)))
+        self.wait_ticks = np.concatenate((self.wait_ticks, np.asarray(wait_ticks, dtype=np.int64)))
+        self.ride_ticks = np.concatenate((self.ride_ticks, np.asarray(ride_ticks, dtype=np.int64)))
+        self.car = np.concatenate((self.car, np.full(count, -1, dtype=np.int64)))
+        self.board_seq = np.concatenate((self.board_seq, np.full(count, -1, dtype=np.int64)))
+        return ids
+
+    def add_passengers(self, origins: List[Union[str, Floor]], destinations: List[Union[str, Floor]], wait_ticks=None) -> np.ndarray:
+        if len(origins) != len(destinations):
+            raise ValueError("ERROR: origins and destinations must have the same length")
+        origins = [self.get_floor_index(floor) for floor in origins]
+        destinations = [self.get_floor_index(floor) for floor in destinations]
+        for origin, destination in zip(origins, destinations):
+            if origin == destination:
+                raise ValueError("ERROR: in order to be an Elevator Passenger, the person in question should want to go to another floor")
+        ids = self._append_passengers(origins, destinations, wait_ticks=wait_ticks)
+        for origin, destination in zip(origins, destinations):
+            slot = 0 if destination > origin else 1
+            if self.queue_len[slot, origin] == 0:
+                self.call_seq[slot, origin] = self._next_call_seq
+                self._next_call_seq += 1
+            self.queue_len[slot, origin] += 1
+        return ids
+
+    def completed_trips(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (passenger_id, wait ticks, ride ticks), sorted by passenger_id
+        if len(self._done_id) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        ids = np.concatenate(self._done_id)
+        order = np.argsort(ids)
+        return (
+            ids[order],
+            np.concatenate(self._done_wait)[order],
+            np.concatenate(self._done_ride)[order],
+        )
+
+    def _board(self, car: int, row: int, slot: int) -> None:
+        floor = self.car_floor[car]
+        self.car[row] = car
+        self.board_seq[row] = self._next_board_seq
+        self._next_board_seq += 1
+        self.queue_len[slot, floor] -= 1
+        if self.queue_len[slot, floor] == 0:
+            self.call_seq[slot, floor] = -1
+        destination = self.destination[row]
+        if self.car_target[car] < 0:
+            self.car_target[car] = destination
+            self.car_vector[car] = UP if destination > floor else DOWN
+        elif abs(destination - floor) > abs(self.car_target[car] - floor):
+            self.car_target[car] = destination
+
+    def _step_towards(self, car: int, target: int) -> None:
+        self.car_floor[car] += 1 if target > self.car_floor[car] else -1
+        if self.car_floor[car] == target:
+            self.car_target[car] = -1
+            self.car_vector[car] = IDLE
+        else:
+            self.car_target[car] = target
+            self.car_vector[car] = UP if target > self.car_floor[car] else DOWN
+
+    def time_step(self) -> None:
+        self.ticks += 1
+        waiting = self.car < 0
+        self.wait_ticks += waiting
+        self.ride_ticks += ~waiting
+        if len(self.car_floor) == 0:
+            return
+        acted = np.zeros(len(self.car_floor), dtype=bool)
+
+        # unload: each elevator lets off its most recently boarded passenger
+        # whose destination is the current floor
+        at_destination = ~waiting & (self.destination == self.car_floor[self.car])
+        unloaded_rows = np.flatnonzero(at_destination)
+        if len(unloaded_rows) > 0:
+            unloaded_rows = unloaded_rows[
+                np.lexsort((self.board_seq[unloaded_rows], self.car[unloaded_rows]))
+            ]
+            cars = self.car[unloaded_rows]
+            last_per_car = np.append(cars[1:] != cars[:-1], True)
+            unloaded_rows = unloaded_rows[last_per_car]
+            acted[self.car[unloaded_rows]] = True
+
+        # board: the head of the hall call queue matching the elevator vector;
+        # elevators sharing a floor take passengers in elevator order
+        floor_up_len = self.queue_len[0, self.car_floor]
+        floor_down_len = self.queue_len[1, self.car_floor]
+        can_board = ~acted & (
+            ((self.car_vector >= 0) & (floor_up_len > 0)) |
+            ((self.car_vector <= 0) & (floor_down_len > 0))
+        )
+        if can_board.any():
+            waiting_rows = np.flatnonzero(waiting)
+            keys = self.origin[waiting_rows] * 2 + (self.vector[waiting_rows] < 0)
+            order = np.argsort(keys, kind="stable")
+            waiting_rows = waiting_rows[order]
+            keys = keys[order]
+            queue_heads = {}
+            for car in np.flatnonzero(can_board):
+                floor = self.car_floor[car]
+                vector = self.car_vector[car]
+                slots = (0, 1) if vector == IDLE else ((0,) if vector == UP else (1,))
+                for slot in slots:
+                    if self.queue_len[slot, floor] == 0:
+                        continue
+                    key = floor * 2 + slot
+                    position = queue_heads.get(key)
+                    if position is None:
+                        position = int(np.searchsorted(keys, key))
+                    queue_heads[key] = position + 1
+                    self._board(car, waiting_rows[position], slot)
+                    acted[car] = True
+                    break
+
+        # move: elevators with a target advance one floor along their path
+        moving = ~acted & (self.car_target >= 0)
+        self.car_floor[moving] += np.sign(self.car_target[moving] - self.car_floor[moving])
+        arrived = moving & (self.car_floor == self.car_target)
+        self.car_target[arrived] = -1
+        self.car_vector[arrived] = IDLE
+        idle_cars = np.flatnonzero(~acted & ~moving)
+
+        if self.queue_len.any():
+            if len(idle_cars) > 0:
+                self._dispatch(idle_cars)
+        elif len(idle_cars) > 0:
+            middle = (len(self.floors) - 1) // 2
+            self.car_floor[idle_cars] += np.sign(middle - self.car_floor[idle_cars])
+
+        if len(unloaded_rows) > 0:
+            self._done_id.append(self.passenger_id[unloaded_rows])
+            self._done_wait.append(self.wait_ticks[unloaded_rows])
+            self._done_ride.append(self.ride_ticks[unloaded_rows])
+            keep = np.ones(len(self.passenger_id), dtype=bool)
+            keep[unloaded_rows] = False
+            for name in ("passenger_id", "origin", "destination", "vector",
+                         "wait_ticks", "ride_ticks", "car", "board_seq"):
+                setattr(self, name, getattr(self, name)[keep])
+
+    def _dispatch(self, idle_cars: np.ndarray) -> None:
+        # nearest car: uncovered hall call floors in call order, each idle
+        # elevator in turn takes the closest one
+        slots, floors = np.nonzero(self.queue_len)
+        order = np.argsort(self.call_seq[slots, floors])
+        slots = slots[order]
+        floors = floors[order]
+        call_vectors = np.where(slots == 0, UP, DOWN)
+        busy = self.car_target >= 0
+        busy_floor = self.car_floor[busy]
+        busy_target = self.car_target[busy]
+        busy_vector = self.car_vector[busy]
+        call_floor = floors[:, None]
+        in_path = (
+            (call_floor != busy_floor) &
+            (call_floor >= np.minimum(busy_floor, busy_target)) &
+            (call_floor <= np.maximum(busy_floor, busy_target))
+        )
+        covered = (call_floor == busy_target) | (
+            (call_vectors[:, None] == busy_vector) & in_path
+        )
+        pending = floors[~covered.any(axis=1)]
+        _, first_seen = np.unique(pending, return_index=True)
+        pending = pending[np.sort(first_seen)]
+        for car in idle_cars:
+            if len(pending) == 0:
+                break
+            closest = int(np.argmin(np.abs(pending - self.car_floor[car])))
+            target = pending[closest]
+            pending = np.delete(pending, closest)
+            if target != self.car_floor[car]:
+                self._step_towards(car, target)